@@ -0,0 +1,189 @@
+"""
+Memory and decode benchmark of the record types of ffrk.py.
+
+Compares the raw json dictionaries with the SoulBreak records (__slots__,
+interned names) on the same response body:
+    - the memory held by the decoded list (tracemalloc)
+    - the decode throughput from the response body, in records per second
+    - the time of a pass reading the fields printSbResult uses
+
+The body is the full SoulBreaks response: read from a file saved from
+the API (--file), from the local copy (--store, after ffrk.py sync), or
+generated (--count records, the default):
+
+    python benchmarks/records.py
+    python benchmarks/records.py --store
+    python benchmarks/records.py --file soulbreaks.json --json
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+from timeit import default_timer as timer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ffrk     # noqa: E402
+
+CHARACTERS = ['Cloud', 'Tifa', 'Aerith', 'Squall', 'Rinoa', 'Zidane',
+              'Cecil (Paladin)', 'Cecil (Dark Knight)', 'Onion Knight',
+              'Lightning', 'Vaan', 'Tidus', 'Yuna', 'Bartz', 'Terra']
+STATUS_NAMES = ['High Quick Cast 1', 'Attach Fire', 'Imperil Wind 10%',
+                'Damage reduction barrier 30%', 'Burst Mode',
+                'Synchro Mode', 'ATK +30%', 'Instant Cast 1']
+
+
+def generateSoulBreaks(count, seed=0):
+    """
+    input:  the number of soulbreaks, the random seed
+    output: a list of soulbreak dictionaries shaped like the API's"""
+
+    rand = random.Random(seed)
+    tiers = list(ffrk.tierName)
+    elements = list(ffrk.elements)
+    sbList = []
+    for sbId in range(1, count + 1):
+        character = rand.choice(CHARACTERS)
+        sbName = '{} soulbreak {}'.format(character, sbId)
+        element = rand.choice(elements)
+        sbList.append({
+            'id': sbId,
+            'characterId': CHARACTERS.index(character) + 1,
+            'characterName': character,
+            'relicId': 10000 + sbId,
+            'relicName': '{} relic {}'.format(character, sbId),
+            'soulBreakName': sbName,
+            'description': '',
+            'soulBreakTier': rand.choice(tiers),
+            'targetType': rand.choice([1, 2, 13]),
+            'multiplier': round(rand.uniform(0, 20), 2),
+            'elements': [element],
+            'castTime': 0.01,
+            'soulBreakPointsRequired': rand.choice([250, 500, 1000]),
+            'effects': 'Five single attacks (0.80 each), Imperil {} 10%, '
+                       'grants High Quick Cast 1'.format(
+                           ffrk.elements[element]),
+            'commands': [{
+                'id': sbId * 10 + command,
+                'sourceSoulBreakId': sbId,
+                'sourceSoulBreakName': sbName,
+                'commandName': 'Command {}'.format(command),
+                'school': 5,
+                'targetType': 13,
+                'multiplier': 1.5,
+                'elements': [element],
+                'castTime': 1.0,
+                'effects': 'Four single attacks (0.60 each)',
+                'soulBreakPointsGained': 0,
+                } for command in range(rand.choice([0, 0, 2, 4]))],
+            'statuses': [{
+                'id': rand.randint(1, 500),
+                'commonName': name,
+                'description': '',
+                'effects': name,
+                'defaultDuration': 25,
+                } for name in rand.sample(STATUS_NAMES, 2)],
+            'otherEffects': [],
+            })
+    return sbList
+
+
+def loadBody(parserData):
+    """ output: the json body of the full SoulBreaks response """
+
+    if parserData.file:
+        with open(parserData.file, 'rb') as f:
+            return f.read()
+    if parserData.store:
+        return json.dumps(ffrk.store.allSoulBreaks()).encode('utf-8')
+    return json.dumps(generateSoulBreaks(parserData.count)).encode('utf-8')
+
+
+def heldMemory(decode, body):
+    """
+    input:  a decode function, a response body
+    output: the bytes held by the decoded result, in bytes"""
+
+    gc.collect()
+    tracemalloc.start()
+    result = decode(body)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bestTime(function, runs):
+    """ output: the best time of function() over runs, in seconds """
+
+    times = []
+    for _ in range(runs):
+        start = timer()
+        function()
+        times.append(timer() - start)
+    return min(times)
+
+
+def readFields(sbList):
+    """ reads the fields printSbResult uses """
+
+    for sbData in sbList:
+        ffrk.decodeSb(sbData)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='ffrk.py record memory and decode benchmark')
+    parser.add_argument('--file', help='a saved SoulBreaks json response')
+    parser.add_argument('--store', action='store_true',
+                        help='use the soulbreaks of the local copy')
+    parser.add_argument('-c', '--count', type=int, default=5000,
+                        help='the number of soulbreaks generated')
+    parser.add_argument('-n', '--runs', type=int, default=5,
+                        help='the number of runs per measure')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as json')
+    parserData = parser.parse_args()
+
+    body = loadBody(parserData)
+    count = len(json.loads(body))
+    decoders = {
+        'dict': json.loads,
+        'record': ffrk.SoulBreak.decode,
+        }
+
+    results = {'records': count, 'bodyBytes': len(body)}
+    for name, decode in decoders.items():
+        seconds = bestTime(lambda: decode(body), parserData.runs)
+        sbList = decode(body)
+        results[name] = {
+            'memoryBytes': heldMemory(decode, body),
+            'decodePerSecond': round(count / seconds),
+            'readSeconds': round(bestTime(lambda: readFields(sbList),
+                                          parserData.runs), 4),
+            }
+    results['memoryRatio'] = round(results['record']['memoryBytes']
+                                   / results['dict']['memoryBytes'], 3)
+
+    if parserData.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print('{} soulbreaks, {} bytes of json'.format(count, len(body)))
+    print('{:<8} {:>14} {:>16} {:>12}'.format('', 'memory (KiB)',
+                                             'decode (rec/s)', 'read (s)'))
+    for name in decoders:
+        print('{:<8} {:>14.0f} {:>16} {:>12}'.format(
+              name, results[name]['memoryBytes'] / 1024,
+              results[name]['decodePerSecond'], results[name]['readSeconds']))
+    print('records use {:.0%} of the memory of the dictionaries'.format(
+          results['memoryRatio']))
+
+
+if __name__ == '__main__':
+    main()
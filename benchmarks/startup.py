@@ -0,0 +1,142 @@
+"""
+Startup benchmark for ffrk.py.
+
+Measures, in fresh interpreters:
+    - the import time of ffrk and of its heaviest dependencies
+      (python -X importtime)
+    - the time from process start to the first byte of output of a query
+    - whether the query loaded the HTTP stack (requests)
+
+Run a query once beforehand (or use --offline after ffrk.py sync) so the
+measured runs are served from the cache or the local copy:
+
+    python benchmarks/startup.py sb cloud usb
+    python benchmarks/startup.py -n 20 --json sb cloud usb
+    python benchmarks/startup.py --api http://127.0.0.1:8765/api/v1.0/ usb
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from timeit import default_timer as timer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['requests', 'asyncio', 'sqlite3', 'concurrent.futures',
+                 'http.server', 'socketserver', 'pydoc', 'csv', 'ffrk']
+
+# runs ffrk.main in a fresh interpreter and reports on stderr whether the
+# query imported requests
+RUNNER = '''
+import sys
+sys.path.insert(0, {root!r})
+import ffrk
+if {api!r}:
+    ffrk.API = {api!r}
+ffrk.main({args!r})
+sys.stdout.flush()
+sys.stderr.write('\\nREQUESTS_LOADED=' + str('requests' in sys.modules))
+'''
+
+
+def importTimes(runs):
+    """
+    input:  the number of interpreters to start
+    output: a dictionary of module name: median cumulative import time
+            in milliseconds"""
+
+    samples = {module: [] for module in HEAVY_MODULES}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import ffrk'],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True)
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            if name in samples:
+                samples[name].append(int(cumulative) / 1000)
+
+    return {module: round(statistics.median(times), 2)
+            for module, times in samples.items() if times}
+
+
+def firstOutput(args, api, runs):
+    """
+    input:  the ffrk.py arguments, the API url to use (or None), the number
+            of runs
+    output: a dictionary with the median and best time to the first byte of
+            output and to exit in milliseconds, and whether requests was
+            loaded"""
+
+    code = RUNNER.format(root=ROOT, api=api, args=args)
+    first, total, loaded = [], [], set()
+    for _ in range(runs):
+        start = timer()
+        process = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        process.stdout.read(1)
+        first.append((timer() - start) * 1000)
+        process.stdout.read()
+        error = process.stderr.read().decode(errors='replace')
+        process.wait()
+        total.append((timer() - start) * 1000)
+        loaded.add('REQUESTS_LOADED=True' in error)
+
+    return {
+        'firstOutputMedian': round(statistics.median(first), 2),
+        'firstOutputBest': round(min(first), 2),
+        'exitMedian': round(statistics.median(total), 2),
+        'requestsLoaded': any(loaded),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ffrk.py startup benchmark')
+    parser.add_argument('query', nargs='*', default=['sb', 'cloud', 'usb'],
+                        help='the ffrk.py arguments to time')
+    parser.add_argument('-n', '--runs', type=int, default=10,
+                        help='the number of runs per measure')
+    parser.add_argument('--api', default=None,
+                        help='the API url to query instead of the real one')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as json')
+    parserData = parser.parse_args()
+
+    # warm up the cache so the timed runs measure startup, not the network
+    subprocess.run([sys.executable, '-c', RUNNER.format(
+                    root=ROOT, api=parserData.api, args=parserData.query)],
+                   cwd=ROOT, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)
+
+    results = {
+        'query': parserData.query,
+        'runs': parserData.runs,
+        'importMs': importTimes(parserData.runs),
+        }
+    results.update(firstOutput(parserData.query, parserData.api,
+                               parserData.runs))
+
+    if parserData.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print('Import time (median of {} runs, cumulative ms):'.format(
+          parserData.runs))
+    for module, ms in sorted(results['importMs'].items(),
+                             key=lambda item: -item[1]):
+        print('  {:<20} {:>8.2f}'.format(module, ms))
+    print('Query: ffrk.py ' + ' '.join(parserData.query))
+    print('  first output  {:>8.2f} ms (median), {:.2f} ms (best)'.format(
+          results['firstOutputMedian'], results['firstOutputBest']))
+    print('  exit          {:>8.2f} ms (median)'.format(results['exitMedian']))
+    print('  requests loaded: {}'.format(results['requestsLoaded']))
+
+
+if __name__ == '__main__':
+    main()
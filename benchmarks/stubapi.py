@@ -0,0 +1,222 @@
+"""
+A local stand-in for the FFRK API, for repeatable benchmarks.
+
+Replays fixtures: a json file mapping endpoint paths (relative to the API
+root, lower case) to the response data, as recorded by
+`python benchmarks/suite.py --record`. Without a fixtures file it serves
+a generated dataset (see records.generateSoulBreaks) under the same
+endpoints. The Characters/Name and SoulBreaks/Name endpoints not in the
+fixtures match the names of the Characters and SoulBreaks listings by
+substring, like the API. Other unknown endpoints answer an empty list,
+like the API.
+
+Every response is delayed by the configured latency plus a random jitter
+drawn from a seeded generator, and the requests are counted.
+
+    python benchmarks/stubapi.py --port 8765 --latency 50 --jitter 10
+    python benchmarks/stubapi.py --fixtures fixtures.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+API_ROOT = '/api/v1.0/'
+DETAIL_FIELDS = ('commands', 'statuses', 'otherEffects')
+
+
+def loadFixtures(path):
+    """
+    input:  the path of a fixtures json file
+    output: a dictionary of endpoint: json body bytes"""
+
+    with open(path, encoding='utf-8') as f:
+        fixtures = json.load(f)
+    return {endpoint.lower(): json.dumps(data).encode('utf-8')
+            for endpoint, data in fixtures.items()}
+
+
+def generateFixtures(count=2000, seed=0):
+    """
+    input:  the number of soulbreaks, the random seed
+    output: a dictionary of endpoint: json body bytes covering the
+            endpoints of the benchmarked searches: the listings matched by
+            the name searches, every soulbreak ID and tier, and every
+            imperil/attach element"""
+
+    import records     # puts the repository on the path
+    import ffrk
+
+    sbList = records.generateSoulBreaks(count, seed)
+
+    def summary(sbData):
+        # the list endpoints leave out the detail fields
+        return {key: value for key, value in sbData.items()
+                if key not in DETAIL_FIELDS}
+
+    fixtures = {'soulbreaks': sbList}
+    characters = {}
+    for sbData in sbList:
+        fixtures['soulbreaks/' + str(sbData['id'])] = [sbData]
+        fixtures.setdefault('soulbreaks/tier/' + str(sbData['soulBreakTier']),
+                            []).append(summary(sbData))
+        charData = characters.setdefault(sbData['characterName'], {
+            'id': sbData['characterId'],
+            'characterName': sbData['characterName'],
+            'relics': [],
+            })
+        charData['relics'].append({
+            'id': sbData['relicId'],
+            'relicName': sbData['relicName'],
+            'soulBreakId': sbData['id'],
+            'soulBreak': summary(sbData),
+            })
+
+    fixtures['characters'] = list(characters.values())
+
+    for statusType in ('imperil', 'attach'):
+        for element in ffrk.elements.values():
+            searchStr = (statusType + ' ' + element).lower()
+            fixtures['soulbreaks/effect/' + searchStr] = [
+                summary(sbData) for sbData in sbList
+                if searchStr in sbData['effects'].lower()]
+
+    return {endpoint: json.dumps(data).encode('utf-8')
+            for endpoint, data in fixtures.items()}
+
+
+# name search endpoint: (listing endpoint, name field)
+NAME_SEARCHES = {
+    'characters/name/': ('characters', 'characterName'),
+    'soulbreaks/name/': ('soulbreaks', 'soulBreakName'),
+    }
+
+
+def nameTables(fixtures):
+    """
+    input:  a dictionary of endpoint: json body bytes
+    output: a dictionary of name search endpoint: list of (lower case name,
+            record) tuples, from the listings found in the fixtures"""
+
+    tables = {}
+    for prefix, (listing, field) in NAME_SEARCHES.items():
+        if listing in fixtures:
+            tables[prefix] = [(data[field].lower(), data)
+                              for data in json.loads(fixtures[listing])]
+    return tables
+
+
+class StubApi:
+    """ The stub API server, run on a background thread """
+
+    def __init__(self, fixtures, port=0, latency=0.05, jitter=0.01, seed=0):
+        self.fixtures = fixtures
+        self.names = nameTables(fixtures)
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', port),
+                                          self.handlerClass())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}{}'.format(self.server.server_port,
+                                               API_ROOT)
+
+    def delay(self):
+        """ output: the seconds to wait before answering a request """
+
+        with self.lock:
+            self.requests += 1
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.latency + jitter)
+
+    def respond(self, endpoint):
+        """
+        input:  a lower case endpoint path, relative to the API root
+        output: the json body bytes answering it"""
+
+        body = self.fixtures.get(endpoint)
+        if body is not None:
+            return body
+
+        for prefix, table in self.names.items():
+            if endpoint.startswith(prefix):
+                query = endpoint[len(prefix):]
+                return json.dumps([data for name, data in table
+                                   if query in name]).encode('utf-8')
+        return b'[]'
+
+    def handlerClass(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(stub.delay())
+                endpoint = unquote(self.path[len(API_ROOT):]).lower()
+                body = stub.respond(endpoint)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def resetCount(self):
+        with self.lock:
+            count, self.requests = self.requests, 0
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='stub FFRK API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', help='a recorded fixtures json file')
+    parser.add_argument('-c', '--count', type=int, default=2000,
+                        help='the number of soulbreaks generated')
+    parser.add_argument('--latency', type=float, default=50,
+                        help='the response latency in ms')
+    parser.add_argument('--jitter', type=float, default=10,
+                        help='the maximum random jitter in ms, +/-')
+    parser.add_argument('--seed', type=int, default=0)
+    parserData = parser.parse_args()
+
+    fixtures = (loadFixtures(parserData.fixtures) if parserData.fixtures
+                else generateFixtures(parserData.count, parserData.seed))
+    stub = StubApi(fixtures, parserData.port, parserData.latency / 1000,
+                   parserData.jitter / 1000, parserData.seed)
+    print('Serving {} endpoints on {}'.format(len(fixtures), stub.url))
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmark suite of the ffrk.py searches against a local stub API.
+
+Runs the real sbSearch, sbTierSearch and sbStatusSearch entry points in
+this process against benchmarks/stubapi.py, with the response cache off
+so every run goes through the network path. For each scenario it
+reports the latency percentiles of a run, the API requests per run and
+the peak memory allocated during a run (tracemalloc).
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py --latency 100 --jitter 30 --runs 50 --json
+    python benchmarks/suite.py --scenario tier
+
+The stub serves a generated dataset unless given fixtures recorded from
+the real API:
+
+    python benchmarks/suite.py --record fixtures.json
+    python benchmarks/suite.py --fixtures fixtures.json
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from timeit import default_timer as timer
+
+# keep the benchmark away from the user's cache and local copy
+SCRATCH = tempfile.mkdtemp(prefix='ffrk-bench-')
+os.environ['FFRK_CACHE_DIR'] = os.path.join(SCRATCH, 'cache')
+os.environ['FFRK_DATA_DIR'] = os.path.join(SCRATCH, 'data')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ffrk         # noqa: E402
+import stubapi      # noqa: E402
+
+# name: (search function, raw command line arguments)
+SCENARIOS = {
+    'sb-character': (ffrk.sbSearch, ['sb', 'cloud']),
+    'sb-character-type': (ffrk.sbSearch, ['sb', 'cloud', 'usb']),
+    'sb-substring': (ffrk.sbSearch, ['sb', 'onion']),
+    'sb-ambiguous': (ffrk.sbSearch, ['sb', 'cecil']),
+    'sb-name': (ffrk.sbSearch, ['sb', 'soulbreak 199']),
+    'tier': (ffrk.sbTierSearch, ['usb', 'fire']),
+    'tier-details': (ffrk.sbTierSearch, ['bsb', 'ice', '-d']),
+    'status': (ffrk.sbStatusSearch, ['imperil', 'wind']),
+    'tier-multi': (ffrk.sbTierSearch, ['usb,bsb', 'fire,ice,wind']),
+    'status-all': (ffrk.sbStatusSearch, ['imperil,attach', 'all']),
+    }
+
+
+def runSearch(function, args):
+    """ runs one search with the cache off, its output discarded """
+
+    with redirect_stdout(io.StringIO()):
+        function(args + ['--no-cache'])
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def benchmark(stub, function, args, runs):
+    """
+    input:  the running StubApi, a search function and its arguments, the
+            number of timed runs
+    output: a dictionary of the run latency percentiles in ms, the API
+            requests per run and the peak memory of a run in bytes"""
+
+    runSearch(function, args)       # warm up: imports, connections
+    stub.resetCount()
+
+    times = []
+    for _ in range(runs):
+        start = timer()
+        runSearch(function, args)
+        times.append((timer() - start) * 1000)
+    requests = stub.resetCount() / runs
+
+    tracemalloc.start()
+    runSearch(function, args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stub.resetCount()
+
+    return {
+        'p50': round(percentile(times, 0.5), 2),
+        'p95': round(percentile(times, 0.95), 2),
+        'p99': round(percentile(times, 0.99), 2),
+        'mean': round(statistics.mean(times), 2),
+        'requests': round(requests, 2),
+        'peakMemory': peak,
+        }
+
+
+def record(path, api, scenarios):
+    """
+    input:  the path of the fixtures file to write, the API URL, the
+            scenario names
+    output: runs the scenarios once against the API and saves every
+            response they fetched as a fixture"""
+
+    fixtures = {}
+    get = ffrk.Transport.get
+
+    def recordingGet(self, url, headers=None, timeout=ffrk.REQUEST_TIMEOUT):
+        response = get(self, url, headers=headers, timeout=timeout)
+        if response.status_code == 200:
+            fixtures[url[len(api):].lower()] = response.json()
+        return response
+
+    ffrk.API = api
+    ffrk.Transport.get = recordingGet
+    try:
+        for name in scenarios:
+            runSearch(*SCENARIOS[name])
+    finally:
+        ffrk.Transport.get = get
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixtures, f)
+    print('Recorded {} responses to {}'.format(len(fixtures), path))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='ffrk.py search benchmarks against a stub API')
+    parser.add_argument('--scenario', action='append',
+                        choices=list(SCENARIOS),
+                        help='the scenarios to run, default all')
+    parser.add_argument('-n', '--runs', type=int, default=20,
+                        help='the number of timed runs per scenario')
+    parser.add_argument('--latency', type=float, default=50,
+                        help='the stub response latency in ms')
+    parser.add_argument('--jitter', type=float, default=10,
+                        help='the maximum random jitter in ms, +/-')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-c', '--count', type=int, default=2000,
+                        help='the number of soulbreaks generated')
+    parser.add_argument('--fixtures', help='a recorded fixtures json file')
+    parser.add_argument('--record', metavar='FILE',
+                        help='record fixtures from the API instead')
+    parser.add_argument('--api', default=ffrk.API,
+                        help='the API recorded from')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as json')
+    parserData = parser.parse_args()
+    scenarios = parserData.scenario or list(SCENARIOS)
+
+    if parserData.record:
+        return record(parserData.record, parserData.api, scenarios)
+
+    fixtures = (stubapi.loadFixtures(parserData.fixtures)
+                if parserData.fixtures
+                else stubapi.generateFixtures(parserData.count,
+                                              parserData.seed))
+    stub = stubapi.StubApi(fixtures, latency=parserData.latency / 1000,
+                           jitter=parserData.jitter / 1000,
+                           seed=parserData.seed).start()
+    ffrk.API = stub.url
+
+    results = {}
+    try:
+        for name in scenarios:
+            function, args = SCENARIOS[name]
+            results[name] = benchmark(stub, function, args, parserData.runs)
+    finally:
+        stub.stop()
+
+    if parserData.json:
+        print(json.dumps({'latency': parserData.latency,
+                          'jitter': parserData.jitter,
+                          'runs': parserData.runs,
+                          'scenarios': results}, indent=2))
+        return None
+
+    print('{} runs per scenario, stub latency {} ms +/- {} ms'.format(
+          parserData.runs, parserData.latency, parserData.jitter))
+    print('{:<20} {:>9} {:>9} {:>9} {:>9} {:>10} {:>12}'.format(
+          'scenario', 'p50 ms', 'p95 ms', 'p99 ms', 'mean ms', 'requests',
+          'peak KiB'))
+    for name, result in results.items():
+        print('{:<20} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>10} {:>12.0f}'
+              .format(name, result['p50'], result['p95'], result['p99'],
+                      result['mean'], result['requests'],
+                      result['peakMemory'] / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,1643 @@
-from prettytable import PrettyTable
 import json
-import requests
 import sys
+import os
+import time
+import hashlib
+import random
+import re
+import threading
 import argparse
+import textwrap
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
 from timeit import default_timer as timer
 
+# requests, asyncio, sqlite3, concurrent.futures and the server modules are
+# imported by the functions that need them, so that a search answered from
+# the cache or the local copy starts fast and never loads the HTTP stack
+
 API = 'http://ffrkapi.azurewebsites.net/api/v1.0/'
 TABLE_WIDTH = 200
+MAX_WORKERS = 8         # concurrent soulbreak detail requests
+REQUEST_TIMEOUT = 10    # seconds, per request
+CONNECT_TIMEOUT = 3.05  # seconds, to open a connection
+POOL_SIZE = 16          # kept-alive connections to the API
+RETRIES = 3             # retries on 429, 5xx and connection errors
+BACKOFF = 0.5           # seconds, base of the exponential backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT = 50.0       # requests per second allowed by the token bucket
+RATE_BURST = 50         # requests that may be sent at once
+SLOW_LATENCY = 2.0      # seconds, responses slower than this back off
+RELEASE_POLL = 0.01     # seconds between async checks for a free slot
+CACHE_DIR = os.environ.get('FFRK_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'),
+                                        '.cache', 'ffrk'))
+CACHE_MAX_BYTES = 50 * 1024 * 1024
+CACHE_MEMORY_ENTRIES = 1024     # decoded responses kept in memory
+RENDER_CACHE_ENTRIES = 256      # rendered search results kept in memory
+RENDER_CACHE_BYTES = 16 * 1024 * 1024
+RENDER_CACHE_TTL = 10 * 60      # seconds a rendered result is reused
+DATA_DIR = os.environ.get('FFRK_DATA_DIR',
+                          os.path.join(os.path.expanduser('~'),
+                                       '.local', 'share', 'ffrk'))
+DB_PATH = os.path.join(DATA_DIR, 'ffrk.sqlite3')
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'ffrk.snapshot')
+SOCKET_PATH = os.path.join(DATA_DIR, 'ffrk.sock')
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8080
+SERVER_WORKERS = 8      # requests served concurrently
+CHAR_PREFIX = 'char:'   # marks a find term as a character name
+MIN_SIMILARITY = 0.4    # Dice similarity for a trigram name match
+PREFIX_SCORE = 0.9      # lowest score of a character picked by itself
+
+DAY = 24 * 60 * 60
+
+# time to live of cached API responses in seconds, by endpoint prefix
+# the longest matching prefix wins
+cacheTtl = {
+    '': DAY,
+    'Characters/': 7 * DAY,
+    'SoulBreaks/': 7 * DAY,
+    'SoulBreaks/Name/': 3 * DAY,
+    'SoulBreaks/Tier/': 3 * DAY,
+    'SoulBreaks/Effect/': 3 * DAY,
+}
 
 
-def time_this(func):
-
-    def wrapper(*args, **kwargs):
-        start = timer()
-        result = func(*args, **kwargs)
-        end = timer()
-        duration = end - start
-        print('Execution time: ', duration)
+class ApiError(Exception):
+    """ The FFRK API could not be reached or answered with an error """
+
+
+class SearchError(Exception):
+    """ A name matched several characters (ambiguous) or nothing; the
+    candidates are the names the user may have meant """
+
+    def __init__(self, message, candidates=(), ambiguous=False):
+        super().__init__(message)
+        self.candidates = list(candidates)
+        self.ambiguous = ambiguous
+
+
+class Metrics:
+    """ Counts and latency histograms, by name """
+
+    buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+               10)
+    samples = 1000      # latencies kept per name for the percentiles
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def record(self, name, seconds, error=False):
+        with self.lock:
+            series = self.series.setdefault(name, {
+                'count': 0,
+                'errors': 0,
+                'total': 0.0,
+                'max': 0.0,
+                'histogram': [0] * (len(self.buckets) + 1),
+                'recent': [],
+                })
+            series['count'] += 1
+            series['errors'] += int(error)
+            series['total'] += seconds
+            series['max'] = max(series['max'], seconds)
+            series['histogram'][bisect_left(self.buckets, seconds)] += 1
+            series['recent'].append(seconds)
+            if len(series['recent']) > self.samples:
+                del series['recent'][0]
+
+    def snapshot(self):
+        """
+        output: a dictionary by name of the count, errors, mean, max and
+                50th/95th/99th latency percentiles in seconds, and the
+                histogram as a dictionary of bucket upper bound to count"""
+
+        result = {}
+        with self.lock:
+            for name, series in self.series.items():
+                recent = sorted(series['recent'])
+
+                def percentile(fraction):
+                    return recent[min(len(recent) - 1,
+                                      int(fraction * len(recent)))]
+
+                bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+                result[name] = {
+                    'count': series['count'],
+                    'errors': series['errors'],
+                    'mean': series['total'] / series['count'],
+                    'max': series['max'],
+                    'p50': percentile(0.5),
+                    'p95': percentile(0.95),
+                    'p99': percentile(0.99),
+                    'histogram': dict(zip(bounds, series['histogram'])),
+                    }
         return result
 
-    return wrapper
 
+class Profiler:
+    """ Named spans around the phases of the commands, and the API requests
+    by endpoint, both as Metrics.
 
-class Timer:
-    """ A timer context manager for performance testing"""
+    The phases are fetch (apiGet, the cache included), http (each request
+    sent), parse (json decoding), store and snapshot (queries of the local
+    copy), index (building the in-memory indexes), filter, wait (for the
+    fetching threads), decode (sb data to output rows) and render. Spans
+    nest, http and parse run inside fetch for instance, and the spans of
+    concurrent threads add up, so the sum of the phases may exceed the
+    wall time. The counters run for the life of the process; a profiled
+    command resets them first."""
 
-    def __init__(self, name):
-        self.name = name
+    def __init__(self):
+        self.spans = Metrics()
+        self.requests = Metrics()
+        self.start = timer()
 
-    def __enter__(self):
+    @contextmanager
+    def span(self, name):
+        start = timer()
+        try:
+            yield
+        finally:
+            self.spans.record(name, timer() - start)
+
+    def request(self, url, seconds, status=None):
+        """
+        input:  the requested URL, the request time in seconds, the HTTP
+                status or None if the request failed
+        output: None, counts the request under its endpoint"""
+
+        self.requests.record(endpointName(url), seconds,
+                             error=status is None or status >= 400)
+
+    def reset(self):
+        self.spans = Metrics()
+        self.requests = Metrics()
         self.start = timer()
+
+    def report(self):
+        """
+        output: a dictionary of the wall time in seconds since the start or
+                the last reset, the phase and the endpoint metrics"""
+
+        return {
+            'wall': timer() - self.start,
+            'phases': self.spans.snapshot(),
+            'endpoints': self.requests.snapshot(),
+            }
+
+
+def endpointName(url):
+    """
+    input:  a URL or an endpoint path relative to API
+    output: the endpoint without its argument, eg: 'SoulBreaks/Tier' for
+            SoulBreaks/Tier/8 or 'SoulBreaks/{id}' for SoulBreaks/123"""
+
+    parts = url[len(API):].split('/') if url.startswith(API) else url.split('/')
+    if len(parts) > 2:
+        return '/'.join(parts[:2])
+    if len(parts) == 2 and parts[1].isdigit():
+        return parts[0] + '/{id}'
+    return '/'.join(parts)
+
+
+profiler = Profiler()
+
+
+class RateLimiter:
+    """ A token bucket rate limiter with an adaptive concurrency limit.
+
+    The concurrency limit grows by about 1 per round trip while responses
+    are fast (additive increase) and is halved on a 429 or a response
+    slower than slowLatency (multiplicative decrease). A 429 also halves
+    the request rate, which then recovers gradually."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST,
+                 maxConcurrency=POOL_SIZE, slowLatency=SLOW_LATENCY):
+        self.maxRate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.maxConcurrency = maxConcurrency
+        self.concurrency = float(maxConcurrency)
+        self.slowLatency = slowLatency
+        self.inFlight = 0
+        self.queued = 0
+        self.updated = timer()
+        self.condition = threading.Condition()
+
+    def refill(self):
+        now = timer()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def admit(self):
+        """
+        output: 0 if a request may be sent now, then counted in flight,
+                else the seconds to wait before asking again, or None to
+                wait for a release. Called with the condition held."""
+
+        self.refill()
+        if self.inFlight >= int(self.concurrency):
+            return None
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+
+        self.inFlight += 1
+        self.tokens -= 1
+        return 0
+
+    def acquire(self):
+        """ Blocks until a request may be sent """
+
+        with self.condition:
+            self.queued += 1
+            wait = self.admit()
+            while wait != 0:
+                self.condition.wait(wait)   # None: woken up by release
+                wait = self.admit()
+            self.queued -= 1
+
+    async def acquireAsync(self):
+        """ Waits, without blocking the event loop, until a request may be
+        sent; release() does not wake coroutines, so they poll """
+
+        import asyncio
+
+        with self.condition:
+            self.queued += 1
+        try:
+            while True:
+                with self.condition:
+                    wait = self.admit()
+                if wait == 0:
+                    return
+                await asyncio.sleep(RELEASE_POLL if wait is None else wait)
+        finally:
+            with self.condition:
+                self.queued -= 1
+
+    def release(self, latency, status=None):
+        """
+        input:  the request latency in seconds, the response status code
+                or None if the request failed
+        output: None, adapts the limits to the outcome of the request"""
+
+        with self.condition:
+            self.inFlight -= 1
+            if status == 429 or latency > self.slowLatency:
+                self.concurrency = max(1.0, self.concurrency / 2)
+                if status == 429:
+                    self.rate = max(1.0, self.rate / 2)
+            elif status is not None:
+                self.concurrency = min(self.maxConcurrency,
+                                       self.concurrency +
+                                       1 / self.concurrency)
+                self.rate = min(self.maxRate, self.rate + 0.5)
+            self.condition.notify_all()
+
+    def stats(self):
+        """ output: a dictionary of the current limits and queue depth """
+
+        with self.condition:
+            return {
+                'rate': round(self.rate, 2),
+                'concurrency': int(self.concurrency),
+                'inFlight': self.inFlight,
+                'queued': self.queued,
+                }
+
+
+limiter = RateLimiter()
+
+
+def retryDelay(attempt, backoff=BACKOFF, retryAfter=None):
+    """
+    input:  the number of the failed attempt, the base of the backoff in
+            seconds, optionally the Retry-After header of the response
+    output: a float, the seconds to wait before the next attempt"""
+
+    if retryAfter and retryAfter.isdigit():
+        return float(retryAfter)
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+class Transport:
+    """ The HTTP transport shared by all API calls.
+
+    Keeps a pool of kept-alive connections and retries 429, 5xx and
+    connection errors with a jittered exponential backoff. Every attempt
+    goes through the shared RateLimiter."""
+
+    def __init__(self, poolSize=POOL_SIZE, retries=RETRIES, backoff=BACKOFF):
+        import requests
+
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        adapter = requests.adapters.HTTPAdapter(pool_connections=poolSize,
+                                                pool_maxsize=poolSize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, headers=None, timeout=REQUEST_TIMEOUT):
+        """
+        input:  the full request URL, optionally extra request headers and
+                the read timeout in seconds
+        output: a requests Response object
+                raises ApiError once all the retries failed"""
+
+        import requests
+
+        for attempt in range(self.retries + 1):
+            limiter.acquire()
+            start = timer()
+            try:
+                response = self.session.get(url, headers=headers,
+                                            timeout=(CONNECT_TIMEOUT, timeout))
+            except requests.exceptions.RequestException as error:
+                limiter.release(timer() - start)
+                self.record(url, timer() - start)
+                if attempt == self.retries or not isinstance(
+                        error, (requests.exceptions.ConnectionError,
+                                requests.exceptions.Timeout)):
+                    raise ApiError(str(error)) from error
+                time.sleep(retryDelay(attempt, self.backoff))
+                continue
+            limiter.release(timer() - start, response.status_code)
+            self.record(url, timer() - start, response.status_code)
+
+            if (response.status_code not in RETRY_STATUSES
+                    or attempt == self.retries):
+                return response
+            time.sleep(retryDelay(attempt, self.backoff,
+                                  response.headers.get('Retry-After')))
+
+    @staticmethod
+    def record(url, seconds, status=None):
+        profiler.spans.record('http', seconds)
+        profiler.request(url, seconds, status)
+
+
+def getTransport():
+    """ output: the shared Transport, created on first use """
+
+    global transport
+
+    with transportLock:
+        if transport is None:
+            transport = Transport()
+    return transport
+
+
+transport = None
+transportLock = threading.Lock()
+
+
+class ApiCache:
+    """ A persistent on-disk cache of API responses, keyed by URL.
+
+    Entries older than their endpoint TTL are revalidated with the stored
+    ETag / Last-Modified headers. The least recently used entries are
+    removed once the cache grows over maxBytes. The most recently used
+    entries are also kept in memory with their decoded data, so a
+    long-running process does not reread nor redecode them."""
+
+    def __init__(self, directory=CACHE_DIR, maxBytes=CACHE_MAX_BYTES,
+                 memoryEntries=CACHE_MEMORY_ENTRIES):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.memoryEntries = memoryEntries
+        self.memory = OrderedDict()
+        self.enabled = True     # False: never read nor write the cache
+        self.refresh = False    # True: revalidate entries regardless of TTL
+        self.size = None
+        self.lock = threading.Lock()
+
+    def path(self, url):
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json'
+        return os.path.join(self.directory, name)
+
+    def ttl(self, url):
+        endpoint = url[len(API):] if url.startswith(API) else url
+        prefix = max((prefix for prefix in cacheTtl
+                             if endpoint.startswith(prefix)), key=len)
+        return cacheTtl[prefix]
+
+    def get(self, url):
+        """
+        input:  a string, the full request URL
+        output: the cached entry as a dictionary, or None if not cached"""
+
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            if url in self.memory:
+                self.memory.move_to_end(url)
+                return self.memory[url]
+
+        path = self.path(url)
+        try:
+            with open(path, encoding='utf-8') as cacheFile:
+                entry = json.load(cacheFile)
+            os.utime(path)      # mark as recently used
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('url') != url:
+            return None
+        self.remember(entry)
+        return entry
+
+    def remember(self, entry):
+        with self.lock:
+            self.memory[entry['url']] = entry
+            self.memory.move_to_end(entry['url'])
+            while len(self.memory) > self.memoryEntries:
+                self.memory.popitem(last=False)
+
+    @staticmethod
+    def data(entry):
+        """
+        input:  a cache entry
+        output: the decoded json body of the entry, decoded only once"""
+
+        if 'data' not in entry:
+            with profiler.span('parse'):
+                entry['data'] = json.loads(entry['body'])
+        return entry['data']
+
+    def isFresh(self, entry):
+        if self.refresh:
+            return False
+        return time.time() - entry['fetched'] < self.ttl(entry['url'])
+
+    def put(self, url, body, etag=None, lastModified=None):
+        """
+        input:  the full request URL, the response text and, optionally,
+                the ETag and Last-Modified response headers
+        output: the new cache entry, also written to disk"""
+
+        if not self.enabled:
+            return None
+
+        entry = {
+            'url': url,
+            'fetched': time.time(),
+            'etag': etag,
+            'lastModified': lastModified,
+            'body': body,
+            }
+        path = self.path(url)
+        tmpPath = path + '.' + str(threading.get_ident()) + '.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmpPath, 'w', encoding='utf-8') as cacheFile:
+                json.dump(entry, cacheFile)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:     # a new entry
+                replaced = 0
+            os.replace(tmpPath, path)
+            written = os.path.getsize(path)
+        except OSError:
+            return entry
+        finally:
+            self.remember(entry)
+
+        with self.lock:
+            if self.size is None:
+                self.size = self.diskUsage()
+            else:
+                self.size += written - replaced
+            if self.size > self.maxBytes:
+                self.evict()
+        return entry
+
+    def touch(self, entry):
+        """ Marks a revalidated entry as freshly fetched """
+
+        newEntry = self.put(entry['url'], entry['body'],
+                            entry.get('etag'), entry.get('lastModified'))
+        if newEntry is not None and 'data' in entry:
+            newEntry['data'] = entry['data']
+
+    def entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+
+        paths = [os.path.join(self.directory, name) for name in names
+                                                    if name.endswith('.json')]
+        stats = []
+        for path in paths:
+            try:
+                stats.append((path, os.stat(path)))
+            except OSError:
+                pass
+        return stats
+
+    def diskUsage(self):
+        return sum(stat.st_size for path, stat in self.entries())
+
+    def evict(self):
+        """ Removes least recently used entries until the cache uses
+        at most 90% of maxBytes """
+
+        stats = sorted(self.entries(), key=lambda entry: entry[1].st_mtime)
+        self.size = sum(stat.st_size for path, stat in stats)
+        target = self.maxBytes * 0.9
+        for path, stat in stats:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= stat.st_size
+
+
+cache = ApiCache()
+
+
+class RenderCache:
+    """ The printed output of the latest searches, kept in memory so a
+    repeated search in a long-running process (shell, daemon, batch)
+    prints it again without fetching, decoding nor rendering anything.
+
+    Entries expire after ttl seconds and the least recently used ones are
+    dropped past maxEntries or maxBytes. invalidate() drops them all when
+    the data they were rendered from changes; its generation counter also
+    keeps the output of a search rendered across the change from being
+    saved, as does a soulbreak that could not be fetched."""
+
+    def __init__(self, maxEntries=RENDER_CACHE_ENTRIES,
+                 maxBytes=RENDER_CACHE_BYTES, ttl=RENDER_CACHE_TTL):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.entries = OrderedDict()    # key: (expiry time, output)
+        self.size = 0
+        self.generation = 0
+        self.failures = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def stamp(self):
+        """ output: a value that changes on invalidation or failed fetch """
+
+        return (self.generation, self.failures)
+
+    def get(self, key):
+        """
+        input:  a search key, see searchKey
+        output: the saved output of the search, or None"""
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                self.drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, output, stamp):
+        """
+        input:  a search key, its output and the stamp taken before it was
+                rendered
+        output: None, saves the output unless the stamp changed meanwhile"""
+
+        with self.lock:
+            if stamp != self.stamp() or len(output) > self.maxBytes:
+                return None
+
+            if key in self.entries:
+                self.drop(key)
+            self.entries[key] = (time.time() + self.ttl, output)
+            self.size += len(output)
+            while (len(self.entries) > self.maxEntries
+                   or self.size > self.maxBytes):
+                self.drop(next(iter(self.entries)))
+
+    def drop(self, key):
+        self.size -= len(self.entries.pop(key)[1])
+
+    def invalidate(self):
+        """ Drops every saved output, the data has changed """
+
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.size = 0
+
+    def failed(self):
+        """ Keeps the searches being rendered from being saved """
+
+        with self.lock:
+            self.failures += 1
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size,
+                    'hits': self.hits, 'misses': self.misses,
+                    'generation': self.generation}
+
+
+renderCache = RenderCache()
+
+
+class LocalStore:
+    """ A local SQLite mirror of the characters, relics and soulbreaks.
+
+    Filled by 'ffrk.py sync'. In offline mode, apiGet answers the
+    endpoints used by the searches from the indexed tables instead of
+    the REST API."""
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT);
+        CREATE TABLE IF NOT EXISTS characters (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            nameLower TEXT,
+            data TEXT);
+        CREATE INDEX IF NOT EXISTS characters_name
+            ON characters (nameLower);
+        CREATE TABLE IF NOT EXISTS relics (
+            id INTEGER PRIMARY KEY,
+            characterName TEXT,
+            soulBreakId INTEGER,
+            data TEXT);
+        CREATE TABLE IF NOT EXISTS soulbreaks (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            nameLower TEXT,
+            characterName TEXT,
+            tier INTEGER,
+            searchText TEXT,
+            data TEXT);
+        CREATE INDEX IF NOT EXISTS soulbreaks_tier ON soulbreaks (tier);
+        CREATE INDEX IF NOT EXISTS soulbreaks_name ON soulbreaks (nameLower);
+        CREATE TABLE IF NOT EXISTS soulbreak_elements (
+            element INTEGER,
+            soulBreakId INTEGER,
+            PRIMARY KEY (element, soulBreakId)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS soulbreak_statuses (
+            statusType TEXT,
+            element INTEGER,
+            soulBreakId INTEGER,
+            PRIMARY KEY (statusType, element, soulBreakId)) WITHOUT ROWID;
+        """
+
+    def __init__(self, path=DB_PATH, snapshotPath=SNAPSHOT_PATH):
+        self.path = path
+        self.offline = False
+        self.connection = None
+        self.lock = threading.RLock()
+        self.snapshot = Snapshot(snapshotPath)
+
+    def connect(self):
+        import sqlite3
+
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.connection = sqlite3.connect(self.path,
+                                              check_same_thread=False)
+            self.connection.executescript(self.schema)
+        return self.connection
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def query(self, sql, params=()):
+        with profiler.span('store'), self.lock:
+            return self.connect().execute(sql, params).fetchall()
+
+    def get(self, endpoint):
+        """
+        input:  a string, the endpoint path relative to API
+        output: the same decoded data the API would return for the endpoint,
+                read from the local tables"""
+
+        parts = endpoint.split('/', 2)
+
+        if parts[0] == 'Characters' and len(parts) == 3 and parts[1] == 'Name':
+            return self.charactersByName(parts[2])
+        elif parts[0] == 'SoulBreaks' and len(parts) == 3:
+            source = self.soulBreakSource()
+            if parts[1] == 'Name':
+                return source.soulBreaksByName(parts[2])
+            elif parts[1] == 'Tier':
+                return source.soulBreaksByTier(int(parts[2]))
+            elif parts[1] == 'Effect':
+                return source.soulBreaksByEffect(parts[2])
+        elif parts[0] == 'SoulBreaks' and len(parts) == 2:
+            return self.soulBreakSource().soulBreaksById([int(parts[1])])
+
+        raise ValueError('Endpoint not available offline: ' + endpoint)
+
+    def soulBreakSource(self):
+        """
+        output: the snapshot if it is usable and not older than the tables,
+                otherwise the store itself. Both answer the same
+                soulBreaksBy* methods."""
+
+        if self.snapshot.open(newerThan=self.path):
+            return self.snapshot
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.end = timer()
-        print("Execution time for {} =".format(self.name),
-              self.end - self.start)
+    def writeSnapshot(self):
+        """ output: None, writes the snapshot of the stored soulbreaks """
+
+        writeSnapshot(self.allSoulBreaks(), self.snapshot.path)
+        self.snapshot.close()
+
+    def charactersByName(self, name):
+        name = name.lower()
+        rows = self.query('SELECT data FROM characters WHERE nameLower = ?',
+                          (name,))
+        if not rows:
+            rows = self.query("""SELECT data FROM characters
+                                 WHERE instr(nameLower, ?) ORDER BY id""",
+                              (name,))
+        return [json.loads(row[0]) for row in rows]
+
+    def soulBreaksByName(self, name):
+        rows = self.query("""SELECT data FROM soulbreaks
+                             WHERE instr(nameLower, ?) ORDER BY id""",
+                          (name.lower(),))
+        return [json.loads(row[0]) for row in rows]
+
+    def soulBreaksByTier(self, sbTier):
+        rows = self.query('SELECT data FROM soulbreaks WHERE tier = ? '
+                          'ORDER BY id', (sbTier,))
+        return [json.loads(row[0]) for row in rows]
+
+    def soulBreaksByElement(self, sbTier, element):
+        rows = self.query("""SELECT s.data FROM soulbreak_elements e
+                             JOIN soulbreaks s ON s.id = e.soulBreakId
+                             WHERE e.element = ? AND s.tier = ?
+                             ORDER BY s.id""", (element, sbTier))
+        return [json.loads(row[0]) for row in rows]
+
+    def soulBreaksByStatus(self, statusType, element):
+        """
+        input:  a string, 'imperil' or 'attach', an integer, the element ID
+        output: a list of dictionaries containing the sb data
+
+        Uses the parsed effects; falls back to a text search for copies
+        synced before effects were parsed."""
+
+        if not self.query('SELECT 1 FROM soulbreak_statuses LIMIT 1'):
+            return self.soulBreaksByEffect(statusType + ' ' +
+                                           elements[element])
+
+        rows = self.query("""SELECT s.data FROM soulbreak_statuses e
+                             JOIN soulbreaks s ON s.id = e.soulBreakId
+                             WHERE e.statusType = ? AND e.element = ?
+                             ORDER BY s.id""", (statusType, element))
+        return [json.loads(row[0]) for row in rows]
+
+    def soulBreaksByEffect(self, searchStr):
+        rows = self.query("""SELECT data FROM soulbreaks
+                             WHERE instr(searchText, ?) ORDER BY id""",
+                          (searchStr.lower(),))
+        return [json.loads(row[0]) for row in rows]
+
+    def soulBreaksById(self, sbIdList):
+        marks = ', '.join('?' * len(sbIdList))
+        rows = self.query('SELECT data FROM soulbreaks WHERE id IN (' +
+                          marks + ') ORDER BY id', list(sbIdList))
+        return [json.loads(row[0]) for row in rows]
+
+    def storeAll(self, characters, relics, sbList):
+        """
+        input:  lists of character, relic and soulbreak dictionaries as
+                returned by the API
+        output: None, replaces the stored data"""
+
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute('DELETE FROM characters')
+                connection.execute('DELETE FROM relics')
+                connection.execute('DELETE FROM soulbreaks')
+                connection.execute('DELETE FROM soulbreak_elements')
+                connection.execute('DELETE FROM soulbreak_statuses')
+                connection.executemany(
+                    'INSERT INTO characters VALUES (?, ?, ?, ?)',
+                    [characterRow(c) for c in characters])
+                connection.executemany(
+                    'INSERT INTO relics VALUES (?, ?, ?, ?)',
+                    [relicRow(r) for r in relics])
+                connection.executemany(
+                    'INSERT INTO soulbreaks VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [soulBreakRow(sb) for sb in sbList])
+                connection.executemany(
+                    'INSERT OR IGNORE INTO soulbreak_elements VALUES (?, ?)',
+                    [(element, sb['id']) for sb in sbList
+                                         for element in sb['elements']])
+                connection.executemany(
+                    'INSERT OR IGNORE INTO soulbreak_statuses '
+                    'VALUES (?, ?, ?)',
+                    [row for sb in sbList for row in statusRows(sb)])
+                connection.execute(
+                    'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                    ('synced', str(time.time())))
+
+    def allSoulBreaks(self):
+        rows = self.query('SELECT data FROM soulbreaks ORDER BY id')
+        return [json.loads(row[0]) for row in rows]
+
+    def allCharacters(self):
+        rows = self.query('SELECT data FROM characters ORDER BY id')
+        return [json.loads(row[0]) for row in rows]
+
+    def storedSoulBreaks(self, sbTier):
+        """
+        input:  an integer representing the sb tier
+        output: a dictionary of stored sb data by sb ID"""
+
+        return {sb['id']: sb for sb in self.soulBreaksByTier(sbTier)}
+
+    def storedCharacters(self):
+        """ output: a dictionary of stored character data by character ID"""
+
+        rows = self.query('SELECT data FROM characters')
+        charList = [json.loads(row[0]) for row in rows]
+        return {charData['id']: charData for charData in charList}
+
+    def upsertSoulBreaks(self, sbList):
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO soulbreaks '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [soulBreakRow(sb) for sb in sbList])
+                connection.executemany(
+                    'DELETE FROM soulbreak_elements WHERE soulBreakId = ?',
+                    [(sb['id'],) for sb in sbList])
+                connection.executemany(
+                    'INSERT OR IGNORE INTO soulbreak_elements VALUES (?, ?)',
+                    [(element, sb['id']) for sb in sbList
+                                         for element in sb['elements']])
+                connection.executemany(
+                    'DELETE FROM soulbreak_statuses WHERE soulBreakId = ?',
+                    [(sb['id'],) for sb in sbList])
+                connection.executemany(
+                    'INSERT OR IGNORE INTO soulbreak_statuses '
+                    'VALUES (?, ?, ?)',
+                    [row for sb in sbList for row in statusRows(sb)])
+
+    def deleteSoulBreaks(self, sbIdList):
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.executemany(
+                    'DELETE FROM soulbreaks WHERE id = ?',
+                    [(sbId,) for sbId in sbIdList])
+                connection.executemany(
+                    'DELETE FROM soulbreak_elements WHERE soulBreakId = ?',
+                    [(sbId,) for sbId in sbIdList])
+                connection.executemany(
+                    'DELETE FROM soulbreak_statuses WHERE soulBreakId = ?',
+                    [(sbId,) for sbId in sbIdList])
+
+    def upsertCharacters(self, charList):
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO characters VALUES (?, ?, ?, ?)',
+                    [characterRow(c) for c in charList])
+
+    def deleteCharacters(self, charIdList):
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.executemany(
+                    'DELETE FROM characters WHERE id = ?',
+                    [(charId,) for charId in charIdList])
+
+    def setMeta(self, key, value):
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                   (key, value))
+
+    def hasData(self):
+        return (self.exists() and
+                bool(self.query('SELECT 1 FROM soulbreaks LIMIT 1')))
+
+    def soulBreakNames(self):
+        return self.query('SELECT id, name FROM soulbreaks ORDER BY id')
+
+    def counts(self):
+        return {table: self.query('SELECT count(*) FROM ' + table)[0][0]
+                for table in ('characters', 'relics', 'soulbreaks')}
+
+
+def recordHash(record, keys=None):
+    """
+    input:  a dictionary as returned by the API, optionally the keys to hash
+    output: a string, the content hash of the record over the given keys
+            (all keys by default)"""
+
+    if keys is None:
+        keys = record.keys()
+    # parsedEffects is derived locally, never sent by the API
+    record = {key: record.get(key) for key in keys if key != 'parsedEffects'}
+    text = json.dumps(record, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def diffRecords(stored, fetched):
+    """
+    input:  a dictionary of stored records by ID, a list of freshly fetched
+            (possibly partial) records
+    output: a tuple of 3 lists: the added and updated fetched records, and
+            the IDs of the stored records that are missing from fetched
+
+    Stored records are hashed over the keys of the fetched record, so a
+    partial listing compares equal to the full stored record."""
+
+    added = []
+    updated = []
+    for record in fetched:
+        if record['id'] not in stored:
+            added.append(record)
+        elif (recordHash(record) !=
+              recordHash(stored[record['id']], record.keys())):
+            updated.append(record)
+
+    fetchedIds = {record['id'] for record in fetched}
+    removed = [recordId for recordId in stored if recordId not in fetchedIds]
+
+    return (added, updated, removed)
+
+
+def characterRow(charData):
+    return (charData['id'], charData['characterName'],
+            charData['characterName'].lower(), json.dumps(charData))
+
+
+def relicRow(relic):
+    return (relic['id'], relic.get('characterName'),
+            relic.get('soulBreakId'), json.dumps(relic))
+
+
+def soulBreakRow(sbData):
+    """
+    input:  a dictionary containing the sb data
+    output: a tuple, the matching row of the soulbreaks table, the data
+            stored as the API sent it, without the parsed effects"""
+
+    apiData = {key: value for key, value in sbData.items()
+               if key != 'parsedEffects'}
+
+    return (sbData['id'], sbData['soulBreakName'],
+            sbData['soulBreakName'].lower(), sbData['characterName'],
+            sbData['soulBreakTier'], searchText(sbData), json.dumps(apiData))
+
+
+def searchText(sbData):
+    """
+    input:  a dictionary containing the sb data
+    output: a string, the lowercased effects of the sb and of its commands,
+            statuses and other effects searched by the effect searches"""
+
+    text = [sbData['effects']]
+    for key in SB_DETAIL_FIELDS:
+        text.extend(item['effects'] for item in sbData.get(key) or [])
+    return '\n'.join(text).lower()
+
+
+def statusRows(sbData):
+    """
+    input:  a dictionary containing the sb data with its parsed effects
+    output: a list of tuples, the matching rows of the soulbreak_statuses
+            table"""
+
+    parsed = withParsedEffects(sbData)['parsedEffects']
+    return [(statusType, element, sbData['id'])
+            for statusType in ('imperil', 'attach')
+            for element in parsed[statusType]]
+
+
+# columns of the snapshot tables: (API key, type code)
+# type codes: 'i' integer, 'd' float, 's' string, 'l' list of small integers
+SNAPSHOT_TABLES = {
+    'sb': [
+        ('id', 'i'),
+        ('characterName', 's'),
+        ('soulBreakName', 's'),
+        ('soulBreakTier', 'i'),
+        ('targetType', 'i'),
+        ('multiplier', 'd'),
+        ('elements', 'l'),
+        ('castTime', 'd'),
+        ('effects', 's'),
+        ('school', 'i'),
+        ],
+    'cmd': [
+        ('sourceSoulBreakName', 's'),
+        ('commandName', 's'),
+        ('school', 'i'),
+        ('targetType', 'i'),
+        ('multiplier', 'd'),
+        ('elements', 'l'),
+        ('castTime', 'd'),
+        ('effects', 's'),
+        ('soulBreakPointsGained', 'i'),
+        ],
+    'st': [
+        ('id', 'i'),
+        ('commonName', 's'),
+        ('effects', 's'),
+        ('defaultDuration', 'i'),
+        ],
+    }
+SNAPSHOT_MAGIC = b'FFRKSNP2'
+NO_INT = -2 ** 31       # an absent key in the integer columns, NaN in floats
+NO_STRING = 2 ** 32 - 1
+ABSENT_KEY = '.absent'  # extra json entry listing the absent list keys
+# type code: (python type, array type code, value standing for None)
+SNAPSHOT_TYPES = {
+    'i': (int, 'i', NO_INT),
+    'd': (float, 'd', float('nan')),
+    's': (str, 'I', NO_STRING),
+    }
+
+
+def writeSnapshot(sbList, path=SNAPSHOT_PATH):
+    """
+    input:  a list of dictionaries containing the full sb data, the path of
+            the snapshot file
+    output: None, writes the binary snapshot read by Snapshot
+
+    The file holds one array per column: the values of the columns of
+    SNAPSHOT_TABLES, the row ranges of the commands and statuses of each
+    sb, the lowercased names and search texts, indexes of the rows by
+    tier, element, imperil and attach element, and a table of the
+    deduplicated strings. The fields that are not columns (or whose value
+    does not fit the column type, null included) are kept as a json string
+    per row, with the list and nested keys the record lacked, so that
+    Snapshot reads back the records as given. A json directory of the
+    arrays follows the magic number."""
+
+    from array import array
+
+    strings = {}
+    columns = {}
+
+    def stringIndex(value):
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    def column(name, typecode):
+        if name not in columns:
+            columns[name] = array(typecode)
+        return columns[name]
+
+    def addRow(table, record, skip=(), nested=()):
+        extra = {key: value for key, value in record.items()
+                 if key not in skip}
+        absent = [key for key in nested if key not in record]
+        for key, typecode in SNAPSHOT_TABLES[table]:
+            present = key in extra
+            value = extra.pop(key, None)
+            name = table + '.' + key
+            if typecode == 'l':
+                values = column(name, 'B')
+                if not present:
+                    absent.append(key)
+                    value = []
+                elif not isinstance(value, list) or not all(
+                        type(item) is int and 0 <= item < 256
+                        for item in value):
+                    extra[key] = value
+                    value = []
+                values.extend(value)
+                column(name + '.end', 'I').append(len(values))
+                continue
+
+            pyType, typecode, missing = SNAPSHOT_TYPES[typecode]
+            if not present:
+                value = missing
+            elif type(value) is not pyType or (
+                    pyType is int and not NO_INT < value < -NO_INT):
+                extra[key] = value
+                value = missing
+            elif pyType is str:
+                value = stringIndex(value)
+            column(name, typecode).append(value)
+        if absent:
+            extra[ABSENT_KEY] = absent
+        column(table + '.extra', 'I').append(
+            stringIndex(json.dumps(extra)) if extra else NO_STRING)
+
+    # every column exists, even for an empty list
+    for table, fields in SNAPSHOT_TABLES.items():
+        for key, typecode in fields:
+            if typecode == 'l':
+                column(table + '.' + key, 'B')
+                column(table + '.' + key + '.end', 'I')
+            else:
+                column(table + '.' + key, SNAPSHOT_TYPES[typecode][1])
+        column(table + '.extra', 'I')
+    for name in ('cmd.end', 'st.end'):
+        column('sb.' + name, 'I')
+
+    texts = {'sb.nameLower': [], 'sb.searchText': []}
+    postings = {'tier': {}, 'element': {}, 'imperil': {}, 'attach': {}}
+    sbList = sorted(sbList, key=lambda sb: sb['id'])
+    for row, sbData in enumerate(sbList):
+        sbData = withParsedEffects(dict(sbData))
+        addRow('sb', sbData, skip=('commands', 'statuses', 'parsedEffects'),
+               nested=('commands', 'statuses'))
+        for table, key in (('cmd', 'commands'), ('st', 'statuses')):
+            for item in sbData.get(key) or []:
+                addRow(table, item)
+            column('sb.' + table + '.end', 'I').append(
+                len(columns.get(table + '.extra', ())))
+
+        parsed = sbData['parsedEffects']
+        for name, keys in (('tier', [sbData['soulBreakTier']]),
+                           ('element', sbData['elements']),
+                           ('imperil', parsed['imperil']),
+                           ('attach', parsed['attach'])):
+            for key in set(keys or []):
+                if type(key) is int and NO_INT < key < -NO_INT:
+                    postings[name].setdefault(key, []).append(row)
+
+        texts['sb.nameLower'].append(sbData['soulBreakName'].lower())
+        texts['sb.searchText'].append(searchText(sbData))
+
+    # strings are stored as one utf-8 blob and the end offset of each;
+    # the search texts are separated by NUL bytes so matches can't span
+    blobs = {'strings': list(strings)}
+    blobs.update(texts)
+    data = {}
+    for name, values in blobs.items():
+        ends = array('I')
+        blob = bytearray()
+        for value in values:
+            blob += value.encode('utf-8') + b'\0'
+            ends.append(len(blob))
+        data[name + '.end'] = ends
+        data[name] = blob
+    for name, values in columns.items():
+        data[name] = values
+    # the sorted keys of each index, and the rows of each key
+    for name, index in postings.items():
+        keys, ends, rows = array('i'), array('I'), array('I')
+        for key in sorted(index):
+            keys.append(key)
+            rows.extend(index[key])
+            ends.append(len(rows))
+        data['index.' + name + '.keys'] = keys
+        data['index.' + name + '.end'] = ends
+        data['index.' + name] = rows
+
+    directory = {'byteorder': sys.byteorder, 'rows': len(sbList),
+                 'columns': {}}
+    offset = 0
+    for name, values in data.items():
+        typecode = values.typecode if isinstance(values, array) else 'B'
+        size = len(values) * (values.itemsize
+                              if isinstance(values, array) else 1)
+        directory['columns'][name] = [typecode, offset, size]
+        offset += size + -size % 8       # keep the arrays aligned
+    header = json.dumps(directory).encode('utf-8')
+    headerSize = len(SNAPSHOT_MAGIC) + 4 + len(header)
+    headerSize += -headerSize % 8
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(len(header).to_bytes(4, 'little'))
+        f.write(header.ljust(headerSize - len(SNAPSHOT_MAGIC) - 4))
+        for values in data.values():
+            raw = values.tobytes() if isinstance(values, array) else values
+            f.write(raw)
+            f.write(b'\0' * (-len(raw) % 8))
+    # open snapshots keep their mapping of the old file
+    os.replace(tmpPath, path)
+
+
+class Snapshot:
+    """ A read-only, memory-mapped binary snapshot of the soulbreaks,
+    written by writeSnapshot after each sync.
+
+    Opening the snapshot maps the file and reads its directory only; the
+    searches look up the row indexes or scan the name and search texts,
+    and decode only the rows they return, into the same dictionaries the
+    API sends: the keys a record lacked stay absent. LocalStore answers
+    the soulbreak searches from it when it is at least as recent as the
+    SQLite copy."""
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self.data = None
+        self.spans = None
+        self.columns = None
+        self.tables = None
+        self.strings = None
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    def open(self, newerThan=None):
+        """
+        input:  optionally the path of a file the snapshot must not be
+                older than
+        output: boolean, True if the snapshot is usable"""
+
+        import mmap
+
+        with self.lock:
+            if self.columns is not None:
+                return True
+            try:
+                if (newerThan and os.path.exists(newerThan)
+                        and os.path.getmtime(self.path)
+                            < os.path.getmtime(newerThan)):
+                    return False
+                with open(self.path, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return False
+
+            if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                return False
+            start = len(SNAPSHOT_MAGIC) + 4
+            headerSize = int.from_bytes(data[len(SNAPSHOT_MAGIC):start],
+                                        'little')
+            directory = json.loads(data[start:start + headerSize])
+            if directory['byteorder'] != sys.byteorder:
+                return False
+
+            base = start + headerSize
+            base += -base % 8
+            view = memoryview(data)
+            self.data = data
+            self.spans = {
+                name: (base + offset, base + offset + size)
+                for name, (typecode, offset, size)
+                in directory['columns'].items()}
+            self.columns = {
+                name: view[start:end].cast(directory['columns'][name][0])
+                for name, (start, end) in self.spans.items()}
+            self.rows = directory['rows']
+            self.strings = {}
+            self.tables = {
+                table: [(key, typecode, self.columns[table + '.' + key],
+                         self.columns.get(table + '.' + key + '.end'))
+                        for key, typecode in fields]
+                for table, fields in SNAPSHOT_TABLES.items()}
+            return True
+
+    def close(self):
+        """ Forgets the mapping, so the next search maps the file again """
+
+        with self.lock:
+            self.data = None
+            self.spans = None
+            self.columns = None
+            self.tables = None
+            self.strings = None
+            self.rows = 0
+
+    def text(self, name, index):
+        """
+        input:  the name of a strings column, an entry index
+        output: the string"""
+
+        ends = self.columns[name + '.end']
+        start = ends[index - 1] if index else 0
+        return self.columns[name][start:ends[index] - 1].tobytes().decode(
+               'utf-8')
+
+    def string(self, index):
+        """
+        input:  an index of the strings table
+        output: the string, decoded once per process"""
+
+        value = self.strings.get(index)
+        if value is None:
+            value = self.strings[index] = self.text('strings', index)
+        return value
+
+    def record(self, table, row, record=None):
+        """
+        input:  a table name of SNAPSHOT_TABLES, a row number, optionally
+                the dictionary of the nested values of the row
+        output: the dictionary of the row"""
+
+        record = {} if record is None else record
+        for key, typecode, values, ends in self.tables[table]:
+            if typecode == 'l':
+                record[key] = values[ends[row - 1] if row else 0:
+                                     ends[row]].tolist()
+                continue
+            value = values[row]
+            if typecode == 's':
+                if value == NO_STRING:
+                    continue
+                value = self.string(value)
+            elif typecode == 'i':
+                if value == NO_INT:
+                    continue
+            elif value != value:        # NaN
+                continue
+            record[key] = value
+
+        extra = self.columns[table + '.extra'][row]
+        if extra != NO_STRING:
+            extra = json.loads(self.string(extra))
+            for key in extra.pop(ABSENT_KEY, ()):
+                del record[key]
+            record.update(extra)
+        return record
+
+    def soulBreak(self, row):
+        """
+        input:  a row number of the sb table
+        output: a dictionary containing the full sb data"""
+
+        nested = {}
+        for table, key in (('cmd', 'commands'), ('st', 'statuses')):
+            ends = self.columns['sb.' + table + '.end']
+            nested[key] = [self.record(table, item) for item
+                           in range(ends[row - 1] if row else 0, ends[row])]
+        return self.record('sb', row, nested)
+
+    def soulBreaks(self, rows):
+        with profiler.span('snapshot'):
+            return [self.soulBreak(row) for row in rows]
+
+    def search(self, name, searchStr):
+        """
+        input:  the name of a text column, a lowercase string
+        output: the sorted row numbers whose text contains the string"""
+
+        if not searchStr:
+            return list(range(self.rows))
+
+        start, end = self.spans[name]
+        ends = self.columns[name + '.end']
+        needle = searchStr.encode('utf-8')
+        rows = []
+        position = self.data.find(needle, start, end)
+        while position != -1:
+            row = bisect_right(ends, position - start)
+            rows.append(row)
+            position = self.data.find(needle, start + ends[row], end)
+        return rows
+
+    def allSoulBreaks(self):
+        return self.soulBreaks(range(self.rows))
+
+    def soulBreaksById(self, sbIdList):
+        ids = self.columns['sb.id']
+        rows = []
+        for sbId in sorted(set(sbIdList)):
+            row = bisect_left(ids, sbId)
+            if row < self.rows and ids[row] == sbId:
+                rows.append(row)
+        return self.soulBreaks(rows)
+
+    def posting(self, name, key):
+        """
+        input:  an index name ('tier', 'element', 'imperil', 'attach'),
+                an integer key
+        output: the sorted list of the row numbers of the key"""
+
+        keys = self.columns['index.' + name + '.keys']
+        index = bisect_left(keys, key)
+        if index == len(keys) or keys[index] != key:
+            return []
+        ends = self.columns['index.' + name + '.end']
+        return self.columns['index.' + name][ends[index - 1] if index else 0:
+                                             ends[index]].tolist()
+
+    def soulBreaksByTier(self, sbTier):
+        return self.soulBreaks(self.posting('tier', sbTier))
+
+    def soulBreaksByName(self, name):
+        return self.soulBreaks(self.search('sb.nameLower', name.lower()))
+
+    def soulBreaksByEffect(self, searchStr):
+        return self.soulBreaks(self.search('sb.searchText',
+                                           searchStr.lower()))
+
+    def soulBreaksByElement(self, sbTier, element):
+        rows = set(self.posting('element', element))
+        return self.soulBreaks(sorted(rows.intersection(
+                                      self.posting('tier', sbTier))))
+
+    def soulBreaksByStatus(self, statusType, element):
+        return self.soulBreaks(self.posting(statusType, element))
+
+
+store = LocalStore()
+
+
+class SingleFlight:
+    """ Coalesces concurrent calls for the same key: the first caller runs
+    the call, the others wait for and share its result """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inFlight = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, function, *args):
+        """
+        input:  a hashable key, a function and its arguments
+        output: the result of function(*args), run once for all the callers
+                asking for the same key at the same time"""
+
+        with self.lock:
+            self.calls += 1
+            call = self.inFlight.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = {'done': threading.Event()}
+                self.inFlight[key] = call
+                leader = True
+
+        if leader:
+            try:
+                call['result'] = function(*args)
+            except BaseException as error:
+                call['error'] = error
+            finally:
+                with self.lock:
+                    del self.inFlight[key]
+                call['done'].set()
+        else:
+            call['done'].wait()
+
+        if 'error' in call:
+            raise call['error']
+        return call['result']
+
+    def stats(self):
+        """ output: a dictionary of the calls made and the calls that
+        shared the result of another one """
+
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'shared': self.shared,
+                'inFlight': len(self.inFlight),
+                }
+
+
+singleFlight = SingleFlight()
+
+
+def apiGet(endpoint, timeout=REQUEST_TIMEOUT):
+    """
+    input:  a string, the endpoint path relative to API,
+            optionally the request timeout in seconds
+    output: the decoded json response, served from the local store in
+            offline mode, or from the cache when fresh
+
+    Concurrent calls for the same endpoint share one request and its
+    decoded response."""
+
+    with profiler.span('fetch'):
+        if store.offline:
+            return store.get(endpoint)
+
+        url = API + endpoint
+        return singleFlight.do(url, fetchUrl, url, timeout)
+
+
+def fetchUrl(url, timeout=REQUEST_TIMEOUT):
+    """
+    input:  a string, the full request URL, the request timeout in seconds
+    output: the decoded json response, from the cache when fresh"""
+
+    entry = cache.get(url)
+    if entry and cache.isFresh(entry):
+        return cache.data(entry)
+
+    try:
+        response = getTransport().get(url, headers=conditionalHeaders(entry),
+                                      timeout=timeout)
+    except ApiError:
+        if entry:           # the API is down, serve the stale copy
+            return cache.data(entry)
+        raise
+
+    return responseData(url, entry, response.status_code, response.text,
+                        response.headers)
+
+
+def conditionalHeaders(entry):
+    """
+    input:  the cache entry of a URL, or None
+    output: a dictionary of the headers revalidating the entry"""
+
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('lastModified'):
+            headers['If-Modified-Since'] = entry['lastModified']
+    return headers
+
+
+def responseData(url, entry, status, text, headers):
+    """
+    input:  the request URL, its cache entry or None, the status code, text
+            and headers of the response
+    output: the decoded json response, saved in the cache; the cached data
+            on a 304, or on an error status if there is a cached copy
+            raises ApiError on an error status otherwise"""
+
+    if status == 304 and entry:
+        cache.touch(entry)
+        return cache.data(entry)
+    if status >= 400:
+        if entry:           # the API is down, serve the stale copy
+            return cache.data(entry)
+        raise ApiError('{} Error for url: {}'.format(status, url))
+
+    with profiler.span('parse'):
+        data = json.loads(text)
+    if entry and entry['body'] != text:
+        renderCache.invalidate()
+    newEntry = cache.put(url, text, headers.get('ETag'),
+                         headers.get('Last-Modified'))
+    if newEntry is not None:
+        newEntry['data'] = data
+    return data
+
+
+def configureCache(parserData):
+    """
+    input:  namespace object with parser results
+    output: None, applies the --no-cache, --refresh and --offline options"""
+
+    cache.enabled = not parserData.no_cache
+    cache.refresh = parserData.refresh
+    store.offline = parserData.offline
+
+    if store.offline and not store.exists():
+        print('No local copy of the game data found, searching online.')
+        usage(category='sync')
+        store.offline = False
+
+
+def resetOptions():
+    """
+    output: None, restores the defaults of the options applied by
+            configureCache, so that a command run by the shell or the daemon
+            does not change the next one"""
+
+    useDataSource((False, True, False))
+
+
+def dataSource():
+    """
+    output: a tuple of the options applied by configureCache: offline,
+            cache enabled and cache refresh"""
+
+    return (store.offline, cache.enabled, cache.refresh)
+
+
+def useDataSource(source):
+    """
+    input:  a tuple as returned by dataSource
+    output: None, applies the options"""
+
+    store.offline, cache.enabled, cache.refresh = source
 
 
 charAlias = {
@@ -103,6 +1705,11 @@ elements = {
 revElements = {elemName.lower():
                elemNum for elemNum, elemName in elements.items()}
 
+# the values of the tier and status searches, besides 'all'
+TIER_CHOICES = [name for name, number in tier.items() if number >= 5]
+ELEMENT_CHOICES = [name for name in revElements if name != '-']
+STATUS_CHOICES = ['imperil', 'attach']
+
 schools = {
     2: 'Bard',
     3: 'Black Magic',
@@ -149,6 +1756,34 @@ statusBlacklist = [
 
 otherEffectsBlacklist = [1]
 
+numberWords = {
+    'a': 1, 'one': 1, 'single': 1, 'two': 2, 'three': 3, 'four': 4,
+    'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+    'eleven': 11, 'twelve': 12,
+}
+
+STATS = '(?:ATK|DEF|MAG|RES|MND|SPD|ACC|EVA)'
+ELEMENT_LIST = r'(\w+(?:(?:/|, | and | or )\w+)*)'
+
+effectPatterns = {
+    'chain': re.compile(r'activates (\w+) chain', re.I),
+    'imperil': re.compile(r'imperils? ' + ELEMENT_LIST, re.I),
+    'attach': re.compile(r'attach ' + ELEMENT_LIST, re.I),
+    'hits': re.compile(r'(\w+) (?:single |group |random |ranged )*'
+                       r'(?:ranged )?attacks?\b', re.I),
+    'heals': re.compile(r'\bheals?\b|restores hp|\bhp\b.*\brestored',
+                        re.I),
+    'buffs': re.compile('(' + STATS + '(?:(?:/|, | and )' + STATS +
+                        r')*) \+\d+%'),
+    'debuffs': re.compile('(' + STATS + '(?:(?:/|, | and )' + STATS +
+                          r')*) -\d+%'),
+}
+
+# fields printSbResult needs, without and with details
+SB_FIELDS = ('characterName', 'soulBreakName', 'soulBreakTier', 'targetType',
+             'multiplier', 'elements', 'castTime', 'effects')
+SB_DETAIL_FIELDS = ('commands', 'statuses', 'otherEffects')
+
 # ********** FUNCTIONS ************************
 
 
@@ -186,6 +1821,82 @@ def decodeTarget(targetId):
     return targetTypes.get(targetId, str(targetId))
 
 
+def elementNumbers(text):
+    """
+    input:  a string listing element names, eg: 'Fire/Ice' or 'Fire and Ice'
+    output: a list of integers, the IDs of the recognised elements"""
+
+    names = re.split('/|, | and | or ', text.lower())
+    return [revElements[name] for name in names if name in revElements]
+
+
+def parseEffects(text):
+    """
+    input:  a string, the free-text effects of a soulbreak, command or status
+    output: a dictionary of the structured effects:
+          - chain: the element ID of the chain activated, or None
+          - imperil, attach: lists of element IDs
+          - hits: an integer, the number of attacks
+          - heals: a boolean
+          - buffs, debuffs: sorted lists of the stats raised or lowered"""
+
+    chain = effectPatterns['chain'].search(text)
+
+    hits = 0
+    for match in effectPatterns['hits'].finditer(text):
+        count = match.group(1).lower()
+        hits += int(count) if count.isdigit() else numberWords.get(count, 0)
+
+    def statList(pattern):
+        found = set()
+        for match in effectPatterns[pattern].finditer(text):
+            found.update(re.findall(STATS, match.group(1)))
+        return sorted(found)
+
+    def elementList(pattern):
+        found = []
+        for match in effectPatterns[pattern].finditer(text):
+            found.extend(element for element in elementNumbers(match.group(1))
+                                 if element not in found)
+        return found
+
+    return {
+        'chain': revElements.get(chain.group(1).lower()) if chain else None,
+        'imperil': elementList('imperil'),
+        'attach': elementList('attach'),
+        'hits': hits,
+        'heals': bool(effectPatterns['heals'].search(text)),
+        'buffs': statList('buffs'),
+        'debuffs': statList('debuffs'),
+        }
+
+
+def withParsedEffects(sbData):
+    """
+    input:  a dictionary containing the sb data
+    output: the same dictionary, with a 'parsedEffects' entry added if
+            missing
+
+    The sb's parsedEffects also gather the chain, imperil and attach
+    elements found in its commands and statuses, which are left as the API
+    sent them."""
+
+    if 'parsedEffects' in sbData:
+        return sbData
+
+    parsed = parseEffects(sbData['effects'])
+    for key in ('commands', 'statuses'):
+        for item in sbData.get(key) or []:
+            itemParsed = parseEffects(item['effects'])
+            for field in ('imperil', 'attach'):
+                parsed[field].extend(element for element in itemParsed[field]
+                                             if element not in parsed[field])
+            parsed['chain'] = parsed['chain'] or itemParsed['chain']
+
+    sbData['parsedEffects'] = parsed
+    return sbData
+
+
 def decodeSbType(sbTypeStr):
     """
     input:  a strings
@@ -210,12 +1921,17 @@ def getSbIdNum(sbName):
     """
     input:  a string
     output: a list of integers representing the id of all soulbreaks found
-          if no match is found, returns None"""
+          if no match is found, returns None
 
-    url = API + 'SoulBreaks/Name/' + sbName
+    The local names are searched first; unless offline, the API is asked
+    when they have no match, for soulbreaks added since the last sync."""
 
-    response = requests.get(url)
-    data = json.loads(response.text)
+    if hasLocalNames():
+        sbIdList = localSbIdNum(sbName)
+        if sbIdList or store.offline:
+            return sbIdList
+
+    data = apiGet('SoulBreaks/Name/' + sbName)
 
     if data:
         sbIdList = [sb['id'] for sb in data]
@@ -224,6 +1940,20 @@ def getSbIdNum(sbName):
         return None
 
 
+def localSbIdNum(sbName):
+    """
+    input:  a string
+    output: a sorted list of integers representing the id of the soulbreaks
+            whose name contains the string, as the API matches them, from
+            the local names; None if there is none"""
+
+    index = getNameIndex()
+    query = sbName.lower().strip()
+    sbIdList = sorted(sbId for name in index.names if query in name
+                           for sbId in index.values(name, 'soulbreak'))
+    return sbIdList or None
+
+
 def getSbIdList(args):
     """
     input:  a list of strings
@@ -237,6 +1967,21 @@ def getSbIdList(args):
           - if more than one character was found, returns None
           - if no character was found and there were 2 args, returns None """
 
+    try:
+        return findSbIdList(args)
+    except SearchError as error:
+        print(error)
+        return None
+
+
+def findSbIdList(args, notes=None):
+    """
+    input:  a list of strings as for getSbIdList, optionally a list
+            collecting the informative messages instead of printing them
+    output: a sorted list of integers representing the soulbreak IDs found;
+            raises SearchError when the name is ambiguous or nothing was
+            found"""
+
     charName = args[0]
     charName = charAlias.get(charName, charName)
 
@@ -245,25 +1990,56 @@ def getSbIdList(args):
     except IndexError:
         sbType = ''
 
-    url = API + 'Characters/Name/' + charName
-
-    response = requests.get(url)
-    data = json.loads(response.text)
+    data = []
+    if hasLocalNames():
+        data = resolveCharacters(charName, notes)
+        if not data and not sbType:
+            sbIdList = localSbIdNum(charName)
+            if sbIdList:
+                return sbIdList
+    # unless offline, ask the API for characters added since the last sync
+    if not data and not (hasLocalNames() and store.offline):
+        data = exactCharacters(apiGet('Characters/Name/' + charName),
+                               charName)
 
     if len(data) > 1:
-        print('More than 1 character found, please try again.')
-        return None
+        names = [charData['characterName'] for charData in data]
+        raise SearchError('More than 1 character found, did you mean: ' +
+                          ', '.join(names) + '?', names, ambiguous=True)
     elif len(data) == 0 and len(sbType) > 0:
-        print('Character name not found.')
-        return None
+        raise SearchError('Character name not found.' +
+                          suggestions(charName), suggestedNames(charName))
     elif len(data) == 0 and len(sbType) == 0:
-        if getSbIdNum(charName):    # no char found but sb by name found
-            return getSbIdNum(charName)
-        else:
-            print('No character or soulbreak found.')
-            return None
-    else:
-        charData = data[0]
+        sbIdList = getSbIdNum(charName)
+        if sbIdList:    # no char found but sb by name found
+            return sbIdList
+        raise SearchError('No character or soulbreak found.' +
+                          suggestions(charName), suggestedNames(charName))
+
+    sbIdList = getCharSbIdList(data[0], sbType)
+    if not sbIdList:
+        raise SearchError(data[0]['characterName'] +
+                          ' appears to not have any soulbreaks.')
+    return sbIdList
+
+
+def exactCharacters(charList, charName):
+    """
+    input:  a list of character dictionaries found by name, the name searched
+    output: the characters whose name is exactly the name searched, or the
+            whole list if there is none"""
+
+    exact = [charData for charData in charList
+                      if charData['characterName'].lower() == charName]
+    return exact or charList
+
+
+def getCharSbIdList(charData, sbType):
+    """
+    input:  a character dictionary, a string: the sb type and number wanted,
+            eg: 'usb2', or empty for all soulbreaks
+    output: a sorted list of integers representing the character's soulbreak
+            IDs matching the sb type, or None if there is none"""
 
     chosenTier = 0
     if len(sbType) > 0:
@@ -293,47 +2069,187 @@ def getSbIdList(args):
     else:
         sbIdList = [sbId]
 
-    if sbIdList:
-        return sbIdList
-    else:
-        print(charData['characterName'] + " appears to not have any soulbreaks.")
-        return None
+    return sbIdList or None
+
+
+def suggestedNames(name):
+    """
+    input:  a string, a name that was not found
+    output: a list of strings, the closest known names, empty if the
+            names are not available locally"""
+
+    if not hasLocalNames():
+        return []
+
+    return getNameIndex().suggest(name)
+
+
+def suggestions(name):
+    """
+    input:  a string, a name that was not found
+    output: a string suggesting the closest known names, empty if there
+            is none"""
+
+    names = suggestedNames(name)
+    if not names:
+        return ''
+    return ' Did you mean: ' + ', '.join(names) + '?'
+
+
+def splitValues(text, choices, allowAll=True):
+    """
+    input:  a string, one value, comma separated values or 'all', the list
+            of valid values, and whether 'all' is accepted
+    output: the list of the values given, without repeats, or all the valid
+            values for 'all'; raises ValueError for an invalid value"""
+
+    if allowAll and text == 'all':
+        return list(choices)
+
+    values = []
+    for value in text.split(','):
+        if value not in choices:
+            raise ValueError('invalid choice: {!r} (choose from {}{})'
+                             .format(value, ', '.join(choices),
+                                     ', or all' if allowAll else ''))
+        if value not in values:
+            values.append(value)
+    return values
+
+
+def valuesType(choices, allowAll=True):
+    """
+    input:  the list of valid values of an argument, whether 'all' is
+            accepted
+    output: an argparse type reading the argument with splitValues"""
+
+    def values(text):
+        try:
+            return splitValues(text, choices, allowAll)
+        except ValueError as error:
+            raise argparse.ArgumentTypeError(str(error))
+
+    return values
+
 
+def isValueList(arg, choices, allowAll=True):
+    """ output: True if arg is 'all' (when allowed) or comma separated values
+    of choices """
 
-def getSbIdListByElem(tier, element, details=False, width=TABLE_WIDTH):
+    return ((allowAll and arg == 'all') or
+            all(value in choices for value in arg.split(',')))
+
+
+def mergeSbLists(sbLists):
+    """
+    input:  an iterable of lists of sb dictionaries, None for no result
+    output: one list of the soulbreaks, each once, in the order of the lists"""
+
+    seen = set()
+    merged = []
+    for sbList in sbLists:
+        for sb in sbList or []:
+            if sb['id'] not in seen:
+                seen.add(sb['id'])
+                merged.append(sb)
+    return merged
+
+
+def fanOut(function, items, workers=MAX_WORKERS):
+    """
+    input:  a function of one argument, a list of arguments, the max number
+            of concurrent calls
+    output: the list of the results of the calls, in the order of items;
+            the calls run concurrently, but one after another offline since
+            the local copy is read through one connection"""
+
+    if store.offline or len(items) < 2:
+        return [function(item) for item in items]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(function, item) for item in items]
+        results = []
+        for future in futures:
+            with profiler.span('wait'):
+                results.append(future.result())
+    return results
+
+
+def getSbListByElem(tier, element):
     """
     input:  a valid sb tier number in string form, a valid element number int
-    output: a list of integers, matching the search criteria"""
+    output: a list of dictionaries containing the sb data returned by the
+            tier endpoint, matching the search criteria"""
 
-    url = API + 'SoulBreaks/Tier/' + tier
+    if store.offline and tier != '9':
+        return store.soulBreakSource().soulBreaksByElement(int(tier), element)
 
-    response = requests.get(url)
-    data = json.loads(response.text)
+    return filterSbByElem(apiGet('SoulBreaks/Tier/' + tier), tier, element)
 
-    if tier == '9':
-        searchStr = 'Activates ' + elements[element] + ' Chain'
-        sbIdList = [relic['id'] for relic in data
-                                if searchStr in relic['effects']]
-    else:
-        sbIdList = [relic['id'] for relic in data
-                                if element in relic['elements']]
-    return sbIdList
+
+def filterSbByElem(data, tier, element):
+    """
+    input:  a list of sb dictionaries of one tier, the tier number in string
+            form, a valid element number int
+    output: the soulbreaks of the element (the chain element for csb)"""
+
+    with profiler.span('filter'):
+        if tier == '9':
+            sbList = [relic for relic in data
+                            if withParsedEffects(relic)['parsedEffects']
+                                                        ['chain'] == element]
+        else:
+            sbList = [relic for relic in data
+                            if element in relic['elements']]
+    return sbList
 
 
-def getSbIdListByStat(status, element, details=False, width=TABLE_WIDTH):
+def getSbListByElems(tiers, elementList, workers=MAX_WORKERS):
     """
-    input:  2 strings: a valid status keyword, a valid element
+    input:  a list of valid sb tier numbers in string form, a list of valid
+            element number ints, the max number of concurrent requests
+    output: a list of dictionaries containing the sb data of any of the
+            tiers and elements, each soulbreak once, grouped by tier then
+            element in the order given
+
+    Each tier is downloaded once, the tiers concurrently."""
+
+    def tierGroups(sbTier):
+        if store.offline and sbTier != '9':
+            source = store.soulBreakSource()
+            return [source.soulBreaksByElement(int(sbTier), element)
+                    for element in elementList]
+
+        data = apiGet('SoulBreaks/Tier/' + sbTier)
+        return [filterSbByElem(data, sbTier, element)
+                for element in elementList]
+
+    return mergeSbLists(sbList for groups in fanOut(tierGroups, tiers, workers)
+                               for sbList in groups)
+
+
+def getSbIdListByElem(tier, element):
+    """
+    input:  a valid sb tier number in string form, a valid element number int
     output: a list of integers, matching the search criteria"""
 
-    if element in revElements:
-        search_str = status + ' ' + element
-        url = API + 'SoulBreaks/Effect/' + search_str
+    return [sb['id'] for sb in getSbListByElem(tier, element)]
+
+
+def getSbListByStat(status, element):
+    """
+    input:  2 strings: a valid status keyword, a valid element
+    output: a list of dictionaries containing the sb data returned by the
+            effect endpoint, matching the search criteria
+            if no match is found or the element is unknown, returns None"""
 
-        response = requests.get(url)
-        data = json.loads(response.text)
+    if element in revElements:
+        data = effectSearch(status, element)
 
         if data:
-            sbIdList = [sb['id'] for sb in data]
+            sbList = data
         else:
             print('No soulbreak found.')
             return None
@@ -342,14 +2258,883 @@ def getSbIdListByStat(status, element, details=False, width=TABLE_WIDTH):
         print('Unrecognised element.')
         return None
 
-    return sbIdList
+    return sbList
+
+
+def effectSearch(status, element):
+    """
+    input:  2 strings: a valid status keyword, a valid element
+    output: the list of dictionaries returned by the effect endpoint,
+            possibly empty"""
+
+    if store.offline:
+        return store.soulBreakSource().soulBreaksByStatus(
+            status, revElements[element])
+
+    return apiGet('SoulBreaks/Effect/' + status + ' ' + element)
+
+
+def getSbListByStats(statusList, elementList, workers=MAX_WORKERS):
+    """
+    input:  a list of valid status keywords, a list of valid elements, the
+            max number of concurrent requests
+    output: a list of dictionaries containing the sb data of any of the
+            statuses and elements, each soulbreak once, grouped by status
+            then element in the order given
+            if no match is found, returns None
+
+    Each effect search is requested once, the searches concurrently."""
+
+    pairs = [(status, element) for status in statusList
+                               for element in elementList]
+    sbList = mergeSbLists(fanOut(lambda pair: effectSearch(*pair), pairs,
+                                 workers))
+    if not sbList:
+        print('No soulbreak found.')
+        return None
+
+    return sbList
+
+
+def getSbIdListByStat(status, element):
+    """
+    input:  2 strings: a valid status keyword, a valid element
+    output: a list of integers, matching the search criteria"""
+
+    sbList = getSbListByStat(status, element)
+    if sbList is None:
+        return None
+
+    return [sb['id'] for sb in sbList]
+
+
+class Record:
+    """ Base of the compact API record types.
+
+    A record keeps the API fields it knows in __slots__ and any other field
+    in the 'extra' dictionary. Repeated strings (names) are interned and
+    nested records are decoded into their own types. Records also answer
+    the dictionary interface (record['key'], get, 'key' in record, keys,
+    items) so the code written for the raw json dictionaries works on
+    them unchanged; a field the API did not send is missing, not None."""
+
+    __slots__ = ('extra',)
+    FIELDS = ()
+    NESTED = {}
+    INTERNED = frozenset()
+
+    def __init_subclass__(cls):
+        super().__init_subclass__()
+        cls.FIELD_SET = frozenset(cls.FIELDS)
+
+    @classmethod
+    def fromDict(cls, data):
+        """
+        input:  a dictionary decoded from the API json
+        output: a record of this type holding the same fields"""
+
+        record = cls.__new__(cls)
+        nested, interned, intern = cls.NESTED, cls.INTERNED, sys.intern
+        extra = None
+        for key, value in data.items():
+            if key in nested and value is not None:
+                if isinstance(value, list):
+                    value = nested[key].fromList(value)
+                else:
+                    value = nested[key].fromDict(value)
+            elif key in interned and value.__class__ is str:
+                value = intern(value)
+            try:
+                setattr(record, key, value)
+            except AttributeError:      # not one of the slots
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        record.extra = extra
+        return record
+
+    @classmethod
+    def fromList(cls, dataList):
+        """
+        input:  a list of dictionaries decoded from the API json
+        output: a list of records of this type"""
+
+        fromDict = cls.fromDict
+        return [fromDict(data) for data in dataList]
+
+    @classmethod
+    def decode(cls, body):
+        """
+        input:  the body of an API response, str or bytes, holding one
+                object or a list of objects
+        output: a record or a list of records of this type"""
+
+        data = json.loads(body)
+        if isinstance(data, list):
+            return cls.fromList(data)
+        return cls.fromDict(data)
+
+    def __getitem__(self, key):
+        if key in self.FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra is None or key not in self.extra:
+            raise KeyError(key)
+        return self.extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        if key in self.FIELD_SET:
+            return hasattr(self, key)
+        return self.extra is not None and key in self.extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        keys = [key for key in self.FIELDS if hasattr(self, key)]
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def toDict(self):
+        """
+        output: the record as plain dictionaries and lists, as the API
+                sent it"""
+
+        data = {}
+        for key, value in self.items():
+            if isinstance(value, Record):
+                value = value.toDict()
+            elif isinstance(value, list):
+                value = [item.toDict() if isinstance(item, Record) else item
+                         for item in value]
+            data[key] = value
+        return data
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.toDict())
+
+
+def jsonDefault(value):
+    """ json.dumps default: serializes records as the API dictionaries """
+
+    if isinstance(value, Record):
+        return value.toDict()
+    raise TypeError('{} is not JSON serializable'.format(
+                    type(value).__name__))
+
+
+class Command(Record):
+    """ A command granted by a soulbreak (sbData['commands']) """
+
+    __slots__ = FIELDS = (
+        'id', 'sourceSoulBreakId', 'sourceSoulBreakName', 'commandName',
+        'school', 'targetType', 'multiplier', 'elements', 'castTime',
+        'effects', 'soulBreakPointsGained',
+        )
+    INTERNED = frozenset(['sourceSoulBreakName', 'commandName'])
+
+
+class Status(Record):
+    """ A status granted by a soulbreak (sbData['statuses']) """
+
+    __slots__ = FIELDS = (
+        'id', 'statusId', 'commonName', 'description', 'effects',
+        'defaultDuration', 'isExRelated', 'isUniqueStatus',
+        )
+    INTERNED = frozenset(['commonName', 'description', 'effects'])
+
+
+class OtherEffect(Record):
+    """ Another effect of a soulbreak (sbData['otherEffects']) """
+
+    __slots__ = FIELDS = (
+        'id', 'name', 'sourceName', 'multiplier', 'effects', 'targetType',
+        'elements', 'castTime',
+        )
+    INTERNED = frozenset(['name', 'sourceName', 'effects'])
+
+
+class SoulBreak(Record):
+    """ A soulbreak, as returned by the SoulBreaks endpoints """
+
+    __slots__ = FIELDS = (
+        'id', 'characterId', 'characterName', 'relicId', 'relicName',
+        'soulBreakName', 'description', 'soulBreakTier', 'targetType',
+        'multiplier', 'elements', 'castTime', 'soulBreakPointsRequired',
+        'effects', 'school', 'commands', 'statuses', 'otherEffects',
+        'parsedEffects',
+        )
+    NESTED = {
+        'commands': Command,
+        'statuses': Status,
+        'otherEffects': OtherEffect,
+        }
+    INTERNED = frozenset(['characterName', 'relicName'])
+
+
+class Relic(Record):
+    """ A relic, as returned by the Relics endpoints and in the characters'
+    'relics' lists """
+
+    __slots__ = FIELDS = (
+        'id', 'relicName', 'characterId', 'characterName', 'realm',
+        'relicType', 'rarity', 'soulBreakId', 'soulBreak', 'legendMateriaId',
+        'effects',
+        )
+    NESTED = {'soulBreak': SoulBreak}
+    INTERNED = frozenset(['relicName', 'characterName', 'realm',
+                          'relicType'])
+
+
+class Character(Record):
+    """ A character, as returned by the Characters endpoints """
+
+    __slots__ = FIELDS = (
+        'id', 'characterName', 'realm', 'description', 'relics',
+        'soulBreaks',
+        )
+    NESTED = {
+        'relics': Relic,
+        'soulBreaks': SoulBreak,
+        }
+    INTERNED = frozenset(['characterName', 'realm'])
+
+
+def loadDataset():
+    """
+    output: a tuple of 2 lists: all the SoulBreak and Character records,
+            read from the local store when it exists, from the API otherwise.
+            The result is kept in memory for the rest of the process."""
+
+    global dataset
+
+    if dataset is None:
+        if store.hasData():
+            sbList, charList = store.allSoulBreaks(), store.allCharacters()
+        else:
+            sbList, charList = apiGet('SoulBreaks'), apiGet('Characters')
+        with profiler.span('index'):
+            dataset = (SoulBreak.fromList(sbList),
+                       Character.fromList(charList))
+            for sbData in dataset[0]:
+                withParsedEffects(sbData)
+
+    return dataset
+
+
+dataset = None
+
+
+def resetDataset():
+    """ Drops the dataset and the indexes built from it, so they are
+    rebuilt from fresh data on next use """
+
+    global dataset, sbIndex, nameIndex, sbColumns
+
+    dataset = None
+    sbIndex = None
+    nameIndex = None
+    sbColumns = None
+    renderCache.invalidate()
+
+
+class SbIndex:
+    """ In-memory inverted indexes over the whole soulbreak dataset.
+
+    Each index maps a key (tier number, element number, school number,
+    status, character name, target type) to the set of matching sb IDs, so
+    combined searches are set intersections."""
+
+    def __init__(self, sbList):
+        self.records = {}
+        self.tiers = {}
+        self.elements = {}
+        self.schools = {}
+        self.statuses = {}
+        self.characters = {}
+        self.targets = {}
+
+        for sbData in sbList:
+            self.add(sbData)
+
+    @staticmethod
+    def post(index, key, sbId):
+        index.setdefault(key, set()).add(sbId)
+
+    def add(self, sbData):
+        sbId = sbData['id']
+        self.records[sbId] = sbData
+
+        self.post(self.tiers, sbData['soulBreakTier'], sbId)
+        self.post(self.characters, sbData['characterName'].lower(), sbId)
+        self.post(self.targets, sbData['targetType'], sbId)
+
+        commands = sbData.get('commands') or []
+        for element in sbData['elements']:
+            self.post(self.elements, element, sbId)
+        for command in commands:
+            for element in command['elements']:
+                self.post(self.elements, element, sbId)
+            self.post(self.schools, command['school'], sbId)
+        if 'school' in sbData:
+            self.post(self.schools, sbData['school'], sbId)
+
+        for status in sbData.get('statuses') or []:
+            self.post(self.statuses, status['commonName'].lower(), sbId)
+
+        parsed = withParsedEffects(sbData)['parsedEffects']
+        for statusType in ('imperil', 'attach'):
+            for element in parsed[statusType]:
+                self.post(self.statuses, (statusType, element), sbId)
+                self.post(self.statuses, statusType, sbId)
+        if parsed['chain']:
+            self.post(self.elements, parsed['chain'], sbId)
+
+    @staticmethod
+    def union(index, keys):
+        ids = set()
+        for key in keys:
+            ids |= index.get(key, set())
+        return ids
+
+    def query(self, tiers=(), elements=(), schools=(), statuses=(),
+              characters=(), targets=()):
+        """
+        input:  iterables of keys per criterion; keys of the same criterion
+                are OR-ed, criteria are AND-ed, empty criteria are ignored.
+                statuses may hold 'imperil'/'attach', (type, element) tuples
+                or status names
+        output: a sorted list of integers, the matching sb IDs"""
+
+        criteria = [
+            (self.tiers, tiers),
+            (self.elements, elements),
+            (self.schools, schools),
+            (self.statuses, statuses),
+            (self.characters, [name.lower() for name in characters]),
+            (self.targets, targets),
+            ]
+        postings = [self.union(index, keys) for index, keys in criteria
+                                            if keys]
+        if not postings:
+            return sorted(self.records)
+
+        postings.sort(key=len)
+        ids = postings[0].intersection(*postings[1:])
+        return sorted(ids)
+
+
+def getSbIndex():
+    """
+    output: the SbIndex of the whole dataset, built on first use"""
+
+    global sbIndex
+
+    if sbIndex is None:
+        sbList = loadDataset()[0]
+        with profiler.span('index'):
+            sbIndex = SbIndex(sbList)
+    return sbIndex
+
+
+sbIndex = None
+
+
+class NameIndex:
+    """ A trigram and prefix index over character names, character aliases
+    and soulbreak names, to resolve and correct names without the API.
+
+    Candidates are ranked by score: 1.0 for an exact match, 0.9 for a
+    prefix, 0.8 for a substring, and at most 0.85 for a trigram match
+    (scaled Dice similarity)."""
+
+    def __init__(self, charList, sbNames, aliases):
+        self.entries = {}       # lower case name -> list of (kind, value)
+        self.trigrams = {}      # trigram -> set of lower case names
+
+        for charData in charList:
+            self.add(charData['characterName'], 'character', charData)
+        charByName = {charData['characterName'].lower(): charData
+                      for charData in charList}
+        for alias, name in aliases.items():
+            if name in charByName:
+                self.add(alias, 'character', charByName[name])
+        for sbId, sbName in sbNames:
+            self.add(sbName, 'soulbreak', sbId)
+
+        self.names = sorted(self.entries)
+
+    @staticmethod
+    def trigramsOf(name):
+        padded = '  ' + name + ' '
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, name, kind, value):
+        name = name.lower()
+        self.entries.setdefault(name, []).append((kind, value))
+        for trigram in self.trigramsOf(name):
+            self.trigrams.setdefault(trigram, set()).add(name)
+
+    def candidates(self, query, kind, limit=10):
+        """
+        input:  a string, the name searched, the kind of name:
+                'character' or 'soulbreak'
+        output: a list of up to limit (score, name) tuples, best first"""
+
+        query = query.lower().strip()
+        scores = {}
+
+        if query in self.entries:
+            scores[query] = 1.0
+
+        position = bisect_left(self.names, query)
+        while (position < len(self.names)
+               and self.names[position].startswith(query)):
+            scores.setdefault(self.names[position], 0.9)
+            position += 1
+
+        if kind == 'soulbreak':
+            for name in self.names:
+                if query in name:
+                    scores.setdefault(name, 0.8)
+
+        queryTrigrams = self.trigramsOf(query)
+        shared = {}
+        for trigram in queryTrigrams:
+            for name in self.trigrams.get(trigram, ()):
+                shared[name] = shared.get(name, 0) + 1
+        for name, count in shared.items():
+            dice = 2 * count / (len(queryTrigrams) +
+                                len(self.trigramsOf(name)))
+            if dice >= MIN_SIMILARITY:
+                scores[name] = max(scores.get(name, 0), 0.85 * dice)
+
+        ranked = [(score, name) for name, score in scores.items()
+                                if self.values(name, kind)]
+        ranked.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+        return ranked[:limit]
+
+    def values(self, name, kind):
+        return [value for entryKind, value in self.entries.get(name, ())
+                      if entryKind == kind]
+
+    def suggest(self, query, limit=5):
+        """
+        input:  a string, a misspelt character or soulbreak name
+        output: a list of up to limit strings, the closest names"""
+
+        ranked = (self.candidates(query, 'character', limit) +
+                  self.candidates(query, 'soulbreak', limit))
+        ranked.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+        suggestions = []
+        for score, name in ranked:
+            if name not in suggestions:
+                suggestions.append(name)
+        return suggestions[:limit]
+
+
+def hasLocalNames():
+    """ output: boolean, True if names can be resolved without the API """
+
+    return dataset is not None or store.hasData()
+
+
+def getNameIndex():
+    """
+    output: the NameIndex of all characters, aliases and soulbreaks,
+            built on first use from the dataset in memory or the local
+            store"""
+
+    global nameIndex
+
+    if nameIndex is None:
+        if dataset is not None:
+            sbList, charList = dataset
+            sbNames = [(sb['id'], sb['soulBreakName']) for sb in sbList]
+        else:
+            charList = store.allCharacters()
+            sbNames = store.soulBreakNames()
+        with profiler.span('index'):
+            nameIndex = NameIndex(charList, sbNames, charAlias)
+    return nameIndex
+
+
+nameIndex = None
+
+
+def resolveCharacters(charName, notes=None):
+    """
+    input:  a string, a character name or the start of one, optionally a
+            list collecting the informative messages instead of printing
+            them
+    output: a list of character dictionaries: the exact match or the only
+            character the name starts, or every character it starts when
+            ambiguous; empty if it is neither, misspelt names are only
+            suggested (see suggestions) since the name may be a soulbreak's"""
+
+    index = getNameIndex()
+    ranked = [(score, name)
+              for score, name in index.candidates(charName, 'character')
+              if score >= PREFIX_SCORE]
+    if not ranked:
+        return []
+
+    bestScore, bestName = ranked[0]
+    if bestScore == 1.0 or len(ranked) == 1:
+        charList = index.values(bestName, 'character')[:1]
+        if bestScore < 1.0:
+            note = 'Showing results for ' + charList[0]['characterName'] + '.'
+            if notes is None:
+                print(note)
+            else:
+                notes.append(note)
+        return charList
+
+    charList = []
+    for score, name in ranked:
+        charList.extend(charData
+                        for charData in index.values(name, 'character')
+                        if charData not in charList)
+    return charList
+
+
+# numeric fields and groupings of the analyze command
+ANALYZE_FIELDS = {
+    'multiplier': 'multiplier',
+    'mult': 'multiplier',
+    'casttime': 'castTime',
+    'ctime': 'castTime',
+    }
+ANALYZE_GROUPS = ['tier', 'element', 'school', 'target', 'character']
+
+
+class SbColumns:
+    """ The numeric fields of the whole dataset as NumPy column arrays.
+
+    Two tables: one row per soulbreak and one row per command (with the
+    row of its sb and its position in the sb's commands), each a
+    dictionary of equally long arrays. Elements, schools and the imperil
+    and attach elements are bit masks, so filters are vectorised like the
+    other columns. Like SbIndex, an sb matches the elements and schools of
+    its commands too. NumPy is only needed by the analyze command."""
+
+    def __init__(self, sbList):
+        import numpy as np
+
+        self.records = sbList
+        self.characters = []
+        codes = {}
+        sbRows = {name: [] for name in (
+            'id', 'tier', 'target', 'multiplier', 'castTime', 'character',
+            'elements', 'schools', 'imperil', 'attach')}
+        commandRows = {name: [] for name in (
+            'sb', 'index', 'target', 'multiplier', 'castTime', 'elements',
+            'schools')}
+
+        for row, sbData in enumerate(sbList):
+            name = sbData['characterName'].lower()
+            if name not in codes:
+                codes[name] = len(self.characters)
+                self.characters.append(sbData['characterName'])
+            parsed = withParsedEffects(sbData)['parsedEffects']
+
+            elementMask = self.mask(sbData['elements'] + [parsed['chain']])
+            schoolMask = self.mask([sbData.get('school')])
+            for index, command in enumerate(sbData.get('commands') or []):
+                commandElements = self.mask(command['elements'])
+                commandSchool = self.mask([command['school']])
+                elementMask |= commandElements
+                schoolMask |= commandSchool
+                commandRows['sb'].append(row)
+                commandRows['index'].append(index)
+                commandRows['target'].append(command['targetType'])
+                commandRows['multiplier'].append(self.number(
+                    command['multiplier']))
+                commandRows['castTime'].append(self.number(
+                    command['castTime']))
+                commandRows['elements'].append(commandElements)
+                commandRows['schools'].append(commandSchool)
+
+            sbRows['id'].append(sbData['id'])
+            sbRows['tier'].append(sbData['soulBreakTier'])
+            sbRows['target'].append(sbData['targetType'])
+            sbRows['multiplier'].append(self.number(sbData['multiplier']))
+            sbRows['castTime'].append(self.number(sbData['castTime']))
+            sbRows['character'].append(codes[name])
+            sbRows['elements'].append(elementMask)
+            sbRows['schools'].append(schoolMask)
+            sbRows['imperil'].append(self.mask(parsed['imperil']))
+            sbRows['attach'].append(self.mask(parsed['attach']))
+
+        floats = ('multiplier', 'castTime')
+        self.characterCodes = codes
+        self.sb = {name: np.array(values, dtype=np.float64 if name in floats
+                                                  else np.int64)
+                   for name, values in sbRows.items()}
+        self.commands = {name: np.array(values,
+                                        dtype=np.float64 if name in floats
+                                              else np.int64)
+                         for name, values in commandRows.items()}
+
+    @staticmethod
+    def mask(numbers):
+        """
+        input:  a list of element or school numbers, None ignored
+        output: an integer, the bit mask of the numbers"""
+
+        mask = 0
+        for number in numbers:
+            if type(number) is int and 0 <= number < 63:
+                mask |= 1 << number
+        return mask
+
+    @staticmethod
+    def number(value):
+        return (float(value) if isinstance(value, (int, float))
+                else float('nan'))
+
+    def select(self, commands=False, tiers=(), elements=(), schools=(),
+               statuses=(), characters=(), targets=()):
+        """
+        input:  whether the rows are the commands or the soulbreaks, then
+                the criteria of SbIndex.query
+        output: a NumPy array of the matching row numbers of the table"""
+
+        import numpy as np
+
+        table = self.commands if commands else self.sb
+
+        def sbColumn(name):
+            # the sb column, aligned with the rows of the table
+            if commands:
+                return self.sb[name][self.commands['sb']]
+            return self.sb[name]
+
+        selected = np.ones(len(table['multiplier']), dtype=bool)
+        if tiers:
+            selected &= np.isin(sbColumn('tier'), list(tiers))
+        if targets:
+            selected &= np.isin(table['target'], list(targets))
+        if characters:
+            codes = [self.characterCodes[name.lower()] for name in characters
+                     if name.lower() in self.characterCodes]
+            selected &= np.isin(sbColumn('character'), codes)
+        for name, keys in (('elements', elements), ('schools', schools)):
+            if keys:
+                selected &= (table[name] & self.mask(list(keys))) != 0
+        if statuses:
+            matches = np.zeros_like(selected)
+            for status in statuses:
+                if isinstance(status, tuple):
+                    statusType, element = status
+                    matches |= (sbColumn(statusType) & 1 << element) != 0
+                else:
+                    matches |= sbColumn(status) != 0
+            selected &= matches
+
+        return np.flatnonzero(selected)
+
+    def rank(self, rows, field, commands=False, limit=10, ascending=False):
+        """
+        input:  row numbers from select, a field of ANALYZE_FIELDS values,
+                whether the rows are commands, the number of rows wanted
+                and the order
+        output: the row numbers of the top rows by the field, best first;
+                rows without a value are left out"""
+
+        import numpy as np
+
+        values = (self.commands if commands else self.sb)[field][rows]
+        known = ~np.isnan(values)
+        rows, values = rows[known], values[known]
+        if not ascending:
+            values = -values
+        if limit and limit < len(rows):
+            top = np.argpartition(values, limit - 1)[:limit]
+            rows, values = rows[top], values[top]
+        return rows[np.argsort(values, kind='stable')]
+
+    def groups(self, rows, group, commands=False):
+        """
+        input:  row numbers from select, a grouping of ANALYZE_GROUPS,
+                whether the rows are commands
+        output: a list of (group name, row numbers) tuples; with the
+                element and school groupings a row is in each of its
+                elements' or schools' groups"""
+
+        import numpy as np
+
+        table = self.commands if commands else self.sb
+        if group in ('element', 'school'):
+            names = elements if group == 'element' else schools
+            masks = table[group + 's'][rows]
+            return [(name, rows[(masks & 1 << number) != 0])
+                    for number, name in sorted(names.items())
+                    if ((masks & 1 << number) != 0).any()]
+
+        if group in ('tier', 'character'):
+            keys = self.sb[group][self.commands['sb'][rows]
+                                  if commands else rows]
+        else:
+            keys = table[group][rows]
+        decode = {
+            'tier': lambda key: tierName.get(key, str(key)),
+            'character': lambda key: self.characters[key],
+            'target': decodeTarget,
+            }[group]
+        return [(decode(int(key)), rows[keys == key])
+                for key in np.unique(keys)]
+
+    def describe(self, rows, field, commands=False):
+        """
+        input:  row numbers, a field of ANALYZE_FIELDS values, whether the
+                rows are commands
+        output: a dictionary of the count, mean, min, median, 90th
+                percentile and max of the field over the rows with a value"""
+
+        import numpy as np
+
+        values = (self.commands if commands else self.sb)[field][rows]
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return {'count': 0}
+        low, median, high90, high = np.percentile(values, [0, 50, 90, 100])
+        return {'count': len(values), 'mean': float(values.mean()),
+                'min': float(low), 'median': float(median),
+                'p90': float(high90), 'max': float(high)}
+
+
+def getSbColumns():
+    """
+    output: the SbColumns of the whole dataset, built on first use"""
+
+    global sbColumns
+
+    if sbColumns is None:
+        sbList = loadDataset()[0]
+        with profiler.span('index'):
+            sbColumns = SbColumns(sbList)
+    return sbColumns
+
+
+sbColumns = None
+
+
+MIN_COLUMN_WIDTH = 8    # narrowest a column is wrapped to
+
+
+class Table:
+    """ A text table drawn like PrettyTable's default style, that fits
+    a maximum width by wrapping the widest columns.
+
+    Column widths are kept up to date as rows are added, so rendering
+    does not measure the cells again."""
+
+    def __init__(self, fieldNames):
+        self.fieldNames = list(fieldNames)
+        self.align = {name: 'c' for name in self.fieldNames}
+        self.rows = []
+        self.widths = [len(name) for name in self.fieldNames]
+
+    def add_row(self, row):
+        row = [str(cell) for cell in row]
+        self.rows.append(row)
+        for index, cell in enumerate(row):
+            if len(cell) > self.widths[index]:
+                self.widths[index] = len(cell)
+
+    def fitWidths(self, width):
+        """
+        input:  an integer, the maximum width of the table in characters
+        output: a list of integers, the column widths: the widest left
+                aligned (text) columns are narrowed first, then any column,
+                down to MIN_COLUMN_WIDTH, until the table fits"""
+
+        widths = list(self.widths)
+        excess = sum(widths) + 3 * len(widths) + 1 - width
+
+        textColumns = [index for index, name in enumerate(self.fieldNames)
+                             if self.align[name] == 'l']
+        for candidates in (textColumns, range(len(widths))):
+            while excess > 0 and candidates:
+                widest = max(candidates, key=lambda index: widths[index])
+                if widths[widest] <= MIN_COLUMN_WIDTH:
+                    break
+                widths[widest] -= 1
+                excess -= 1
+
+        return widths
+
+    def renderRow(self, row, widths):
+        wrapped = [textwrap.wrap(cell, width) or ['']
+                   for cell, width in zip(row, widths)]
+        height = max(len(lines) for lines in wrapped)
+
+        lines = []
+        for lineIndex in range(height):
+            parts = []
+            for index, cellLines in enumerate(wrapped):
+                text = cellLines[lineIndex] if lineIndex < len(cellLines) \
+                                            else ''
+                alignment = self.align[self.fieldNames[index]]
+                if alignment == 'l':
+                    text = text.ljust(widths[index])
+                elif alignment == 'r':
+                    text = text.rjust(widths[index])
+                else:
+                    text = text.center(widths[index])
+                parts.append(text)
+            lines.append('| ' + ' | '.join(parts) + ' |')
+        return lines
+
+    def render(self, width=TABLE_WIDTH):
+        """
+        input:  an integer, the maximum width of the table in characters
+        output: a string, the table drawn with its cells wrapped to fit"""
+
+        widths = self.fitWidths(width)
+        rule = '+' + '+'.join('-' * (w + 2) for w in widths) + '+'
+
+        lines = [rule]
+        lines.extend(self.renderRow(self.fieldNames, widths))
+        lines.append(rule)
+        for row in self.rows:
+            lines.extend(self.renderRow(row, widths))
+        lines.append(rule)
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.render()
 
 
 def setupTable(fields):
     """
     input: a list of tuples containing 1 or 2 strings: the column name and,
         optionally, the alignment
-    output: a PrettyTable object"""
+    output: a Table object"""
 
     fieldNames = []
     alignments = []
@@ -361,7 +3146,7 @@ def setupTable(fields):
         except IndexError:
             alignments.append('')
 
-    table = PrettyTable(fieldNames)
+    table = Table(fieldNames)
 
     for index, alignment in enumerate(alignments):
         if alignment:
@@ -369,164 +3154,642 @@ def setupTable(fields):
     return table
 
 
-def getSbData(sbId):
+def getSbData(sbId, timeout=REQUEST_TIMEOUT):
     """
-    input:  an integer representing the sb ID number
+    input:  an integer representing the sb ID number,
+            optionally the request timeout in seconds
     output: a dictionary containing the sb data """
 
-    url = API + 'SoulBreaks/' + str(sbId)
-    response = requests.get(url)
-    data = json.loads(response.text)
+    data = apiGet('SoulBreaks/' + str(sbId), timeout=timeout)
     sbData = data[0]
 
     return sbData
 
 
-def hasCommands(sbData):
+def isSbComplete(sbData, details=True):
     """
-    input: individual sb data from json response
-    output: boolean """
+    input:  an sb ID number or a dictionary containing (partial) sb data
+    output: boolean, True if every field needed to print the sb is present"""
 
-    if sbData['commands']:
-        return True
-    else:
+    if not isinstance(sbData, (dict, Record)):
         return False
 
+    fields = SB_FIELDS + SB_DETAIL_FIELDS if details else SB_FIELDS
+    return all(field in sbData for field in fields)
 
-def hasStatus(sbData):
+
+def fetchSbData(sb, details=True, timeout=REQUEST_TIMEOUT):
     """
-    input: individual sb data from json response
-    output: boolean """
+    input:  an sb ID number or a dictionary containing (partial) sb data,
+            optionally whether the detail fields are needed and the request
+            timeout in seconds
+    output: a dictionary containing the sb data, fetched only if fields are
+            missing, or None if it could not be fetched"""
 
-    if sbData['statuses']:
-        return True
-    else:
-        return False
+    if isSbComplete(sb, details):
+        return sb
+
+    sbId = sb['id'] if isinstance(sb, (dict, Record)) else sb
+    try:
+        return getSbData(sbId, timeout=timeout)
+    except (ApiError, ValueError, IndexError):
+        print('Could not fetch soulbreak ' + str(sbId) + ', skipped.',
+              file=sys.stderr)
+        renderCache.failed()
+        return None
 
 
-def hasOtherEffects(sbData):
+def iterSbData(sbList, details=True, workers=MAX_WORKERS,
+               timeout=REQUEST_TIMEOUT):
+    """
+    input:  a list of sb ID numbers and/or dictionaries containing sb data
+            already returned by a search endpoint,
+            optionally whether the detail fields are needed, the max number
+            of concurrent requests and the per-request timeout in seconds
+    output: a generator of dictionaries containing the sb data, in the same
+            order as sbList, each yielded as soon as it and the ones before
+            it are available. Only IDs and records missing fields are
+            fetched; IDs that could not be fetched are reported and skipped."""
+
+    if all(isSbComplete(sb, details) for sb in sbList):
+        yield from sbList
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(fetchSbData, sb, details, timeout)
+                   for sb in sbList]
+        for future in futures:
+            with profiler.span('wait'):
+                sbData = future.result()
+            if sbData is not None:
+                yield sbData
+
+
+def getSbDataList(sbList, details=True, workers=MAX_WORKERS,
+                  timeout=REQUEST_TIMEOUT):
     """
-    input: individual sb data from json response
-    output: boolean """
+    input:  a list of sb ID numbers and/or dictionaries containing sb data,
+            optionally whether the detail fields are needed, the max number
+            of concurrent requests and the per-request timeout in seconds
+    output: a list of dictionaries containing the sb data, in the same order
+            as sbList, see iterSbData"""
+
+    return list(iterSbData(sbList, details=details, workers=workers,
+                           timeout=timeout))
+
+
+class AsyncClient:
+    """ Async counterparts of the get* functions, for asyncio applications.
+
+    All requests share one aiohttp session (aiohttp is only needed for this
+    client), the response cache and the local store. Concurrent requests
+    for the same URL share one request, and at most poolSize requests are
+    in flight at once. The records returned are the same as the blocking
+    functions', so printSbResult can render them.
+
+        async with AsyncClient() as client:
+            sbList = await client.getSbDataList(await client.getSbIdList(
+                ['cloud', 'usb']))
+        printSbResult(sbList)"""
+
+    def __init__(self, poolSize=POOL_SIZE, timeout=REQUEST_TIMEOUT,
+                 retries=RETRIES, backoff=BACKOFF):
+        self.poolSize = poolSize
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = None
+        self.semaphore = None
+        self.inFlight = {}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
 
-    if sbData['otherEffects']:
-        return True
-    else:
-        return False
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
 
+    async def open(self):
+        import asyncio
+        import aiohttp
 
-def printSbResult(sbIdList, details=True, width=200):
-    """
-    input: a non-empty list of integers representing the sb ID numbers
-    output: prints result to screen, returns None """
+        if self.session is None:
+            self.semaphore = asyncio.Semaphore(self.poolSize)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.poolSize),
+                headers={'Accept-Encoding': 'gzip, deflate'})
 
-    assert sbIdList, "sbIdList is an empty list"
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
 
-    mainTable = setupTable([
-                            ('Char', 'l'),
-                            ('SB Name', 'l'),
-                            ('Type',),
-                            ('Target', 'l'),
-                            ('Mult', ),
-                            ('Elements', ),
-                            ('CTime', ),
-                            ('Effects', 'l'),
-                            ])
+    async def get(self, endpoint, timeout=None):
+        """
+        input:  a string, the endpoint path relative to API,
+                optionally the request timeout in seconds
+        output: the decoded json response, like apiGet
 
-    if details:
-        commandsTable = setupTable([
-                                    ('SB Name', ),
-                                    ('Command Name', 'l'),
-                                    ('School', ),
-                                    ('Target', 'l'),
-                                    ('Mult', ),
-                                    ('Elements', ),
-                                    ('CTime', ),
-                                    ('Effects', 'l'),
-                                    ('Gauge', ),
-                                    ])
-
-        statusTable = setupTable([
-                                    ('ID', 'l'),
-                                    ('Status Name', 'l'),
-                                    ('Effects', 'l'),
-                                    ('Dur', ),
-                                    ])
-
-        otherTable = setupTable([
-                                ('ID', 'l'),
-                                ('Name', 'l'),
-                                ('Mult', ),
-                                ('Effects', 'l'),
-                                ])
-
-    printCommands = False
-    printStatuses = False
-    printOtherEffects = False
-    for sbId in sbIdList:
-        sbData = getSbData(sbId)
-
-        mainTable.add_row([
-                sbData['characterName'],
-                sbData['soulBreakName'],
-                tierName[sbData['soulBreakTier']],
-                decodeTarget(sbData['targetType']),
-                sbData['multiplier'],
-                ', '.join(decodeElements(sbData['elements'])),
-                sbData['castTime'],
-                sbData['effects'],
-                ])
+        Concurrent calls for the same URL share one request, cancelled
+        once every call waiting for it was cancelled."""
+
+        import asyncio
+
+        if store.offline:
+            return store.get(endpoint)
+
+        url = API + endpoint
+        shared = self.inFlight.get(url)
+        if shared is None:
+            task = asyncio.ensure_future(self.fetch(url, timeout))
+            shared = self.inFlight[url] = {'task': task, 'waiters': 0}
+            task.add_done_callback(lambda done: self.forget(url, shared))
+
+        shared['waiters'] += 1
+        try:
+            return await asyncio.shield(shared['task'])
+        finally:
+            shared['waiters'] -= 1
+            if shared['waiters'] == 0 and not shared['task'].done():
+                self.forget(url, shared)
+                shared['task'].cancel()
+
+    def forget(self, url, shared):
+        """ Drops a shared request, so the next call for url sends one """
+
+        if self.inFlight.get(url) is shared:
+            del self.inFlight[url]
+
+    async def fetch(self, url, timeout=None):
+        import asyncio
+        import aiohttp
+
+        entry = cache.get(url)
+        if entry and cache.isFresh(entry):
+            return cache.data(entry)
+
+        await self.open()
+        headers = conditionalHeaders(entry)
+        clientTimeout = aiohttp.ClientTimeout(total=timeout or self.timeout,
+                                              connect=CONNECT_TIMEOUT)
+        for attempt in range(self.retries + 1):
+            async with self.semaphore:
+                await limiter.acquireAsync()
+                start = timer()
+                status = None
+                try:
+                    async with self.session.get(
+                            url, headers=headers,
+                            timeout=clientTimeout) as response:
+                        status = response.status
+                        text = await response.text()
+                        responseHeaders = response.headers
+                except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                    failure = error
+                else:
+                    failure = None
+                finally:    # also when cancelled
+                    limiter.release(timer() - start, status)
+                    Transport.record(url, timer() - start, status)
+
+            if failure is not None:
+                if attempt == self.retries:
+                    if entry:   # the API is down, serve the stale copy
+                        return cache.data(entry)
+                    # same exception as the blocking functions
+                    raise ApiError(repr(failure)) from failure
+                await asyncio.sleep(retryDelay(attempt, self.backoff))
+                continue
+
+            if status in RETRY_STATUSES and attempt < self.retries:
+                await asyncio.sleep(retryDelay(
+                    attempt, self.backoff, responseHeaders.get('Retry-After')))
+                continue
+            break
+
+        return responseData(url, entry, status, text, responseHeaders)
+
+    async def getSbIdNum(self, sbName):
+        """ async getSbIdNum """
+
+        if hasLocalNames():
+            sbIdList = localSbIdNum(sbName)
+            if sbIdList or store.offline:
+                return sbIdList
+
+        data = await self.get('SoulBreaks/Name/' + sbName)
+        return [sb['id'] for sb in data] or None
+
+    async def getSbIdList(self, args):
+        """ async getSbIdList """
+
+        charName = charAlias.get(args[0], args[0])
+        sbType = args[1] if len(args) > 1 else ''
+
+        data = []
+        if hasLocalNames():     # resolved in-process when possible
+            data = resolveCharacters(charName)
+            if not data and not sbType:
+                sbIdList = localSbIdNum(charName)
+                if sbIdList:
+                    return sbIdList
+            if not data and store.offline:
+                return getSbIdList(args)    # prints why nothing was found
+
+        if not data:
+            data = exactCharacters(await self.get('Characters/Name/' +
+                                                  charName), charName)
+
+        if len(data) > 1:
+            print('More than 1 character found, did you mean: ' +
+                  ', '.join(charData['characterName'] for charData in data) +
+                  '?')
+            return None
+        elif len(data) == 0 and len(sbType) > 0:
+            print('Character name not found.')
+            return None
+        elif len(data) == 0:
+            sbIdList = await self.getSbIdNum(charName)
+            if not sbIdList:
+                print('No character or soulbreak found.')
+            return sbIdList
+
+        sbIdList = getCharSbIdList(data[0], sbType)
+        if not sbIdList:
+            print(data[0]['characterName'] +
+                  ' appears to not have any soulbreaks.')
+        return sbIdList
+
+    async def getSbListByElem(self, tier, element):
+        """ async getSbListByElem """
+
+        if store.offline:
+            return getSbListByElem(tier, element)
+
+        return filterSbByElem(await self.get('SoulBreaks/Tier/' + tier),
+                              tier, element)
+
+    async def getSbIdListByElem(self, tier, element):
+        """ async getSbIdListByElem """
+
+        return [sb['id'] for sb in await self.getSbListByElem(tier, element)]
+
+    async def getSbListByStat(self, status, element):
+        """ async getSbListByStat """
+
+        if store.offline or element not in revElements:
+            return getSbListByStat(status, element)
+
+        data = await self.get('SoulBreaks/Effect/' + status + ' ' + element)
+        if not data:
+            print('No soulbreak found.')
+            return None
+        return data
+
+    async def getSbIdListByStat(self, status, element):
+        """ async getSbIdListByStat """
+
+        sbList = await self.getSbListByStat(status, element)
+        if sbList is None:
+            return None
+        return [sb['id'] for sb in sbList]
+
+    async def getSbData(self, sbId, timeout=None):
+        """ async getSbData """
+
+        data = await self.get('SoulBreaks/' + str(sbId), timeout=timeout)
+        return data[0]
+
+    async def getSbDataList(self, sbList, details=True, timeout=None):
+        """ async getSbDataList: fetches the missing records concurrently,
+        keeps the order and leaves out the IDs that failed or timed out """
+
+        import asyncio
+
+        async def fetch(sb):
+            if isSbComplete(sb, details):
+                return sb
+
+            sbId = sb['id'] if isinstance(sb, (dict, Record)) else sb
+            try:
+                return await asyncio.wait_for(self.getSbData(sbId),
+                                              timeout or self.timeout)
+            except (asyncio.TimeoutError, ValueError, IndexError, ApiError):
+                print('Could not fetch soulbreak ' + str(sbId) + ', skipped.',
+                      file=sys.stderr)
+                return None
+
+        sbDataList = await asyncio.gather(*(fetch(sb) for sb in sbList))
+        return [sbData for sbData in sbDataList if sbData is not None]
+
+
+# output columns: (title, key in decodeSb rows, optional table alignment)
+mainColumns = [
+    ('Char', 'char', 'l'),
+    ('SB Name', 'sbName', 'l'),
+    ('Type', 'type'),
+    ('Target', 'target', 'l'),
+    ('Mult', 'mult'),
+    ('Elements', 'elements'),
+    ('CTime', 'castTime'),
+    ('Effects', 'effects', 'l'),
+]
+
+commandColumns = [
+    ('SB Name', 'sbName'),
+    ('Command Name', 'name', 'l'),
+    ('School', 'school'),
+    ('Target', 'target', 'l'),
+    ('Mult', 'mult'),
+    ('Elements', 'elements'),
+    ('CTime', 'castTime'),
+    ('Effects', 'effects', 'l'),
+    ('Gauge', 'gauge'),
+]
+
+statusColumns = [
+    ('ID', 'id', 'l'),
+    ('Status Name', 'name', 'l'),
+    ('Effects', 'effects', 'l'),
+    ('Dur', 'duration'),
+]
+
+otherColumns = [
+    ('ID', 'id', 'l'),
+    ('Name', 'name', 'l'),
+    ('Mult', 'mult'),
+    ('Effects', 'effects', 'l'),
+]
+
+
+def decodeSb(sbData, details=True):
+    """
+    input:  a dictionary containing the sb data, optionally whether to
+            decode the commands, statuses and other effects
+    output: a dictionary of the decoded values shown in the results"""
+
+    row = {
+        'id': sbData['id'],
+        'char': sbData['characterName'],
+        'sbName': sbData['soulBreakName'],
+        'type': tierName.get(sbData['soulBreakTier'],
+                             str(sbData['soulBreakTier'])),
+        'target': decodeTarget(sbData['targetType']),
+        'mult': sbData['multiplier'],
+        'elements': decodeElements(sbData['elements']),
+        'castTime': sbData['castTime'],
+        'effects': sbData['effects'],
+        }
+
+    if details:
+        row['commands'] = [{
+                'sbName': c['sourceSoulBreakName'],
+                'name': c['commandName'],
+                'school': decodeSchool(c['school']),
+                'target': decodeTarget(c['targetType']),
+                'mult': c['multiplier'],
+                'elements': decodeElements(c['elements']),
+                'castTime': c['castTime'],
+                'effects': c['effects'],
+                'gauge': c['soulBreakPointsGained'],
+                } for c in sbData['commands'] or []]
+        row['statuses'] = [{
+                'id': s['id'],
+                'name': s['commonName'],
+                'effects': s['effects'],
+                'duration': s['defaultDuration'],
+                } for s in sbData['statuses'] or []
+                  if s['id'] not in statusBlacklist]
+        row['otherEffects'] = [{
+                'id': o['id'],
+                'name': o['name'],
+                'mult': o['multiplier'],
+                'effects': o['effects'],
+                } for o in sbData['otherEffects'] or []
+                  if o['id'] not in otherEffectsBlacklist]
+
+    return row
+
+
+def cells(row, columns):
+    """
+    input:  a decoded row, a list of output columns
+    output: the list of the row values for the columns, lists joined"""
+
+    values = []
+    for column in columns:
+        value = row[column[1]]
+        if isinstance(value, list):
+            value = ', '.join(value)
+        values.append(value)
+    return values
+
+
+def columnsTable(columns):
+    """
+    input:  a list of output columns
+    output: an empty table with these columns"""
+
+    return setupTable([(column[0],) + tuple(column[2:])
+                       for column in columns])
+
+
+def printTables(sbRows, details=True, width=TABLE_WIDTH, pager=False):
+    """
+    input:  an iterable of decoded sb rows, whether to print the details,
+            optionally the maximum table width and whether to page the
+            output
+    output: prints the main table and, with details, the commands, status
+            and other effects tables that are not empty"""
+
+    mainTable = columnsTable(mainColumns)
+    detailTables = [
+        ('commands', columnsTable(commandColumns), commandColumns),
+        ('statuses', columnsTable(statusColumns), statusColumns),
+        ('otherEffects', columnsTable(otherColumns), otherColumns),
+        ]
+    filled = set()
+
+    for row in sbRows:
+        with profiler.span('render'):
+            mainTable.add_row(cells(row, mainColumns))
+            if details:
+                for key, table, columns in detailTables:
+                    for item in row[key]:
+                        table.add_row(cells(item, columns))
+                        filled.add(key)
+
+    with profiler.span('render'):
+        output = [mainTable.render(width), '', '']
         if details:
-            if hasCommands(sbData):
-                printCommands = True
-                for c in sbData['commands']:
-                    commandsTable.add_row([
-                            c['sourceSoulBreakName'],
-                            c['commandName'],
-                            decodeSchool(c['school']),
-                            decodeTarget(c['targetType']),
-                            c['multiplier'],
-                            ', '.join(decodeElements(c['elements'])),
-                            c['castTime'],
-                            c['effects'],
-                            c['soulBreakPointsGained'],
-                            ])
-
-            if hasStatus(sbData):
-                for s in sbData['statuses']:
-                    if s['id'] not in statusBlacklist:
-                        printStatuses = True
-                        statusTable.add_row([
-                                s['id'],
-                                s['commonName'],
-                                s['effects'],
-                                s['defaultDuration'],
-                                ])
-
-            if hasOtherEffects(sbData):
-                for o in sbData['otherEffects']:
-                    if o['id'] not in otherEffectsBlacklist:
-                        printOtherEffects = True
-                        otherTable.add_row([
-                                o['id'],
-                                o['name'],
-                                o['multiplier'],
-                                o['effects'],
-                                ])
-
-    print(mainTable)
-    print()
-    print()
+            for key, table, columns in detailTables:
+                if key in filled:
+                    output.extend([table.render(width), ''])
+        text = '\n'.join(output)
+
+    if pager and sys.stdout.isatty():
+        import pydoc
+        pydoc.pager(text)
+    else:
+        print(text)
+
+
+def emitText(sbRows, details=True, **options):
+    """ Prints one line per soulbreak as soon as it is available, its
+    commands, statuses and other effects indented below it """
+
+    print(' | '.join(column[0] for column in mainColumns), flush=True)
+    for row in sbRows:
+        with profiler.span('render'):
+            lines = [' | '.join(str(cell)
+                                for cell in cells(row, mainColumns))]
+            if details:
+                for key, columns, mark in [('commands', commandColumns, '>'),
+                                           ('statuses', statusColumns, '*'),
+                                           ('otherEffects', otherColumns,
+                                            '+')]:
+                    lines.extend('    ' + mark + ' ' +
+                                 ' | '.join(str(cell)
+                                            for cell in cells(item, columns))
+                                 for item in row[key])
+        print('\n'.join(lines), flush=True)
+
+
+def emitNdjson(sbRows, details=True, **options):
+    """ Prints each soulbreak as one json object per line """
+
+    for row in sbRows:
+        with profiler.span('render'):
+            line = json.dumps(row)
+        print(line, flush=True)
+
+
+def emitCsv(sbRows, details=True, **options):
+    """ Prints each soulbreak as a csv row; with details, the names of its
+    commands, statuses and other effects are listed in 3 more columns """
+
+    import csv
+
+    writer = csv.writer(sys.stdout)
+    header = [column[0] for column in mainColumns]
     if details:
-        if printCommands:
-            print(commandsTable)
-            print()
-        if printStatuses:
-            print(statusTable)
-            print()
-        if printOtherEffects:
-            print(otherTable)
-            print()
+        header.extend(['Commands', 'Statuses', 'Other Effects'])
+    writer.writerow(header)
+    sys.stdout.flush()
+
+    for row in sbRows:
+        with profiler.span('render'):
+            values = cells(row, mainColumns)
+            if details:
+                for key in ('commands', 'statuses', 'otherEffects'):
+                    values.append('; '.join(item['name']
+                                            for item in row[key]))
+        writer.writerow(values)
+        sys.stdout.flush()
+
+
+outputFormats = {
+    'table': printTables,
+    'text': emitText,
+    'ndjson': emitNdjson,
+    'csv': emitCsv,
+}
+
+
+def printSbResult(sbList, details=True, width=200, workers=MAX_WORKERS,
+                  timeout=REQUEST_TIMEOUT, format='table', pager=False):
+    """
+    input: a non-empty list of sb ID numbers and/or dictionaries containing
+           sb data, optionally the table width, the max number of concurrent
+           requests, the per-request timeout in seconds, the output format
+           and whether to page the tables
+    output: prints result to screen, returns None
+
+    The soulbreaks flow from fetch to decode to output one at a time; every
+    format but 'table' prints each one as soon as it is available."""
+
+    if deferredResults is not None:     # rendered later by batch
+        deferredResults.append((sbList, {'details': details, 'width': width,
+                                         'format': format, 'pager': pager}))
+        return None
+
+    assert sbList, "sbList is an empty list"
+
+    sbRows = decodeRows(iterSbData(sbList, details=details, workers=workers,
+                                   timeout=timeout), details)
+    outputFormats[format](sbRows, details, width=width, pager=pager)
+
+
+deferredResults = None      # the printSbResult calls held back by batch
+
+
+class TeeOutput:
+    """ A stdout replacement that also keeps what is written to it """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+        return self.stream.write(text)
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def searchKey(command, terms, parserData):
+    """
+    input:  the search command, a tuple of its normalised terms, the
+            namespace object of its parser
+    output: the render cache key of the search and its output options"""
+
+    return (command, terms, store.offline,
+            getattr(parserData, 'details', True), parserData.width,
+            parserData.format)
+
+
+def printCached(key, search, pager=False):
+    """
+    input:  the render cache key of a search, a function running the
+            search and printing its result, whether the result is paged
+    output: prints the saved output of the search if any, else runs it,
+            its output streamed as usual and saved, returns None
+
+    Searches ignoring the cache (--no-cache, --refresh), paged and held
+    back by batch are always run."""
+
+    if (not cache.enabled or cache.refresh or pager
+            or deferredResults is not None):
+        return search()
+
+    output = renderCache.get(key)
+    if output is not None:
+        sys.stdout.write(output)
+        return None
+
+    stamp = renderCache.stamp()
+    tee = TeeOutput(sys.stdout)
+    with redirect_stdout(tee):
+        search()
+    renderCache.put(key, tee.getvalue(), stamp)
+
+
+def decodeRows(sbDataList, details=True):
+    """
+    input:  an iterable of dictionaries containing the sb data, whether to
+            decode the details
+    output: a generator of the decoded rows"""
+
+    for sbData in sbDataList:
+        with profiler.span('decode'):
+            row = decodeSb(sbData, details)
+        yield row
 
 
 def usage(*args, category='gen'):
@@ -543,12 +3806,141 @@ def usage(*args, category='gen'):
         print("""Soulbreak search by type and element:
 
           ffrk.py <type> <element>
-          types: ssb, bsb, usb, osb, aosb, gsb, csb
-          elements: ice, wind, fire, water, lightning, earth, holy, dark, ne""")
+          ffrk.py <type>,<type> <element>,<element>
+          ffrk.py imperil <element>,<element>
+          eg: ffrk.py usb fire,ice,lightning
+              ffrk.py all holy
+              ffrk.py imperil,attach all
+          types: ssb, bsb, usb, osb, aosb, gsb, csb, or all
+          elements: ice, wind, fire, water, lightning, earth, holy, dark, ne,
+                    or all""")
+    elif category == 'find':
+        print("""Soulbreak search combining any criteria:
+
+          ffrk.py find <term> [<term> ...]
+          eg: ffrk.py find bsb fire imperil
+              ffrk.py find glint holy self target
+          terms: sb types, elements, schools, targets, imperil, attach,
+                 character names, char:<name> when the name is also
+                 another term (eg: ffrk.py find usb char:lightning)""")
+    elif category == 'analyze':
+        print("""Rankings and statistics over the whole dataset (needs NumPy):
+
+          ffrk.py analyze [<term> ...] --rank <field> [-k <count>]
+          ffrk.py analyze [<term> ...] [--group-by <group>] [--stat <field>]
+          eg: ffrk.py analyze glint fire --rank multiplier
+              ffrk.py analyze --group-by tier --stat casttime
+              ffrk.py analyze --commands --group-by school
+          fields: multiplier, casttime
+          groups: tier, element, school, target, character
+          terms: as for find; add --commands to analyze the commands""")
+    elif category == 'batch':
+        print("""Many searches at once, each soulbreak fetched only once:
+
+          ffrk.py batch <file>
+          ffrk.py batch -     (reads the searches from stdin)
+          the file holds one search per line, as typed after ffrk.py;
+          blank lines and lines starting with # are ignored""")
+    elif category == 'sync':
+        print("""Local copy of the game data:
+
+          ffrk.py sync
+          ffrk.py sync --incremental
+          ffrk.py snapshot
+          ffrk.py <search> ... --offline""")
 
     print()
 
 
+parsers = {}    # the argument parsers of the commands and options, built once
+
+
+def getParser(name, build):
+    """
+    input:  the name of a command or option group, a function building its
+            parser
+    output: the argument parser, built on first use only"""
+
+    parser = parsers.get(name)
+    if parser is None:
+        parser = parsers[name] = build()
+    return parser
+
+
+def cacheOptions():
+    """
+    output: the parent parser of the options choosing the data source"""
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--no-cache", action='store_true',
+                        help="Neither read nor write the response cache")
+    parser.add_argument("--refresh", action='store_true',
+                        help="Revalidate cached responses with the API")
+    parser.add_argument("-o", "--offline", action='store_true',
+                        help="Use the local copy made by 'sync'")
+    return parser
+
+
+def requestOptions():
+    """
+    output: the parent parser of the options of the API requests"""
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-j", "--workers", type=int, default=MAX_WORKERS,
+                        help="Max number of concurrent requests")
+    parser.add_argument("-t", "--timeout", type=float, default=REQUEST_TIMEOUT,
+                        help="Timeout of each request in seconds")
+    return parser
+
+
+def widthOptions():
+    """
+    output: the parent parser of the option of the table width"""
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-w", "--width", type=int, default=TABLE_WIDTH,
+                        help="Width of result table in characters")
+    return parser
+
+
+def outputOptions():
+    """
+    output: the parent parser of the options of the search results"""
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-f", "--format", choices=list(outputFormats),
+                        default='table',
+                        help="Output format, all but table are streamed")
+    parser.add_argument("-p", "--pager", action='store_true',
+                        help="Page tables that do not fit on the screen")
+    return parser
+
+
+def detailsOptions():
+    """
+    output: the parent parser of the option adding the soulbreak details"""
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-d", "--details", action='store_true',
+                        help="Provides details (commands, statuses, etc.)")
+    return parser
+
+
+optionGroups = {'cache': cacheOptions, 'requests': requestOptions,
+                'width': widthOptions, 'output': outputOptions,
+                'details': detailsOptions}
+
+
+def optionParents(*groups):
+    """
+    input:  names of groups of options shared by the commands, see optionGroups
+    output: the list of their parent parsers, for the parents argument of
+            argparse.ArgumentParser"""
+
+    return [getParser(group + ' options', optionGroups[group])
+            for group in groups]
+
+
 def sbParser(args):
     """
     input: the list of raw command line args after the trigger arg
@@ -557,13 +3949,14 @@ def sbParser(args):
     The job of the parser is to extract optionals, not validate positonals.
     It does guarantee the presence of at least 1 positional. """
 
-    sbParser = argparse.ArgumentParser()
-    sbParser.add_argument('posArgs', nargs='+',
-                          help="Search string")
-    sbParser.add_argument("-w", "--width", type=int, default=TABLE_WIDTH,
-                          help="Width of result table in characters")
+    def build():
+        sbParser = argparse.ArgumentParser(
+            parents=optionParents('requests', 'cache', 'width', 'output'))
+        sbParser.add_argument('posArgs', nargs='+',
+                              help="Search string")
+        return sbParser
 
-    sbArgs = sbParser.parse_args(args)
+    sbArgs = getParser('sb', build).parse_args(args)
     return sbArgs
 
 
@@ -595,13 +3988,36 @@ def sbSearch(args):
             or appropriate error message when search fails"""
 
     ParserData = sbParser(args[1:])
+    configureCache(ParserData)
     search_args = validateSb(ParserData.posArgs)
-    if search_args:
+    if not search_args:
+        return None
+
+    def search():
         sbIds = getSbIdList(search_args)
         if sbIds:
-            return printSbResult(sbIds, width=ParserData.width)
-        else:
-            return None
+            printSbResult(sbIds, width=ParserData.width,
+                          workers=ParserData.workers,
+                          timeout=ParserData.timeout,
+                          format=ParserData.format,
+                          pager=ParserData.pager)
+
+    return printCached(searchKey('sb', sbSearchTerms(search_args), ParserData),
+                       search, ParserData.pager)
+
+
+def sbSearchTerms(searchArgs):
+    """
+    input:  the list of strings returned by validateSb
+    output: a tuple of the character or sb name, its alias resolved, and
+            the tier number and sb number if an sb type was given"""
+
+    charName = charAlias.get(searchArgs[0], searchArgs[0])
+    if len(searchArgs) < 2:
+        return (charName,)
+
+    sbType, sbNum = decodeSbType(searchArgs[1])
+    return (charName, tier[sbType], sbNum)
 
 
 def sbTierParser(args):
@@ -609,22 +4025,22 @@ def sbTierParser(args):
     input: the list of raw command line args
     output: namespace object with parser results """
 
-    sbTierParser = argparse.ArgumentParser()
-    sbTierParser.add_argument('sb_tier',
-                  choices=[tier for tier, value in tier.items() if value >= 5],
-                  help="Soulbreak tier")
-    sbTierParser.add_argument('element',
-                  choices=[key for key in revElements.keys() if key != '-'],
-                  help="Element")
-    sbTierParser.add_argument("-d", "--details", action='store_true',
-                  help="Provides details (commands, statuses, etc.)")
-    sbTierParser.add_argument("-w", "--width", type=int, default=TABLE_WIDTH,
-                  help="Width of result table in characters")
+    def build():
+        sbTierParser = argparse.ArgumentParser(parents=optionParents(
+            'details', 'requests', 'cache', 'width', 'output'))
+        sbTierParser.add_argument('sb_tier', type=valuesType(TIER_CHOICES),
+                      help="Soulbreak tiers, comma separated or all: " +
+                           ', '.join(TIER_CHOICES))
+        sbTierParser.add_argument('element', type=valuesType(ELEMENT_CHOICES),
+                      help="Elements, comma separated or all: " +
+                           ', '.join(ELEMENT_CHOICES))
+        return sbTierParser
 
-    sbArgs = sbTierParser.parse_args(args)
+    sbArgs = getParser('tier', build).parse_args(args)
 
-    sbArgs.sb_tier = str(tier[sbArgs.sb_tier])
-    sbArgs.element = revElements[sbArgs.element]
+    sbArgs.sb_tier = list(OrderedDict.fromkeys(str(tier[sbTier])
+                                               for sbTier in sbArgs.sb_tier))
+    sbArgs.element = [revElements[element] for element in sbArgs.element]
 
     return sbArgs
 
@@ -636,11 +4052,25 @@ def sbTierSearch(args):
             or appropriate error message when search fails"""
 
     parserData = sbTierParser(args)
+    configureCache(parserData)
+
+    def search():
+        sbList = getSbListByElems(parserData.sb_tier, parserData.element,
+                                  workers=parserData.workers)
+        if not sbList:
+            print('No soulbreak found.')
+            return None
 
-    return printSbResult(getSbIdListByElem(
-                                parserData.sb_tier,
-                                parserData.element,
-                                ), details=parserData.details)
+        printSbResult(sbList, details=parserData.details,
+                      width=parserData.width,
+                      workers=parserData.workers,
+                      timeout=parserData.timeout,
+                      format=parserData.format,
+                      pager=parserData.pager)
+
+    terms = (tuple(parserData.sb_tier), tuple(parserData.element))
+    return printCached(searchKey('tier', terms, parserData), search,
+                       parserData.pager)
 
 
 def sbStatusParser(args):
@@ -648,19 +4078,18 @@ def sbStatusParser(args):
     input: the list of raw command line args
     output: namespace object with parser results """
 
-    sbStatusParser = argparse.ArgumentParser()
-    sbStatusParser.add_argument('status_type',
-                  choices=['imperil', 'attach'],
-                  help="Status type")
-    sbStatusParser.add_argument('element',
-                  choices=[key for key in revElements.keys() if key != '-'],
-                  help="Element")
-    sbStatusParser.add_argument("-d", "--details", action='store_true',
-                  help="Provides details (commands, statuses, etc.)")
-    sbStatusParser.add_argument("-w", "--width", type=int, default=TABLE_WIDTH,
-                  help="Width of result table in characters")
+    def build():
+        sbStatusParser = argparse.ArgumentParser(parents=optionParents(
+            'details', 'requests', 'cache', 'width', 'output'))
+        sbStatusParser.add_argument('status_type',
+                      type=valuesType(STATUS_CHOICES, allowAll=False),
+                      help="Status types, comma separated: imperil, attach")
+        sbStatusParser.add_argument('element', type=valuesType(ELEMENT_CHOICES),
+                      help="Elements, comma separated or all: " +
+                           ', '.join(ELEMENT_CHOICES))
+        return sbStatusParser
 
-    sbArgs = sbStatusParser.parse_args(args)
+    sbArgs = getParser('status', build).parse_args(args)
 
     return sbArgs
 
@@ -672,16 +4101,577 @@ def sbStatusSearch(args):
             or appropriate error message when search fails"""
 
     parserData = sbStatusParser(args)
+    configureCache(parserData)
 
-    return printSbResult(getSbIdListByStat(
-                                parserData.status_type,
-                                parserData.element,
-                                ), details=parserData.details)
+    def search():
+        sbList = getSbListByStats(parserData.status_type, parserData.element,
+                                  workers=parserData.workers)
+        if sbList is None:
+            return None
 
+        printSbResult(sbList, details=parserData.details,
+                      width=parserData.width,
+                      workers=parserData.workers,
+                      timeout=parserData.timeout,
+                      format=parserData.format,
+                      pager=parserData.pager)
 
-@time_this
-def main(sysargs):
+    terms = (tuple(parserData.status_type), tuple(parserData.element))
+    return printCached(searchKey('status', terms, parserData), search,
+                       parserData.pager)
+
+
+def findTerms():
+    """
+    output: a dictionary mapping search terms of the find command to
+            (criterion, key) tuples
+
+    A character name never replaces a tier, element, school, target or
+    status term (eg: Lightning); 'char:' + name always means the character."""
+
+    terms = {}
+    for name, number in tier.items():
+        terms[name] = ('tiers', number)
+    for name, number in revElements.items():
+        if name != '-':
+            terms[name] = ('elements', number)
+    for number, name in schools.items():
+        terms[name.lower()] = ('schools', number)
+    for number, name in targetTypes.items():
+        terms[name] = ('targets', number)
+    terms['self target'] = terms['self-target'] = ('targets', 10)
+    for name, statusType in statuses.items():
+        terms[name] = ('statuses', statusType)
+    charNames = {}
+    for charData in loadDataset()[1]:
+        name = charData['characterName'].lower()
+        charNames[name] = name
+    charNames.update(charAlias)
+    for term, name in charNames.items():
+        terms.setdefault(term, ('characters', name))
+        terms[CHAR_PREFIX + term] = ('characters', name)
+
+    return terms
+
+
+def parseFindTerms(words):
+    """
+    input:  a list of lower case strings
+    output: a dictionary of criteria for SbIndex.query; raises ValueError
+            if a word was not recognised
+
+    Multi-word terms are matched greedily, longest first. When a status
+    type is given, the elements restrict the status instead of the sb."""
+
+    terms = findTerms()
+    longest = max(len(term.split()) for term in terms)
+    criteria = {}
+
+    position = 0
+    while position < len(words):
+        for size in range(min(longest, len(words) - position), 0, -1):
+            phrase = ' '.join(words[position:position + size])
+            if phrase in terms:
+                criterion, key = terms[phrase]
+                criteria.setdefault(criterion, []).append(key)
+                position += size
+                break
+        else:
+            raise ValueError('Unrecognised search term: ' + words[position])
+
+    if 'statuses' in criteria and 'elements' in criteria:
+        statusElements = criteria.pop('elements')
+        criteria['statuses'] = [(statusType, element)
+                                for statusType in criteria['statuses']
+                                for element in statusElements]
+
+    return criteria
+
+
+def findParser(args):
+    """
+    input: the list of raw command line args after the trigger arg
+    output: namespace object with parser results """
+
+    def build():
+        findParser = argparse.ArgumentParser(prog='ffrk.py find',
+            parents=optionParents('details', 'cache', 'width', 'output'))
+        findParser.add_argument('terms', nargs='+',
+                      help="Search terms: tiers, elements, schools, targets, "
+                           "imperil/attach, character names (prefixed with "
+                           "'" + CHAR_PREFIX + "' when they are also another "
+                           "term, eg: " + CHAR_PREFIX + "lightning)")
+        return findParser
+
+    return getParser('find', build).parse_args(args)
 
+
+def find(args):
+    """
+    input: raw command line arguments
+    output: prints the soulbreaks matching all the search terms
+            or appropriate error message when search fails"""
+
+    parserData = findParser(args[1:])
+    configureCache(parserData)
+
+    try:
+        criteria = parseFindTerms(' '.join(parserData.terms).split())
+    except ValueError as error:
+        print(error)
+        return usage(category='find')
+
+    def search():
+        index = getSbIndex()
+        with profiler.span('filter'):
+            sbIdList = index.query(**criteria)
+        if not sbIdList:
+            print('No soulbreak found.')
+            return None
+
+        printSbResult([index.records[sbId] for sbId in sbIdList],
+                      details=parserData.details,
+                      width=parserData.width,
+                      format=parserData.format,
+                      pager=parserData.pager)
+
+    terms = tuple(sorted((criterion, tuple(keys))
+                         for criterion, keys in criteria.items()))
+    return printCached(searchKey('find', terms, parserData), search,
+                       parserData.pager)
+
+
+def analyzeParser(args):
+    """
+    input: the list of raw command line args after the trigger arg
+    output: namespace object with parser results """
+
+    def build():
+        analyzeParser = argparse.ArgumentParser(prog='ffrk.py analyze',
+            parents=optionParents('cache', 'width'))
+        analyzeParser.add_argument('terms', nargs='*',
+                      help="Search terms, as for find; all soulbreaks if none")
+        analyzeParser.add_argument("-r", "--rank",
+                      choices=list(ANALYZE_FIELDS),
+                      help="Rank the soulbreaks (or commands) by this field")
+        analyzeParser.add_argument("-g", "--group-by", choices=ANALYZE_GROUPS,
+                      help="Show the statistics of the field per group")
+        analyzeParser.add_argument("-s", "--stat",
+                      choices=list(ANALYZE_FIELDS),
+                      default='multiplier',
+                      help="Field of the statistics, default multiplier")
+        analyzeParser.add_argument("-c", "--commands", action='store_true',
+                      help="Analyze the commands of the soulbreaks instead")
+        analyzeParser.add_argument("-k", "--top", type=int, default=10,
+                      help="Number of ranked results, 0 for all")
+        analyzeParser.add_argument("-a", "--ascending", action='store_true',
+                      help="Rank from the lowest value")
+        return analyzeParser
+
+    return getParser('analyze', build).parse_args(args)
+
+
+def analyze(args):
+    """
+    input: raw command line arguments
+    output: prints a ranking of the matching soulbreaks or commands by a
+            field, or the statistics of a field over them, overall or per
+            group
+
+    eg: analyze glint fire --rank multiplier
+        analyze --group-by tier --stat casttime
+        analyze --commands --group-by school"""
+
+    parserData = analyzeParser(args[1:])
+    configureCache(parserData)
+
+    try:
+        import numpy    # noqa: F401
+    except ImportError:
+        print('The analyze command needs NumPy: pip install numpy')
+        return None
+
+    try:
+        criteria = parseFindTerms(' '.join(parserData.terms).split())
+    except ValueError as error:
+        print(error)
+        return usage(category='analyze')
+
+    columns = getSbColumns()
+    commands = parserData.commands
+    with profiler.span('filter'):
+        rows = columns.select(commands=commands, **criteria)
+    if not len(rows):
+        print('No soulbreak found.')
+        return None
+
+    if parserData.rank:
+        field = ANALYZE_FIELDS[parserData.rank]
+        fields = [('Rank', 'r'), ('Char', 'l'), ('SB Name', 'l'),
+                  ('Type', 'l')]
+        if commands:
+            fields.append(('Command', 'l'))
+        fields.append((field, 'r'))
+        table = setupTable(fields)
+
+        for rank, row in enumerate(columns.rank(
+                rows, field, commands=commands, limit=parserData.top,
+                ascending=parserData.ascending), 1):
+            values = (columns.commands if commands else columns.sb)
+            sbRow = int(values['sb'][row]) if commands else int(row)
+            sbData = columns.records[sbRow]
+            line = [rank, sbData['characterName'], sbData['soulBreakName'],
+                    tierName.get(sbData['soulBreakTier'],
+                                 str(sbData['soulBreakTier']))]
+            if commands:
+                line.append(sbData['commands'][int(values['index'][row])]
+                            ['commandName'])
+            line.append('{:g}'.format(values[field][row]))
+            table.add_row(line)
+        print(table.render(parserData.width))
+        return None
+
+    field = ANALYZE_FIELDS[parserData.stat]
+    if parserData.group_by:
+        groups = columns.groups(rows, parserData.group_by, commands=commands)
+    else:
+        groups = [('all', rows)]
+
+    table = setupTable([(parserData.group_by or '', 'l'), ('Count', 'r'),
+                        ('Mean', 'r'), ('Min', 'r'), ('Median', 'r'),
+                        ('P90', 'r'), ('Max', 'r')])
+    for name, groupRows in groups:
+        stats = columns.describe(groupRows, field, commands=commands)
+        if not stats['count']:
+            continue
+        table.add_row([name, stats['count']] +
+                      ['{:.2f}'.format(stats[key]) for key in
+                       ('mean', 'min', 'median', 'p90', 'max')])
+    print('{} of the {}:'.format(field, 'commands' if commands
+                                        else 'soulbreaks'))
+    print(table.render(parserData.width))
+
+
+def syncParser(args):
+    """
+    input: the list of raw command line args after the trigger arg
+    output: namespace object with parser results """
+
+    def build():
+        syncParser = argparse.ArgumentParser(prog='ffrk.py sync',
+            parents=optionParents('requests'))
+        syncParser.add_argument("-i", "--incremental", action='store_true',
+                      help="Only fetch new or changed soulbreaks and "
+                           "characters")
+        return syncParser
+
+    return getParser('sync', build).parse_args(args)
+
+
+def incrementalSync(workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT):
+    """
+    input:  optionally the max number of concurrent requests and the
+            per-request timeout in seconds
+    output: updates the local store with the soulbreaks and characters
+            that are new or changed since the last sync and prints, per
+            tier, how many records were added, updated, removed or unchanged"""
+
+    summary = '{:<12}{:>7}{:>9}{:>11}{:>9}{:>9}'
+    print(summary.format('', 'Added', 'Updated', 'Unchanged', 'Removed',
+                         'Time'))
+
+    for sbTier, name in sorted(tierName.items()):
+        start = timer()
+        fetched = apiGet('SoulBreaks/Tier/' + str(sbTier), timeout=timeout)
+        stored = store.storedSoulBreaks(sbTier)
+        added, updated, removed = diffRecords(stored, fetched)
+
+        if added or updated:
+            store.upsertSoulBreaks(getSbDataList(added + updated,
+                                                 workers=workers,
+                                                 timeout=timeout))
+        if removed:
+            store.deleteSoulBreaks(removed)
+
+        unchanged = len(fetched) - len(added) - len(updated)
+        print(summary.format(name, len(added), len(updated), unchanged,
+                             len(removed),
+                             '{:.2f}s'.format(timer() - start)))
+
+    start = timer()
+    fetched = apiGet('Characters', timeout=timeout)
+    added, updated, removed = diffRecords(store.storedCharacters(), fetched)
+    store.upsertCharacters(added + updated)
+    if removed:
+        store.deleteCharacters(removed)
+    unchanged = len(fetched) - len(added) - len(updated)
+    print(summary.format('characters', len(added), len(updated), unchanged,
+                         len(removed), '{:.2f}s'.format(timer() - start)))
+
+    store.setMeta('synced', str(time.time()))
+
+
+def fullSync(workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT):
+    """
+    input:  optionally the max number of concurrent requests and the
+            per-request timeout in seconds
+    output: downloads all characters, relics and soulbreaks into the local
+            store and prints a summary"""
+
+    characters = apiGet('Characters', timeout=timeout)
+    relics = apiGet('Relics', timeout=timeout)
+    sbList = getSbDataList(apiGet('SoulBreaks', timeout=timeout),
+                           workers=workers, timeout=timeout)
+
+    store.storeAll(characters, relics, sbList)
+
+    counts = store.counts()
+    print('Synced {} characters, {} relics and {} soulbreaks into {}'.format(
+          counts['characters'], counts['relics'], counts['soulbreaks'],
+          store.path))
+
+
+def sync(args):
+    """
+    input: raw command line arguments
+    output: updates the local store, fully or incrementally, and prints a
+            summary"""
+
+    parserData = syncParser(args[1:])
+    cache.refresh = True
+
+    try:
+        if parserData.incremental:
+            incrementalSync(workers=parserData.workers,
+                            timeout=parserData.timeout)
+        else:
+            fullSync(workers=parserData.workers, timeout=parserData.timeout)
+        store.writeSnapshot()
+    finally:
+        cache.refresh = False
+        resetDataset()
+
+
+def snapshot(args):
+    """
+    input: raw command line arguments
+    output: rewrites the binary snapshot from the local store and prints
+            its size"""
+
+    if not store.hasData():
+        print('There is no local copy of the game data yet.')
+        return usage(category='sync')
+
+    start = timer()
+    store.writeSnapshot()
+    print('Wrote a snapshot of {} soulbreaks ({} bytes) to {} in {:.2f}s'
+          .format(store.counts()['soulbreaks'],
+                  os.path.getsize(store.snapshot.path), store.snapshot.path,
+                  timer() - start))
+
+
+class PooledServer:
+    """ Handles the requests of a socketserver server on a fixed pool of
+    threads, mixed in with http.server.HTTPServer by serve """
+
+    def __init__(self, address, handler, workers=SERVER_WORKERS):
+        from concurrent.futures import ThreadPoolExecutor
+
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.metrics = Metrics()
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.processRequestInPool, request, client_address)
+
+    def processRequestInPool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class ApiHandler:
+    """ Serves the searches as json, mixed in with
+    http.server.BaseHTTPRequestHandler by serve:
+
+        /sb?q=<character name> [<sb type>] | <sb name>
+        /tier?tier=<sb type>&element=<element>
+        /status?type=<imperil|attach>&element=<element>
+        /find?q=<terms>
+        /metrics
+
+    Add details=1 to include commands, statuses and other effects. An
+    ambiguous name answers 300 and an unknown one 404, both with the
+    'candidates' names the user may have meant."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1]
+                  for key, values in parse_qs(url.query).items()}
+        route = apiRoutes.get(url.path.rstrip('/'))
+
+        start = timer()
+        if route is None:
+            status, payload = 404, {'error': 'Unknown endpoint.'}
+        else:
+            try:
+                status, payload = route(self.server, params)
+            except (KeyError, ValueError) as error:
+                status, payload = 400, {'error': 'Bad request: ' + str(error)}
+            except ApiError as error:
+                status, payload = 502, {'error': 'Could not get data from '
+                                                 'the FFRK API: ' + str(error)}
+        self.server.metrics.record(url.path, timer() - start, status >= 400)
+
+        body = json.dumps(payload, default=jsonDefault).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass                # latencies are in /metrics
+
+
+def sbResultPayload(sbList, params):
+    """
+    input:  a list of sb ID numbers and/or dictionaries containing sb data,
+            or None if the search failed, the request parameters
+    output: a tuple of the HTTP status and the json payload, the results
+            limited to the id and SB_FIELDS, plus SB_DETAIL_FIELDS with
+            details=1"""
+
+    if not sbList:
+        return 404, {'error': 'No soulbreak found.'}
+
+    details = params.get('details', '') in ('1', 'true', 'yes')
+    fields = ('id',) + SB_FIELDS + (SB_DETAIL_FIELDS if details else ())
+    results = [{field: sbData.get(field) for field in fields}
+               for sbData in getSbDataList(sbList, details=details)]
+    return 200, {'count': len(results), 'results': results}
+
+
+def serveSb(server, params):
+    posArgs = params['q'].lower().split()
+    if not posArgs:
+        raise ValueError('empty search')
+    if len(posArgs) == 1 and decodeSbType(posArgs[0])[0] in tier:
+        raise ValueError('character name required when sb tier specified')
+
+    notes = []
+    try:
+        sbList = findSbIdList(validateSb(posArgs), notes)
+    except SearchError as error:
+        return (300 if error.ambiguous else 404,
+                {'error': str(error), 'candidates': error.candidates})
+
+    status, payload = sbResultPayload(sbList, params)
+    if notes:
+        payload['notes'] = notes
+    return status, payload
+
+
+def serveTier(server, params):
+    sbTier = tier[params['tier'].lower()]
+    element = revElements[params['element'].lower()]
+    return sbResultPayload(getSbListByElem(str(sbTier), element), params)
+
+
+def serveStatus(server, params):
+    statusType = statuses[params['type'].lower()]
+    element = params['element'].lower()
+    if element not in revElements:
+        raise ValueError('unknown element ' + element)
+    return sbResultPayload(effectSearch(statusType, element), params)
+
+
+def serveFind(server, params):
+    criteria = parseFindTerms(params['q'].lower().split())
+    index = getSbIndex()
+    return sbResultPayload([index.records[sbId]
+                            for sbId in index.query(**criteria)], params)
+
+
+def serveMetrics(server, params):
+    return 200, {
+        'endpoints': server.metrics.snapshot(),
+        'phases': profiler.spans.snapshot(),
+        'apiEndpoints': profiler.requests.snapshot(),
+        'rateLimiter': limiter.stats(),
+        'singleFlight': singleFlight.stats(),
+        'cachedResponses': len(cache.memory),
+        'renderCache': renderCache.stats(),
+        }
+
+
+apiRoutes = {
+    '/sb': serveSb,
+    '/tier': serveTier,
+    '/status': serveStatus,
+    '/find': serveFind,
+    '/metrics': serveMetrics,
+}
+
+
+def serveParser(args):
+    """
+    input: the list of raw command line args after the trigger arg
+    output: namespace object with parser results """
+
+    def build():
+        serveParser = argparse.ArgumentParser(prog='ffrk.py serve',
+            parents=optionParents('cache'))
+        serveParser.add_argument("--host", default=SERVER_HOST,
+                      help="Address to listen on")
+        serveParser.add_argument("-p", "--port", type=int, default=SERVER_PORT,
+                      help="Port to listen on")
+        serveParser.add_argument("-j", "--workers", type=int,
+                      default=SERVER_WORKERS,
+                      help="Number of requests served concurrently")
+        return serveParser
+
+    return getParser('serve', build).parse_args(args)
+
+
+def serve(args):
+    """
+    input: raw command line arguments
+    output: serves the searches as json over HTTP until interrupted"""
+
+    parserData = serveParser(args[1:])
+    configureCache(parserData)
+
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    serverClass = type('PooledHTTPServer', (PooledServer, HTTPServer), {})
+    handlerClass = type('ApiRequestHandler',
+                        (ApiHandler, BaseHTTPRequestHandler), {})
+    server = serverClass((parserData.host, parserData.port), handlerClass,
+                         workers=parserData.workers)
+    print('FFRK API server listening on http://{}:{}/'.format(
+          parserData.host, parserData.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def runCommand(sysargs):
+    """
+    input: the list of raw command line args
+    output: runs the matching search and prints its results """
+
+    sysargs, profile = profileOption(sysargs)
     if not sysargs:
         return usage()
 
@@ -691,15 +4681,465 @@ def main(sysargs):
 
     if newargs[0] in ['sb', 'soulbreak']:
         function = sbSearch
-    elif newargs[0] in tier:
+    elif isValueList(newargs[0], tier):
         function = sbTierSearch
-    elif newargs[0] in ['imperil', 'attach']:
+    elif isValueList(newargs[0], STATUS_CHOICES, allowAll=False):
         function = sbStatusSearch
+    elif newargs[0] == 'sync':
+        function = sync
+    elif newargs[0] == 'snapshot':
+        function = snapshot
+    elif newargs[0] == 'find':
+        function = find
+    elif newargs[0] == 'analyze':
+        function = analyze
+    elif newargs[0] == 'shell':
+        function = shell
+    elif newargs[0] == 'daemon':
+        function = daemon
+    elif newargs[0] == 'serve':
+        function = serve
+    elif newargs[0] == 'batch':
+        function = batch
+        newargs[1:] = sysargs[1:]   # the file name keeps its case
     else:
         print('First argument not recognized.')
         return usage()
 
-    return function(newargs)
+    if profile:
+        profiler.reset()
+    try:
+        return function(newargs)
+    except ApiError as error:
+        print('Could not get data from the FFRK API: ' + str(error))
+        return None
+    finally:
+        if profile:
+            printProfile(profile)
+
+
+def profileOption(sysargs):
+    """
+    input:  the list of raw command line args
+    output: a tuple of the args without the profile option, and True for
+            --profile, the file name for --profile=<file> ('-' for stdout)
+            or None without the option"""
+
+    profile = None
+    args = []
+    for arg in sysargs:
+        if arg == '--profile':
+            profile = True
+        elif arg.startswith('--profile='):
+            profile = arg[len('--profile='):] or True
+        else:
+            args.append(arg)
+    return args, profile
+
+
+def printProfile(destination=True):
+    """
+    input:  True to print the profile as tables, or the name of the file
+            to write it to as json, '-' for stdout
+    output: prints or writes the time spent per phase and the API requests
+            per endpoint since the last profiler reset"""
+
+    report = profiler.report()
+    if destination is not True:
+        text = json.dumps(report, indent=2)
+        if destination == '-':
+            print(text)
+        else:
+            with open(destination, 'w') as f:
+                f.write(text + '\n')
+        return None
+
+    print('Profile: {:.1f} ms wall time (threads add up in the phases)'
+          .format(report['wall'] * 1000))
+    for title, series in (('Phase', report['phases']),
+                          ('Endpoint', report['endpoints'])):
+        if not series:
+            continue
+        table = setupTable([(title, 'l'), ('Count', 'r'), ('Errors', 'r'),
+                            ('Total ms', 'r'), ('Mean ms', 'r'),
+                            ('P95 ms', 'r'), ('Max ms', 'r')])
+        for name, stats in sorted(series.items(),
+                                  key=lambda item: -item[1]['mean']
+                                                   * item[1]['count']):
+            table.add_row([name, stats['count'], stats['errors']] +
+                          ['{:.2f}'.format(value * 1000) for value in (
+                              stats['mean'] * stats['count'], stats['mean'],
+                              stats['p95'], stats['max'])])
+        print(table.render(TABLE_WIDTH))
+
+
+SESSION_COMMANDS = ['shell', 'daemon', 'serve']    # run until stopped
+
+
+def runLine(line):
+    """
+    input: a string, one command in the command line syntax
+    output: runs the command, returns False when asked to quit """
+
+    import shlex
+
+    try:
+        args = shlex.split(line)
+    except ValueError as error:
+        print(error)
+        return True
+
+    if args and args[0].lower() in ['quit', 'exit']:
+        return False
+    if args and args[0].lower() in SESSION_COMMANDS:
+        print(sessionError(args[0]))
+        return True
+
+    resetOptions()
+    try:
+        runCommand(args)
+    except SystemExit:      # argparse error, already reported
+        pass
+    return True
+
+
+def sessionError(command):
+    """
+    input:  a string, one of SESSION_COMMANDS
+    output: the message refusing to run it inside the shell or daemon"""
+
+    return "'{}' cannot run inside the shell or the daemon.".format(
+        command.lower())
+
+
+def shell(args):
+    """
+    input: raw command line arguments
+    output: reads and runs commands until 'quit' or end of input, keeping
+            connections, responses and indexes in memory between them"""
+
+    print("FFRK shell: same commands as ffrk.py, 'quit' to leave.")
+    while True:
+        try:
+            line = input('ffrk> ')
+        except EOFError:
+            print()
+            break
+        except KeyboardInterrupt:
+            print()
+            continue
+
+        if not runLine(line):
+            break
+
+
+BATCH_COMMANDS = ['sb', 'soulbreak', 'find'] + STATUS_CHOICES + list(tier)
+
+
+def batchParser(args):
+    """
+    input: the list of raw command line args after the trigger arg
+    output: namespace object with parser results """
+
+    def build():
+        batchParser = argparse.ArgumentParser(prog='ffrk.py batch',
+            parents=optionParents('requests'))
+        batchParser.add_argument('file',
+                      help="File of searches, one per line, '-' for stdin")
+        return batchParser
+
+    return getParser('batch', build).parse_args(args)
+
+
+def readQueries(path):
+    """
+    input:  a file name, '-' for stdin
+    output: the list of lines of the file, without the blank lines and the
+            # comments"""
+
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    return [line.strip() for line in lines
+            if line.strip() and not line.strip().startswith('#')]
+
+
+def resolveQuery(query):
+    """
+    input:  a string, one search in the command line syntax
+    output: a tuple of the messages the search printed, its parse errors
+            included, the list of its held back printSbResult calls, as
+            (sbList, options) tuples, and its dataSource"""
+
+    import shlex
+
+    global deferredResults
+
+    output = StringIO()
+    deferredResults = []
+    resetOptions()
+    try:
+        with redirect_stdout(output), redirect_stderr(output):
+            args = shlex.split(query)
+            if isValueList(args[0].lower(), BATCH_COMMANDS):
+                runCommand(args)
+            else:
+                print('Not a search, skipped.')
+    except ValueError as error:         # unbalanced quotes
+        output.write(str(error) + '\n')
+    except SystemExit:                  # argparse error, already reported
+        pass
+    except Exception as error:          # one failed search ends no batch
+        output.write('Error: ' + repr(error) + '\n')
+    finally:
+        results, deferredResults = deferredResults, None
+
+    return output.getvalue(), results, dataSource()
+
+
+def fetchDistinct(resolved, workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT):
+    """
+    input:  a list of (messages, results, source) tuples, see
+            resolveQuery, the max number of concurrent requests and the
+            per-request timeout in seconds
+    output: a dictionary of (source, sb ID): complete sb data, each sb
+            fetched at most once per data source whatever the number of
+            searches returning it, with the detail fields if any of them
+            needs them"""
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    wanted = OrderedDict()  # (source, sb ID): [sb, details]
+    for _, results, source in resolved:
+        for sbList, options in results:
+            for sb in sbList:
+                sbId = sb['id'] if isinstance(sb, (dict, Record)) else sb
+                entry = wanted.setdefault((source, sbId),
+                                          [sb, options['details']])
+                entry[1] = entry[1] or options['details']
+                if isSbComplete(sb, entry[1]):
+                    entry[0] = sb
+
+    fetched = {}
+    for source in OrderedDict.fromkeys(key[0] for key in wanted):
+        keys = [key for key in wanted if key[0] == source]
+        useDataSource(source)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(fetchSbData, wanted[key][0],
+                                       wanted[key][1], timeout)
+                       for key in keys]
+            for key, future in zip(keys, futures):
+                with profiler.span('wait'):
+                    fetched[key] = future.result()
+    resetOptions()
+
+    return fetched
+
+
+def batch(args):
+    """
+    input: raw command line arguments
+    output: runs the searches of a file and prints their results in the
+            order of the file
+
+    All the searches are resolved before anything is fetched; each distinct
+    soulbreak they return is then fetched once, in parallel, and every
+    search is rendered from those records."""
+
+    parserData = batchParser(args[1:])
+    try:
+        queries = readQueries(parserData.file)
+    except OSError as error:
+        print(error)
+        return usage(category='batch')
+
+    resolved = [resolveQuery(query) for query in queries]
+
+    fetched = fetchDistinct(resolved, workers=parserData.workers,
+                            timeout=parserData.timeout)
+
+    for position, (query, (messages, results, source)) in enumerate(
+            zip(queries, resolved)):
+        print(('\n' if position else '') + '> ' + query)
+        sys.stdout.write(messages)
+        for sbList, options in results:
+            sbDataList = [fetched[source, sb['id'] if isinstance(
+                              sb, (dict, Record)) else sb] for sb in sbList]
+            sbDataList = [sbData for sbData in sbDataList if sbData]
+            if sbDataList:
+                printSbResult(sbDataList, **options)
+            else:
+                print('No soulbreak found.')
+
+
+class DaemonStream:
+    """ A stdout or stderr replacement sending what is written to it to the
+    daemon client, line by line, as json messages """
+
+    def __init__(self, wfile, name):
+        self.wfile = wfile
+        self.name = name        # 'stdout' or 'stderr'
+        self.pending = ''       # the incomplete last line
+
+    def write(self, text):
+        self.pending += text
+        if '\n' in self.pending:
+            lines, self.pending = self.pending.rsplit('\n', 1)
+            self.send(lines + '\n')
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            self.send(self.pending)
+            self.pending = ''
+
+    def send(self, text):
+        self.wfile.write(json.dumps({self.name: text}).encode('utf-8') +
+                         b'\n')
+        self.wfile.flush()
+
+    def isatty(self):
+        return False
+
+
+class DaemonHandler:
+    """ Runs one command per connection: reads a json list of args and
+    sends back, as json lines, the stdout and stderr output of the command
+    as it is written ({'stdout': text} or {'stderr': text}), then its exit
+    status ({'status': code}). Mixed in with
+    socketserver.StreamRequestHandler by daemon """
+
+    def handle(self):
+        try:
+            args = [str(arg) for arg in
+                    json.loads(self.rfile.readline().decode('utf-8'))]
+        except ValueError:
+            return
+
+        output = DaemonStream(self.wfile, 'stdout')
+        errors = DaemonStream(self.wfile, 'stderr')
+        try:
+            with redirect_stdout(output), redirect_stderr(errors):
+                status = self.run(args)
+            output.flush()
+            errors.flush()
+            self.wfile.write(json.dumps({'status': status}).encode('utf-8') +
+                             b'\n')
+        except OSError:     # the client left
+            pass
+
+    @staticmethod
+    def run(args):
+        """
+        input:  the list of raw command line args
+        output: runs the command, returns its exit status"""
+
+        if args and args[0].lower() in SESSION_COMMANDS:
+            print(sessionError(args[0]), file=sys.stderr)
+            return 1
+
+        resetOptions()
+        try:
+            runCommand(args)
+        except SystemExit as error:     # argparse errors: status 2
+            if isinstance(error.code, str):
+                print(error.code, file=sys.stderr)
+                return 1
+            return error.code or 0
+        except Exception as error:
+            print('Error: ' + repr(error), file=sys.stderr)
+            return 1
+        return 0
+
+
+def daemon(args):
+    """
+    input: raw command line arguments
+    output: serves commands on the local Unix socket until interrupted;
+            while it runs, ffrk.py forwards its commands to it"""
+
+    import signal
+    import socket
+    import socketserver
+
+    if not hasattr(socket, 'AF_UNIX'):
+        print('The daemon needs Unix domain sockets.')
+        return None
+
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    if os.path.exists(SOCKET_PATH):
+        os.remove(SOCKET_PATH)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+
+    handlerClass = type('DaemonRequestHandler',
+                        (DaemonHandler, socketserver.StreamRequestHandler), {})
+    server = socketserver.UnixStreamServer(SOCKET_PATH, handlerClass)
+    print('FFRK daemon listening on ' + SOCKET_PATH)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(SOCKET_PATH)
+
+
+def forwardToDaemon(sysargs):
+    """
+    input: the list of raw command line args
+    output: the exit status of the command if a running daemon ran it and
+            its output was printed, None otherwise"""
+
+    if not os.path.exists(SOCKET_PATH):
+        return None
+    if sysargs and sysargs[0].lower() in SESSION_COMMANDS + ['batch']:
+        return None
+
+    import socket
+
+    received = False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(SOCKET_PATH)
+            client.sendall(json.dumps(sysargs).encode('utf-8') + b'\n')
+            client.shutdown(socket.SHUT_WR)
+            for line in client.makefile('rb'):
+                message = json.loads(line.decode('utf-8'))
+                if 'status' in message:
+                    return message['status']
+                for name, text in message.items():
+                    stream = sys.stderr if name == 'stderr' else sys.stdout
+                    stream.write(text)
+                    stream.flush()
+                received = True
+    except (OSError, ValueError):   # no daemon behind a stale socket file
+        pass
+
+    if not received:
+        return None
+    print('The daemon closed the connection.', file=sys.stderr)
+    return 1
+
+
+def main(sysargs):
+
+    start = timer()
+    result = None
+    status = forwardToDaemon(sysargs)
+    if status is None:
+        result = runCommand(sysargs)
+    if profileOption(sysargs)[1]:   # stdout may hold --profile=- json
+        print('Execution time: ', timer() - start, file=sys.stderr)
+    if status:
+        sys.exit(status)
+    return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+"""
+Tests of the NumPy column arrays of the analyze command.
+"""
+
+import pytest
+
+import ffrk
+
+np = pytest.importorskip('numpy')
+
+FIRE, ICE = 5, 7
+SPELLBLADE, BLACK_MAGIC = 18, 3
+
+
+def soulbreak(sbId, charName, tierName, multiplier, castTime, elements=(),
+              school=SPELLBLADE, effects='', commands=()):
+    return {
+        'id': sbId,
+        'characterName': charName,
+        'soulBreakName': 'SB {}'.format(sbId),
+        'soulBreakTier': ffrk.tier[tierName],
+        'targetType': 13,
+        'multiplier': multiplier,
+        'castTime': castTime,
+        'elements': list(elements),
+        'school': school,
+        'effects': effects,
+        'commands': list(commands),
+        'statuses': [],
+        'otherEffects': [],
+        }
+
+
+def command(name, multiplier, elements=(), school=BLACK_MAGIC):
+    return {'commandName': name, 'targetType': 3, 'multiplier': multiplier,
+            'castTime': 1.65, 'elements': list(elements), 'school': school,
+            'effects': ''}
+
+
+SB_LIST = [
+    soulbreak(1, 'Cloud', 'usb', 10.5, 0.01, [FIRE]),
+    soulbreak(2, 'Cloud', 'glint', 8.0, 0.01, [ICE],
+              effects='Imperil Ice 10%'),
+    soulbreak(3, 'Vivi', 'usb', None, 1.65, school=BLACK_MAGIC,
+              commands=[command('Firaja', 12.0, [FIRE]),
+                        command('Blizzaja', 6.0, [ICE])]),
+    soulbreak(4, 'Vivi', 'csb', 4.0, 'unknown'),
+    ]
+CHARACTERS = [
+    {'id': 1, 'characterName': 'Cloud'},
+    {'id': 2, 'characterName': 'Vivi'},
+    ]
+
+
+@pytest.fixture
+def columns():
+    return ffrk.SbColumns([ffrk.withParsedEffects(dict(sbData))
+                           for sbData in SB_LIST])
+
+
+@pytest.fixture
+def dataset(monkeypatch):
+    monkeypatch.setattr(ffrk, 'dataset', (
+        [ffrk.withParsedEffects(dict(sbData)) for sbData in SB_LIST],
+        ffrk.Character.fromList(CHARACTERS)))
+    monkeypatch.setattr(ffrk, 'sbColumns', None)
+
+
+def testMask():
+    assert ffrk.SbColumns.mask([FIRE, ICE, None, 99]) == \
+        1 << FIRE | 1 << ICE
+
+
+def testColumnsHaveOneRowPerRecord(columns):
+    assert list(columns.sb['id']) == [1, 2, 3, 4]
+    assert list(columns.commands['sb']) == [2, 2]
+    assert list(columns.commands['index']) == [0, 1]
+    assert np.isnan(columns.sb['multiplier'][2])
+    assert np.isnan(columns.sb['castTime'][3])
+
+
+def testSoulbreakMatchesItsCommandElementsAndSchools(columns):
+    assert list(columns.select(elements=[FIRE])) == [0, 2]
+    assert list(columns.select(schools=[BLACK_MAGIC])) == [2]
+    assert list(columns.select(commands=True, elements=[FIRE])) == [0]
+
+
+def testSelectCombinesCriteria(columns):
+    assert list(columns.select(tiers=[ffrk.tier['usb']],
+                               characters=['cloud'])) == [0]
+    assert list(columns.select(characters=['nobody'])) == []
+    assert list(columns.select(statuses=[('imperil', ICE)])) == [1]
+    assert list(columns.select(commands=True,
+                               tiers=[ffrk.tier['usb']])) == [0, 1]
+
+
+def testRankLeavesOutMissingValues(columns):
+    rows = columns.select()
+    assert list(columns.rank(rows, 'multiplier')) == [0, 1, 3]
+    assert list(columns.rank(rows, 'multiplier', limit=1,
+                             ascending=True)) == [3]
+
+
+def testDescribe(columns):
+    stats = columns.describe(columns.select(), 'multiplier')
+    assert stats['count'] == 3
+    assert stats['min'] == 4.0
+    assert stats['median'] == 8.0
+    assert stats['max'] == 10.5
+    assert columns.describe(np.array([2]), 'multiplier') == {'count': 0}
+
+
+def testGroups(columns):
+    rows = columns.select()
+    groups = {name: list(groupRows)
+              for name, groupRows in columns.groups(rows, 'character')}
+    assert groups == {'Cloud': [0, 1], 'Vivi': [2, 3]}
+
+    groups = {name: list(groupRows)
+              for name, groupRows in columns.groups(rows, 'element')}
+    assert groups == {'Fire': [0, 2], 'Ice': [1, 2]}
+
+
+def testAnalyzeRanksSoulbreaks(dataset, capsys):
+    ffrk.analyze(['analyze', 'usb', '--rank', 'multiplier'])
+    output = capsys.readouterr().out
+    assert 'SB 1' in output
+    assert '10.5' in output
+    assert 'SB 2' not in output
+
+
+def testAnalyzeGroupsCommands(dataset, capsys):
+    ffrk.analyze(['analyze', '--commands', '--group-by', 'element',
+                  '--stat', 'multiplier'])
+    output = capsys.readouterr().out
+    assert output.startswith('multiplier of the commands:')
+    assert 'Fire' in output and 'Ice' in output
+
+
+def testAnalyzeWithoutMatch(dataset, capsys):
+    ffrk.analyze(['analyze', 'aosb'])
+    assert capsys.readouterr().out == 'No soulbreak found.\n'
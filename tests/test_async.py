@@ -0,0 +1,175 @@
+"""
+Tests of the async client.
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ffrk
+
+pytest.importorskip('aiohttp')
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """ a local API answering each path with the listed statuses in turn,
+    then with 200 and the path as json body """
+
+    statuses = {}
+    requested = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            pending = statuses.get(self.path)
+            status = pending.pop(0) if pending else 200
+            body = json.dumps([self.path]).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(ffrk, 'API', 'http://127.0.0.1:{}/'.format(
+        server.server_port))
+    monkeypatch.setattr(ffrk, 'cache', ffrk.ApiCache(str(tmp_path)))
+    monkeypatch.setattr(ffrk, 'limiter', ffrk.RateLimiter())
+    yield statuses, requested
+    server.shutdown()
+    server.server_close()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def testGetDecodesAndCachesTheResponse(api):
+    statuses, requested = api
+
+    async def search():
+        async with ffrk.AsyncClient() as client:
+            first = await client.get('Characters')
+            second = await client.get('Characters')
+            return first, second
+
+    assert run(search()) == (['/Characters'], ['/Characters'])
+    assert requested == ['/Characters']
+
+
+def testRetryableStatusIsRetried(api):
+    statuses, requested = api
+    statuses['/SoulBreaks'] = [503, 429]
+
+    async def search():
+        async with ffrk.AsyncClient(backoff=0) as client:
+            return await client.get('SoulBreaks')
+
+    assert run(search()) == ['/SoulBreaks']
+    assert len(requested) == 3
+    assert ffrk.limiter.inFlight == 0
+
+
+def testErrorRaisesApiError(api):
+    statuses, requested = api
+    statuses['/SoulBreaks'] = [404]
+
+    async def search():
+        async with ffrk.AsyncClient() as client:
+            return await client.get('SoulBreaks')
+
+    with pytest.raises(ffrk.ApiError):
+        run(search())
+
+
+class FakeFetchClient(ffrk.AsyncClient):
+    """ a client whose requests wait for release instead of the network """
+
+    def __init__(self):
+        super().__init__()
+        self.fetches = []
+        self.cancelled = []
+        self.release = None
+
+    async def fetch(self, url, timeout=None):
+        self.fetches.append(url)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(url)
+            raise
+        return url
+
+
+def testConcurrentGetsShareOneRequest(monkeypatch):
+    monkeypatch.setattr(ffrk.store, 'offline', False)
+
+    async def search():
+        client = FakeFetchClient()
+        client.release = asyncio.Event()
+        calls = [asyncio.ensure_future(client.get('x')) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        client.release.set()
+        return client, await asyncio.gather(*calls)
+
+    client, results = run(search())
+    assert client.fetches == [ffrk.API + 'x']
+    assert results == [ffrk.API + 'x'] * 3
+    assert client.inFlight == {}
+
+
+def testRequestOutlivesOneCancelledCaller(monkeypatch):
+    monkeypatch.setattr(ffrk.store, 'offline', False)
+
+    async def search():
+        client = FakeFetchClient()
+        client.release = asyncio.Event()
+        first = asyncio.ensure_future(client.get('x'))
+        second = asyncio.ensure_future(client.get('x'))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        client.release.set()
+        return client, await second
+
+    client, result = run(search())
+    assert result == ffrk.API + 'x'
+    assert client.cancelled == []
+
+
+def testRequestIsCancelledWithItsLastCaller(monkeypatch):
+    monkeypatch.setattr(ffrk.store, 'offline', False)
+
+    async def search():
+        client = FakeFetchClient()
+        client.release = asyncio.Event()
+        call = asyncio.ensure_future(client.get('x'))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        await asyncio.sleep(0.01)
+        return client
+
+    client = run(search())
+    assert client.cancelled == [ffrk.API + 'x']
+    assert client.inFlight == {}
+
+
+def testOfflineReadsTheLocalStore(monkeypatch):
+    monkeypatch.setattr(ffrk.store, 'offline', True)
+    monkeypatch.setattr(ffrk.store, 'get', lambda endpoint: [endpoint])
+
+    async def search():
+        client = FakeFetchClient()
+        return client, await client.get('Characters')
+
+    client, result = run(search())
+    assert result == ['Characters']
+    assert client.fetches == []
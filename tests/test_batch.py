@@ -0,0 +1,44 @@
+"""
+Tests of the batch command.
+"""
+
+import ffrk
+
+ONLINE = (False, True, False)
+NO_CACHE = (False, False, False)
+
+
+def testParseErrorIsKeptWithItsQuery(capsys):
+    messages, results, source = ffrk.resolveQuery('imperil nope')
+
+    assert 'invalid choice' in messages
+    assert results == []
+    assert capsys.readouterr().err == ''
+
+
+def testNotASearchIsSkipped():
+    messages, results, source = ffrk.resolveQuery('sync')
+
+    assert messages == 'Not a search, skipped.\n'
+
+
+def testEachSoulbreakIsFetchedOncePerSource(monkeypatch):
+    calls = []
+
+    def fetchSbData(sb, details=True, timeout=None):
+        calls.append((sb, details, ffrk.dataSource()))
+        return {'id': sb}
+
+    monkeypatch.setattr(ffrk, 'fetchSbData', fetchSbData)
+    resolved = [
+        ('', [([1, 2], {'details': False})], ONLINE),
+        ('', [([2], {'details': True})], ONLINE),
+        ('', [([2], {'details': False})], NO_CACHE),
+        ]
+
+    fetched = ffrk.fetchDistinct(resolved, workers=1)
+
+    assert sorted(calls) == [(1, False, ONLINE), (2, False, NO_CACHE),
+                             (2, True, ONLINE)]
+    assert set(fetched) == {(ONLINE, 1), (ONLINE, 2), (NO_CACHE, 2)}
+    assert ffrk.dataSource() == ONLINE
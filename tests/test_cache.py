@@ -0,0 +1,97 @@
+"""
+Tests of the on-disk API response cache.
+"""
+
+import os
+import time
+
+import pytest
+
+import ffrk
+
+URL = ffrk.API + 'SoulBreaks/Tier/8'
+
+
+@pytest.fixture
+def apiCache(tmp_path, monkeypatch):
+    apiCache = ffrk.ApiCache(str(tmp_path), maxBytes=10000)
+    monkeypatch.setattr(ffrk, 'cache', apiCache)
+    return apiCache
+
+
+def testEntryIsReadBackFromDisk(apiCache, tmp_path):
+    apiCache.put(URL, '[1, 2]', etag='"v1"')
+
+    entry = ffrk.ApiCache(str(tmp_path)).get(URL)
+    assert entry['body'] == '[1, 2]'
+    assert ffrk.ApiCache.data(entry) == [1, 2]
+
+
+def testDisabledCacheIsNeitherReadNorWritten(apiCache):
+    apiCache.enabled = False
+
+    assert apiCache.put(URL, '[]') is None
+    assert apiCache.get(URL) is None
+    assert apiCache.entries() == []
+
+
+def testEntryIsFreshForTheEndpointTtl(apiCache):
+    entry = apiCache.put(URL, '[]')
+    assert apiCache.ttl(URL) == ffrk.cacheTtl['SoulBreaks/Tier/']
+    assert apiCache.isFresh(entry)
+
+    entry['fetched'] = time.time() - apiCache.ttl(URL) - 1
+    assert not apiCache.isFresh(entry)
+
+
+def testRefreshRevalidatesFreshEntries(apiCache):
+    entry = apiCache.put(URL, '[]')
+    apiCache.refresh = True
+
+    assert not apiCache.isFresh(entry)
+
+
+def testEntryIsRevalidatedWithItsHeaders(apiCache):
+    entry = apiCache.put(URL, '[1]', etag='"v1"',
+                         lastModified='Mon, 01 Jan 2024 00:00:00 GMT')
+
+    assert ffrk.conditionalHeaders(entry) == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    assert ffrk.conditionalHeaders(None) == {}
+
+
+def testNotModifiedServesAndRenewsTheEntry(apiCache):
+    entry = apiCache.put(URL, '[1]', etag='"v1"')
+    entry['fetched'] -= 100
+
+    assert ffrk.responseData(URL, entry, 304, '', {}) == [1]
+    assert apiCache.get(URL)['fetched'] > entry['fetched']
+
+
+def testErrorServesTheStaleEntry(apiCache):
+    entry = apiCache.put(URL, '[1]')
+
+    assert ffrk.responseData(URL, entry, 503, '', {}) == [1]
+    with pytest.raises(ffrk.ApiError):
+        ffrk.responseData(URL, None, 503, '', {})
+
+
+def testOverwriteKeepsTheSizeOfTheFiles(apiCache):
+    for body in ('[1]', '[1, 2, 3]', '[1, 2]'):
+        apiCache.put(URL, body)
+        apiCache.put(URL + '0', body)
+
+    assert apiCache.size == apiCache.diskUsage()
+
+
+def testLeastRecentlyUsedEntriesAreEvicted(apiCache):
+    body = '[' + ', '.join(['1'] * 300) + ']'
+    urls = [URL + str(number) for number in range(20)]
+    for number, url in enumerate(urls):
+        apiCache.put(url, body)
+        os.utime(apiCache.path(url), (number, number))
+
+    assert apiCache.size == apiCache.diskUsage() <= apiCache.maxBytes
+    assert not os.path.exists(apiCache.path(urls[0]))
+    assert os.path.exists(apiCache.path(urls[-1]))
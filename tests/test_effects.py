@@ -0,0 +1,62 @@
+"""
+Tests of the parsing of the free-text soulbreak effects.
+"""
+
+import ffrk
+
+FIRE, ICE, LIGHTNING, WIND = 5, 7, 8, 13
+
+
+def testAttacksAndChain():
+    parsed = ffrk.parseEffects(
+        'Five single attacks (0.80 each), activates Fire Chain (max 150)')
+
+    assert parsed['hits'] == 5
+    assert parsed['chain'] == FIRE
+    assert parsed['heals'] is False
+
+
+def testHitsAddUpAcrossClauses():
+    parsed = ffrk.parseEffects('Two single ranged attacks, then a group '
+                               'attack and 3 random attacks')
+
+    assert parsed['hits'] == 6
+
+
+def testImperilAndAttachElements():
+    parsed = ffrk.parseEffects(
+        'Imperil Fire/Ice 10%, Attach Lightning and Wind')
+
+    assert parsed['imperil'] == [FIRE, ICE]
+    assert parsed['attach'] == [LIGHTNING, WIND]
+
+
+def testBuffsAndDebuffs():
+    parsed = ffrk.parseEffects(
+        'ATK/MAG +30% to the party, DEF and RES -50% to all enemies')
+
+    assert parsed['buffs'] == ['ATK', 'MAG']
+    assert parsed['debuffs'] == ['DEF', 'RES']
+
+
+def testHeals():
+    assert ffrk.parseEffects('Heals the party')['heals'] is True
+    assert ffrk.parseEffects('Restores HP (85)')['heals'] is True
+
+
+def testNoEffects():
+    assert ffrk.parseEffects('') == {
+        'chain': None, 'imperil': [], 'attach': [], 'hits': 0,
+        'heals': False, 'buffs': [], 'debuffs': []}
+
+
+def testSoulBreakGathersCommandAndStatusElements():
+    sbData = {'effects': 'Three single attacks, Imperil Fire 10%',
+              'commands': [{'effects': 'Attach Ice, Imperil Fire 10%'}],
+              'statuses': [{'effects': 'Activates Wind Chain (max 99)'}]}
+
+    parsed = ffrk.withParsedEffects(sbData)['parsedEffects']
+    assert parsed['imperil'] == [FIRE]
+    assert parsed['attach'] == [ICE]
+    assert parsed['chain'] == WIND
+    assert 'parsedEffects' not in sbData['commands'][0]
@@ -0,0 +1,39 @@
+"""
+Tests of the find search terms.
+"""
+
+import pytest
+
+import ffrk
+
+LIGHTNING = 8
+CHARACTERS = [
+    {'id': 1, 'characterName': 'Lightning'},
+    {'id': 2, 'characterName': 'Cloud'},
+    ]
+
+
+@pytest.fixture
+def characters(monkeypatch):
+    monkeypatch.setattr(ffrk, 'dataset', ([], ffrk.Character.fromList(
+        CHARACTERS)))
+
+
+def testElementIsNotReplacedByCharacter(characters):
+    assert ffrk.parseFindTerms(['usb', 'lightning']) == \
+        {'tiers': [ffrk.tier['usb']], 'elements': [LIGHTNING]}
+
+
+def testPrefixSelectsCharacter(characters):
+    assert ffrk.parseFindTerms(['usb', 'char:lightning']) == \
+        {'tiers': [ffrk.tier['usb']], 'characters': ['lightning']}
+
+
+def testCharacterWithoutCollision(characters):
+    assert ffrk.parseFindTerms(['cloud']) == {'characters': ['cloud']}
+    assert ffrk.parseFindTerms(['char:cloud']) == {'characters': ['cloud']}
+
+
+def testUnknownTerm(characters):
+    with pytest.raises(ValueError, match='Unrecognised search term: nope'):
+        ffrk.parseFindTerms(['nope'])
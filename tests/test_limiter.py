@@ -0,0 +1,74 @@
+"""
+Tests of the adaptive rate limiter.
+"""
+
+import asyncio
+
+import ffrk
+
+
+def testConcurrencyGrowsWhileResponsesAreFast():
+    limiter = ffrk.RateLimiter(maxConcurrency=16)
+    limiter.concurrency = 4.0
+
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(0.01, 200)
+    assert 4.9 < limiter.concurrency < 5.1
+
+
+def testTooManyRequestsHalvesConcurrencyAndRate():
+    limiter = ffrk.RateLimiter(rate=40, maxConcurrency=16)
+
+    limiter.acquire()
+    limiter.release(0.01, 429)
+    assert limiter.concurrency == 8
+    assert limiter.rate == 20
+
+
+def testSlowResponseHalvesConcurrencyOnly():
+    limiter = ffrk.RateLimiter(rate=40, maxConcurrency=16, slowLatency=1)
+
+    limiter.acquire()
+    limiter.release(2, 200)
+    assert limiter.concurrency == 8
+    assert limiter.rate == 40
+
+
+def testLimitsStayWithinBounds():
+    limiter = ffrk.RateLimiter(rate=10, burst=200, maxConcurrency=2)
+
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(0.01, 429)
+    assert (limiter.concurrency, limiter.rate) == (1, 1)
+
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release(0.01, 200)
+    assert (limiter.concurrency, limiter.rate) == (2, 10)
+
+
+def testAdmitWaitsForAReleaseOrAToken():
+    limiter = ffrk.RateLimiter(rate=10, burst=1, maxConcurrency=1)
+
+    assert limiter.admit() == 0
+    assert limiter.admit() is None          # concurrency reached
+    limiter.release(0.01, 200)
+    assert 0 < limiter.admit() <= 0.1       # bucket empty
+
+
+def testAsyncAcquireWaitsForARelease():
+    limiter = ffrk.RateLimiter(maxConcurrency=1)
+
+    async def run():
+        limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquireAsync())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        limiter.release(0.01, 200)
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(run())
+    assert limiter.inFlight == 1
+    assert limiter.stats()['queued'] == 0
@@ -0,0 +1,94 @@
+"""
+Tests of the local name resolution.
+"""
+
+import pytest
+
+import ffrk
+
+CHARACTERS = [
+    {'id': 1, 'characterName': 'Zidane', 'relics': []},
+    {'id': 2, 'characterName': 'Cecil (Paladin)', 'relics': []},
+    {'id': 3, 'characterName': 'Cecil (Dark Knight)', 'relics': []},
+    ]
+SOULBREAKS = [(109, 'Zidane soulbreak 109'), (110, 'Free Energy')]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = ffrk.NameIndex(CHARACTERS, SOULBREAKS, {})
+    monkeypatch.setattr(ffrk, 'nameIndex', index)
+    return index
+
+
+def names(charList):
+    return [charData['characterName'] for charData in charList]
+
+
+def testExactName(index):
+    assert names(ffrk.resolveCharacters('zidane')) == ['Zidane']
+
+
+def testPrefixPicksTheOnlyCharacter(index, capsys):
+    assert names(ffrk.resolveCharacters('zid')) == ['Zidane']
+    assert 'Showing results for Zidane.' in capsys.readouterr().out
+
+
+def testAmbiguousPrefixReturnsEveryCharacter(index):
+    assert sorted(names(ffrk.resolveCharacters('cecil'))) == \
+        ['Cecil (Dark Knight)', 'Cecil (Paladin)']
+
+
+def testWeakMatchIsNotPicked(index):
+    # a soulbreak name must reach the soulbreak search
+    assert ffrk.resolveCharacters('zidane soulbreak 109') == []
+    assert ffrk.resolveCharacters('zidnae') == []
+
+
+def testMisspeltNameIsSuggested(index):
+    assert 'zidane' in index.suggest('zidnae')
+
+
+@pytest.fixture
+def api(monkeypatch, index):
+    responses = {}
+    requested = []
+
+    def apiGet(endpoint, **kwargs):
+        requested.append(endpoint)
+        return responses.get(endpoint, [])
+
+    monkeypatch.setattr(ffrk, 'dataset', ([], CHARACTERS))
+    monkeypatch.setattr(ffrk, 'apiGet', apiGet)
+    return responses, requested
+
+
+def testLocalSoulbreakNameNeedsNoRequest(api):
+    responses, requested = api
+    assert ffrk.getSbIdList(['soulbreak 10']) == [109]
+    assert requested == []
+
+
+def testCharacterAddedSinceSyncIsAskedToApi(api):
+    responses, requested = api
+    responses['Characters/Name/vivi'] = [
+        {'id': 5, 'characterName': 'Vivi',
+         'relics': [{'soulBreakId': 300, 'soulBreak': {'soulBreakTier': 8}}]}]
+
+    assert ffrk.getSbIdList(['vivi']) == [300]
+
+
+def testSoulbreakAddedSinceSyncIsAskedToApi(api):
+    responses, requested = api
+    responses['SoulBreaks/Name/new wave'] = [{'id': 400}]
+
+    assert ffrk.getSbIdList(['new wave']) == [400]
+
+
+def testOfflineMissIsNotAskedToApi(api, monkeypatch, capsys):
+    responses, requested = api
+    monkeypatch.setattr(ffrk.store, 'offline', True)
+
+    assert ffrk.getSbIdList(['new wave']) is None
+    assert requested == []
+    assert 'No character or soulbreak found.' in capsys.readouterr().out
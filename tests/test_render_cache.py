@@ -0,0 +1,88 @@
+"""
+Tests of the in-memory cache of rendered search output.
+"""
+
+import time
+
+import ffrk
+
+
+def testGetReturnsSavedOutput():
+    renderCache = ffrk.RenderCache()
+    renderCache.put('a', 'output', renderCache.stamp())
+    assert renderCache.get('a') == 'output'
+    assert renderCache.get('b') is None
+    assert renderCache.stats() == {'entries': 1, 'bytes': 6, 'hits': 1,
+                                   'misses': 1, 'generation': 0}
+
+
+def testLeastRecentlyUsedEntryIsDropped():
+    renderCache = ffrk.RenderCache(maxEntries=2)
+    stamp = renderCache.stamp()
+    renderCache.put('a', 'a', stamp)
+    renderCache.put('b', 'b', stamp)
+    renderCache.get('a')
+    renderCache.put('c', 'c', stamp)
+    assert list(renderCache.entries) == ['a', 'c']
+
+
+def testSizeIsBounded():
+    renderCache = ffrk.RenderCache(maxBytes=10)
+    stamp = renderCache.stamp()
+    renderCache.put('a', 'x' * 6, stamp)
+    renderCache.put('b', 'x' * 6, stamp)
+    assert list(renderCache.entries) == ['b']
+    assert renderCache.size == 6
+
+    renderCache.put('c', 'x' * 11, stamp)
+    assert renderCache.get('c') is None
+    assert renderCache.size == 6
+
+
+def testReplacedEntryIsCountedOnce():
+    renderCache = ffrk.RenderCache()
+    stamp = renderCache.stamp()
+    renderCache.put('a', 'x' * 5, stamp)
+    renderCache.put('a', 'x' * 3, stamp)
+    assert renderCache.size == 3
+
+
+def testExpiredEntryIsDropped():
+    renderCache = ffrk.RenderCache(ttl=-1)
+    renderCache.put('a', 'output', renderCache.stamp())
+    assert renderCache.get('a') is None
+    assert renderCache.size == 0
+    assert renderCache.stats()['misses'] == 1
+
+
+def testInvalidateDropsEverything():
+    renderCache = ffrk.RenderCache()
+    renderCache.put('a', 'output', renderCache.stamp())
+    renderCache.invalidate()
+    assert renderCache.get('a') is None
+    assert renderCache.stats()['bytes'] == 0
+    assert renderCache.stats()['generation'] == 1
+
+
+def testOutputRenderedAcrossAChangeIsNotSaved():
+    renderCache = ffrk.RenderCache()
+    stamp = renderCache.stamp()
+    renderCache.invalidate()
+    renderCache.put('a', 'output', stamp)
+    assert renderCache.get('a') is None
+
+    stamp = renderCache.stamp()
+    renderCache.failed()
+    renderCache.put('a', 'output', stamp)
+    assert renderCache.get('a') is None
+
+
+def testEntryExpiresAfterTtl(monkeypatch):
+    renderCache = ffrk.RenderCache(ttl=10)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now)
+    renderCache.put('a', 'output', renderCache.stamp())
+    monkeypatch.setattr(time, 'time', lambda: now + 9)
+    assert renderCache.get('a') == 'output'
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    assert renderCache.get('a') is None
@@ -0,0 +1,103 @@
+"""
+Tests of the searches served as json.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+import ffrk
+
+CHARACTERS = [
+    {'id': 2, 'characterName': 'Cecil (Paladin)', 'relics': []},
+    {'id': 3, 'characterName': 'Cecil (Dark Knight)', 'relics': []},
+    {'id': 4, 'characterName': 'Zidane', 'relics': []},
+    ]
+
+
+@pytest.fixture
+def names(monkeypatch):
+    monkeypatch.setattr(ffrk, 'dataset', ([], ffrk.Character.fromList(
+        CHARACTERS)))
+    monkeypatch.setattr(ffrk, 'nameIndex', None)
+    # the API knows no other name
+    monkeypatch.setattr(ffrk, 'apiGet', lambda endpoint, **kwargs: [])
+
+
+def testAmbiguousNameReturnsCandidates(names, capsys):
+    status, payload = ffrk.serveSb(None, {'q': 'cecil'})
+
+    assert status == 300
+    assert sorted(payload['candidates']) == \
+        ['Cecil (Dark Knight)', 'Cecil (Paladin)']
+    assert capsys.readouterr().out == ''
+
+
+def testMisspeltNameReturnsSuggestions(names, capsys):
+    status, payload = ffrk.serveSb(None, {'q': 'zidnae usb'})
+
+    assert status == 404
+    assert payload['candidates'][0] == 'zidane'
+    assert capsys.readouterr().out == ''
+
+
+def testSbTypeWithoutName(names):
+    with pytest.raises(ValueError):
+        ffrk.serveSb(None, {'q': 'usb'})
+
+
+def testUnknownFindTerm(names, capsys):
+    with pytest.raises(ValueError):
+        ffrk.serveFind(None, {'q': 'usb nope'})
+    assert capsys.readouterr().out == ''
+
+
+@pytest.fixture
+def server(names):
+    serverClass = type('PooledHTTPServer', (ffrk.PooledServer, HTTPServer),
+                       {})
+    handlerClass = type('ApiRequestHandler',
+                        (ffrk.ApiHandler, BaseHTTPRequestHandler), {})
+    server = serverClass(('127.0.0.1', 0), handlerClass, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+def request(url):
+    """ output: the HTTP status and the decoded json payload """
+
+    try:
+        with urlopen(url, timeout=5) as response:
+            return response.status, json.load(response)
+    except HTTPError as error:
+        with error:
+            return error.code, json.load(error)
+
+
+def testServerAnswersJson(server, capsys):
+    status, payload = request(server + '/sb?q=cecil')
+    assert status == 300
+    assert len(payload['candidates']) == 2
+
+    assert request(server + '/nope')[0] == 404
+    assert request(server + '/tier?tier=nope&element=fire')[0] == 400
+    assert request(server + '/find?q=usb%20nope')[0] == 400
+    assert capsys.readouterr().out == ''
+
+
+def testMetricsCountRequests(server):
+    request(server + '/sb?q=cecil')
+    request(server + '/nope')
+
+    status, payload = request(server + '/metrics')
+    assert status == 200
+    assert payload['endpoints']['/sb']['count'] == 1
+    assert payload['endpoints']['/nope']['errors'] == 1
+    assert 'renderCache' in payload
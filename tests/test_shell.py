@@ -0,0 +1,51 @@
+"""
+Tests of the shell and daemon command handling.
+"""
+
+import io
+import json
+
+import ffrk
+
+
+def testSessionCommandsAreRejected(capsys, monkeypatch):
+    monkeypatch.setattr(ffrk, 'runCommand', lambda args: 1 / 0)
+
+    for command in ffrk.SESSION_COMMANDS:
+        assert ffrk.runLine(command) is True
+        assert 'cannot run inside' in capsys.readouterr().out
+
+
+def testOptionsAreResetPerCommand(monkeypatch):
+    monkeypatch.setattr(ffrk, 'runCommand', lambda args: None)
+    monkeypatch.setattr(ffrk.cache, 'enabled', False)
+    monkeypatch.setattr(ffrk.cache, 'refresh', True)
+    monkeypatch.setattr(ffrk.store, 'offline', True)
+
+    ffrk.runLine('sync')
+    assert (ffrk.cache.enabled, ffrk.cache.refresh, ffrk.store.offline) == \
+        (True, False, False)
+
+
+def testDaemonStreamSendsCompleteLines():
+    wfile = io.BytesIO()
+    stream = ffrk.DaemonStream(wfile, 'stdout')
+
+    stream.write('first line\nsecond ')
+    sent = wfile.getvalue()
+    stream.write('line')
+    assert wfile.getvalue() == sent
+    stream.flush()
+
+    messages = [json.loads(line) for line in wfile.getvalue().splitlines()]
+    assert messages == [{'stdout': 'first line\n'}, {'stdout': 'second line'}]
+
+
+def testDaemonRunReportsStatus(capsys, monkeypatch):
+    def failing(args):
+        raise SystemExit(2)
+
+    monkeypatch.setattr(ffrk, 'runCommand', failing)
+    assert ffrk.DaemonHandler.run(['find', 'nope']) == 2
+    assert ffrk.DaemonHandler.run(['serve']) == 1
+    assert 'cannot run inside' in capsys.readouterr().err
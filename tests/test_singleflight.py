@@ -0,0 +1,100 @@
+"""
+Tests of the coalescing of concurrent identical calls.
+"""
+
+import threading
+import time
+
+import pytest
+
+import ffrk
+
+
+def waitFor(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+
+
+def startThreads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def testConcurrentCallsShareOneRun():
+    flight = ffrk.SingleFlight()
+    release = threading.Event()
+    runs = []
+    results = []
+
+    def slow():
+        runs.append(1)
+        release.wait(5)
+        return 'data'
+
+    threads = startThreads([lambda: results.append(flight.do('key', slow))]
+                           * 5)
+    waitFor(lambda: flight.stats()['calls'] == 5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert runs == [1]
+    assert results == ['data'] * 5
+    assert flight.stats() == {'calls': 5, 'shared': 4, 'inFlight': 0}
+
+
+def testDifferentKeysRunSeparately():
+    flight = ffrk.SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def slow(key):
+        runs.append(key)
+        release.wait(5)
+
+    threads = startThreads([lambda key=key: flight.do(key, slow, key)
+                            for key in range(3)])
+    waitFor(lambda: len(runs) == 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert sorted(runs) == [0, 1, 2]
+    assert flight.stats()['shared'] == 0
+
+
+def testLaterCallRunsAgain():
+    flight = ffrk.SingleFlight()
+
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+
+
+def testErrorIsRaisedToEveryCaller():
+    flight = ffrk.SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        release.wait(5)
+        raise ffrk.ApiError('down')
+
+    def call():
+        try:
+            flight.do('key', failing)
+        except ffrk.ApiError as error:
+            errors.append(error)
+
+    threads = startThreads([call] * 3)
+    waitFor(lambda: flight.stats()['calls'] == 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 3
+    assert flight.stats()['inFlight'] == 0
+    with pytest.raises(ZeroDivisionError):
+        flight.do('key', lambda: 1 / 0)
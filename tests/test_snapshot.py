@@ -0,0 +1,89 @@
+"""
+Tests of the binary snapshot: writeSnapshot and Snapshot.
+"""
+
+import copy
+
+import pytest
+
+import ffrk
+
+SOULBREAKS = [
+    {
+        'id': 2,
+        'characterName': 'Cloud',
+        'soulBreakName': 'Braver',
+        'soulBreakTier': 8,
+        'targetType': 1,
+        'multiplier': 5.5,
+        'elements': [5],
+        'castTime': 0.01,
+        'effects': 'Five single attacks, Imperil Fire 10%',
+        'relicName': 'Buster Sword',
+        'commands': [{'commandName': 'Slash', 'school': 5,
+                      'multiplier': 2, 'elements': [],
+                      'effects': 'Attach Ice'}],
+        'statuses': [{'id': 20, 'commonName': 'Haste', 'effects':
+                      'Haste', 'defaultDuration': None}],
+        'otherEffects': [],
+        },
+    {
+        # no school, commands nor statuses: they must stay absent
+        'id': 1,
+        'characterName': 'Tifa',
+        'soulBreakName': 'Final Heaven',
+        'soulBreakTier': 6,
+        'targetType': None,
+        'multiplier': 2 ** 40,
+        'elements': [3, 1000],
+        'castTime': 1.65,
+        'effects': 'Heals the user',
+        },
+    ]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / 'ffrk.snapshot')
+    ffrk.writeSnapshot(copy.deepcopy(SOULBREAKS), path)
+    snapshot = ffrk.Snapshot(path)
+    assert snapshot.open()
+    return snapshot
+
+
+def testRoundTrip(snapshot):
+    assert snapshot.allSoulBreaks() == sorted(SOULBREAKS,
+                                              key=lambda sb: sb['id'])
+
+
+def testEmptySnapshot(tmp_path):
+    path = str(tmp_path / 'ffrk.snapshot')
+    ffrk.writeSnapshot([], path)
+    snapshot = ffrk.Snapshot(path)
+
+    assert snapshot.open()
+    assert snapshot.allSoulBreaks() == []
+    assert snapshot.soulBreaksByName('cloud') == []
+
+
+def testSearches(snapshot):
+    def ids(sbList):
+        return [sb['id'] for sb in sbList]
+
+    assert ids(snapshot.soulBreaksById([2, 3, 1])) == [1, 2]
+    assert ids(snapshot.soulBreaksByTier(8)) == [2]
+    assert ids(snapshot.soulBreaksByElement(8, 5)) == [2]
+    assert ids(snapshot.soulBreaksByElement(6, 5)) == []
+    assert ids(snapshot.soulBreaksByName('HEAVEN')) == [1]
+    assert ids(snapshot.soulBreaksByEffect('imperil fire')) == [2]
+    assert ids(snapshot.soulBreaksByStatus('imperil', 5)) == [2]
+    assert ids(snapshot.soulBreaksByStatus('attach', 7)) == [2]
+
+
+def testStaleSnapshotIsNotOpened(snapshot, tmp_path):
+    newer = tmp_path / 'ffrk.sqlite3'
+    newer.write_bytes(b'')
+    snapshot.close()
+    ffrk.os.utime(snapshot.path, (0, 0))
+
+    assert not snapshot.open(newerThan=str(newer))
@@ -0,0 +1,89 @@
+"""
+Tests of the incremental sync record comparison.
+"""
+
+import copy
+
+import ffrk
+
+SB = {
+    'id': 7,
+    'characterName': 'Cloud',
+    'soulBreakName': 'Cross-slash',
+    'soulBreakTier': 9,
+    'elements': [5],
+    'effects': 'Five single attacks, activates Fire Chain (max 150)',
+    'commands': [{'id': 70, 'commandName': 'Blade', 'effects':
+                  'Attach Fire, Imperil Fire 10%'}],
+    'statuses': [{'id': 71, 'commonName': 'Fire Chain', 'effects':
+                  'Imperil Ice 10%'}],
+    'otherEffects': [],
+    }
+
+
+def storeWith(tmp_path, sbList):
+    store = ffrk.LocalStore(str(tmp_path / 'ffrk.sqlite3'),
+                            str(tmp_path / 'ffrk.snapshot'))
+    store.storeAll([], [], sbList)
+    return store
+
+
+def testUnchangedRecordDiffsAsUnchanged(tmp_path):
+    store = storeWith(tmp_path, [copy.deepcopy(SB)])
+
+    stored = store.storedSoulBreaks(9)
+    assert ffrk.diffRecords(stored, [copy.deepcopy(SB)]) == ([], [], [])
+
+
+def testParsedListingDiffsAsUnchanged(tmp_path):
+    # the searches add parsedEffects to the records they filter
+    store = storeWith(tmp_path, [ffrk.withParsedEffects(copy.deepcopy(SB))])
+    listing = [ffrk.withParsedEffects(copy.deepcopy(SB))]
+
+    assert ffrk.diffRecords(store.storedSoulBreaks(9), listing) == \
+        ([], [], [])
+
+
+def testPartialListingComparesToStoredRecord(tmp_path):
+    store = storeWith(tmp_path, [copy.deepcopy(SB)])
+    listing = {key: value for key, value in SB.items()
+               if key not in ffrk.SB_DETAIL_FIELDS}
+
+    assert ffrk.diffRecords(store.storedSoulBreaks(9), [listing]) == \
+        ([], [], [])
+
+
+def testDiffFindsAddedUpdatedAndRemoved():
+    stored = {1: {'id': 1, 'name': 'a'}, 2: {'id': 2, 'name': 'b'}}
+    fetched = [{'id': 2, 'name': 'B'}, {'id': 3, 'name': 'c'}]
+
+    added, updated, removed = ffrk.diffRecords(stored, fetched)
+    assert added == [{'id': 3, 'name': 'c'}]
+    assert updated == [{'id': 2, 'name': 'B'}]
+    assert removed == [1]
+
+
+def testStoredRecordHasNoParsedEffects(tmp_path):
+    store = storeWith(tmp_path, [ffrk.withParsedEffects(copy.deepcopy(SB))])
+
+    stored = store.storedSoulBreaks(9)[7]
+    assert 'parsedEffects' not in stored
+    assert all('parsedEffects' not in item
+               for key in ('commands', 'statuses') for item in stored[key])
+
+
+def testIncrementalSyncRemovesCharacters(tmp_path, monkeypatch, capsys):
+    store = ffrk.LocalStore(str(tmp_path / 'ffrk.sqlite3'),
+                            str(tmp_path / 'ffrk.snapshot'))
+    store.storeAll([{'id': 1, 'characterName': 'Cloud'},
+                    {'id': 2, 'characterName': 'Tifa'}], [], [])
+    responses = {'Characters': [{'id': 1, 'characterName': 'Cloud'}]}
+    monkeypatch.setattr(ffrk, 'store', store)
+    monkeypatch.setattr(ffrk, 'apiGet',
+                        lambda endpoint, **kwargs: responses.get(endpoint, []))
+
+    ffrk.incrementalSync()
+
+    assert list(store.storedCharacters()) == [1]
+    line = capsys.readouterr().out.splitlines()[-1].split()
+    assert line[:5] == ['characters', '0', '0', '1', '1']
@@ -0,0 +1,53 @@
+"""
+Tests of the width-aware table renderer.
+"""
+
+import ffrk
+
+
+def makeTable():
+    table = ffrk.setupTable([('Name', 'l'), ('Tier',), ('Effects', 'l')])
+    table.add_row(['Ultra Cross', 'USB', 'a long list of effects ' * 3])
+    table.add_row(['Cross', 'SSB', 'short'])
+    return table
+
+
+def testRendersPrettyTableStyle():
+    table = ffrk.setupTable([('Name', 'l'), ('Tier',), ('Hits', 'r')])
+    table.add_row(['Cross', 'SSB', 4])
+    assert table.render() == '\n'.join([
+        '+-------+------+------+',
+        '| Name  | Tier | Hits |',
+        '+-------+------+------+',
+        '| Cross | SSB  |    4 |',
+        '+-------+------+------+'])
+
+
+def testWidthsFollowTheRows():
+    table = makeTable()
+    assert table.widths == [11, 4, 69]
+
+
+def testTableThatFitsIsNotNarrowed():
+    table = makeTable()
+    assert table.fitWidths(200) == table.widths
+
+
+def testWidestTextColumnIsNarrowedFirst():
+    table = makeTable()
+    widths = table.fitWidths(60)
+    assert widths == [11, 4, 35]
+    assert sum(widths) + 3 * len(widths) + 1 == 60
+
+
+def testColumnsAreNotNarrowedPastTheMinimum():
+    table = makeTable()
+    widths = table.fitWidths(10)
+    assert widths == [ffrk.MIN_COLUMN_WIDTH, 4, ffrk.MIN_COLUMN_WIDTH]
+
+
+def testRenderedLinesFitTheWidth():
+    table = makeTable()
+    lines = table.render(60).split('\n')
+    assert all(len(line) == 60 for line in lines)
+    assert len(lines) > 6
@@ -0,0 +1,78 @@
+"""
+Tests of the HTTP transport retries.
+"""
+
+import pytest
+import requests
+
+import ffrk
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """ answers the requests with the given outcomes, in order """
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.urls = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.urls.append(url)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    monkeypatch.setattr(ffrk, 'limiter', ffrk.RateLimiter())
+    transport = ffrk.Transport(retries=2, backoff=0)
+    return transport
+
+
+def testRetryableStatusIsRetried(transport):
+    transport.session = FakeSession([503, 429, 200])
+
+    assert transport.get('http://api/x').status_code == 200
+    assert len(transport.session.urls) == 3
+
+
+def testLastResponseIsReturnedOnceRetriesAreSpent(transport):
+    transport.session = FakeSession([503, 503, 502])
+
+    assert transport.get('http://api/x').status_code == 502
+
+
+def testClientErrorIsNotRetried(transport):
+    transport.session = FakeSession([404])
+
+    assert transport.get('http://api/x').status_code == 404
+    assert transport.session.outcomes == []
+
+
+def testConnectionErrorIsRetried(transport):
+    transport.session = FakeSession([requests.exceptions.ConnectionError(),
+                                     200])
+
+    assert transport.get('http://api/x').status_code == 200
+
+
+def testFailureRaisesApiError(transport):
+    transport.session = FakeSession(
+        [requests.exceptions.ConnectionError()] * 3)
+
+    with pytest.raises(ffrk.ApiError):
+        transport.get('http://api/x')
+    assert ffrk.limiter.inFlight == 0
+
+
+def testRetryAfterHeaderIsHonoured():
+    assert ffrk.retryDelay(0, 1.0, '7') == 7.0
+    assert 0 <= ffrk.retryDelay(3, 0.5) <= 4.0
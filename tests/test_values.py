@@ -0,0 +1,40 @@
+"""
+Tests of the comma separated search values.
+"""
+
+import argparse
+
+import pytest
+
+import ffrk
+
+
+def testValuesKeepTheirOrderWithoutRepeats():
+    assert ffrk.splitValues('usb,bsb,usb', ffrk.TIER_CHOICES) == \
+        ['usb', 'bsb']
+
+
+def testAllIsEveryChoice():
+    assert ffrk.splitValues('all', ffrk.ELEMENT_CHOICES) == \
+        ffrk.ELEMENT_CHOICES
+
+
+def testInvalidValue():
+    with pytest.raises(ValueError, match="'nope'"):
+        ffrk.splitValues('fire,nope', ffrk.ELEMENT_CHOICES)
+
+
+def testStatusTypesRejectAll():
+    statusType = ffrk.valuesType(ffrk.STATUS_CHOICES, allowAll=False)
+
+    assert statusType('imperil,attach') == ['imperil', 'attach']
+    with pytest.raises(argparse.ArgumentTypeError) as error:
+        statusType('all')
+    assert 'or all' not in str(error.value)
+
+
+def testAllRoutesToTheTierSearch():
+    assert ffrk.isValueList('all', ffrk.TIER_CHOICES)
+    assert not ffrk.isValueList('all', ffrk.STATUS_CHOICES, allowAll=False)
+    assert ffrk.isValueList('imperil,attach', ffrk.STATUS_CHOICES,
+                            allowAll=False)